@@ -0,0 +1,193 @@
+"""离线统计分析工具
+
+不需要启动网页服务，直接读取 votes.json（或快照 votes.snap）和 user.json，
+用多进程并行计算每道题和每位投票者的统计数据，输出 CSV 和 JSON 报告。
+
+用法:
+    python analytics.py                                  # 读取当前目录的数据，输出到 report/
+    python analytics.py --votes votes.snap --out contest1 --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from main import calc_overall_array, convert_quality_rating
+
+RATING_FIELDS = ['thinking', 'implementing', 'overall', 'quality']
+
+
+def load_dataset(votes_path, users_path):
+    """读取投票、评论、元数据和用户，返回 (votes, comments, problem_metas, users)"""
+    if votes_path.endswith('.snap'):
+        from snapshot import Snapshot
+        snap = Snapshot(votes_path)
+        votes, comments, metas = snap.to_votes_dict(), snap.comments, snap.problem_metas
+        snap.close()
+    else:
+        with open(votes_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data and isinstance(next(iter(data.values())), list):
+            # 旧格式，只有投票数据
+            for vote_list in data.values():
+                for vote in vote_list:
+                    if 'quality' in vote and vote['quality'] >= 800:
+                        vote['quality'] = convert_quality_rating(vote['quality'])
+            data = {'votes': data}
+        votes, comments, metas = data.get('votes', {}), data.get('comments', {}), data.get('problem_metas', {})
+    users = {}
+    if users_path and os.path.exists(users_path):
+        with open(users_path, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+    return votes, comments, metas, users
+
+
+def _summary(values, prefix):
+    arr = np.asarray(values, dtype=float)
+    return {
+        f'{prefix}_mean': float(arr.mean()),
+        f'{prefix}_std': float(arr.std()),
+        f'{prefix}_median': float(np.median(arr)),
+        f'{prefix}_min': float(arr.min()),
+        f'{prefix}_max': float(arr.max()),
+    }
+
+
+def problem_stats_chunk(chunk):
+    """计算一批题目的统计（在子进程中执行）"""
+    # 整批投票一次性向量化计算综合评分，再按题目切分
+    all_votes = [v for title, vote_list in chunk for v in vote_list]
+    overall_all = calc_overall_array([v['thinking'] for v in all_votes], [v['implementing'] for v in all_votes]).tolist()
+    result = []
+    pos = 0
+    for title, vote_list in chunk:
+        overall = overall_all[pos:pos + len(vote_list)]
+        pos += len(vote_list)
+        row = {'title': title, 'count': len(vote_list)}
+        columns = {
+            'thinking': [v['thinking'] for v in vote_list],
+            'implementing': [v['implementing'] for v in vote_list],
+            'overall': overall,
+            'quality': [v['quality'] for v in vote_list],
+        }
+        for field in RATING_FIELDS:
+            row.update(_summary(columns[field], field))
+        row['overall_per_vote'] = columns['overall']
+        result.append(row)
+    return result
+
+
+def voter_stats_chunk(chunk):
+    """计算一批投票者的统计（在子进程中执行）
+
+    chunk 中每项为 (voter, [(题目均值字典, 投票, 综合评分)])
+    """
+    result = []
+    for voter, entries in chunk:
+        row = {'voter': voter, 'votes': len(entries)}
+        for field in RATING_FIELDS:
+            own = np.array([vote_overall if field == 'overall' else vote[field] for means, vote, vote_overall in entries], dtype=float)
+            consensus = np.array([means[field] for means, vote, vote_overall in entries], dtype=float)
+            row[f'{field}_mean'] = float(own.mean())
+            row[f'{field}_bias'] = float((own - consensus).mean())
+            row[f'{field}_mad'] = float(np.abs(own - consensus).mean())
+        result.append(row)
+    return result
+
+
+def chunked(items, n_chunks):
+    size = max(1, (len(items) + n_chunks - 1) // n_chunks)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def analyze(votes, comments, metas, users, workers=None):
+    """并行计算题目和投票者统计，返回 (题目行, 投票者行)"""
+    workers = workers or os.cpu_count() or 1
+    items = [(title, vote_list) for title, vote_list in votes.items() if vote_list]
+    # 按投票数交错分配，避免某个进程分到所有热门题目
+    items.sort(key=lambda item: -len(item[1]))
+    n_chunks = workers * 4
+    chunks = [items[i::n_chunks] for i in range(n_chunks) if items[i::n_chunks]]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        problem_rows = [row for part in pool.map(problem_stats_chunk, chunks) for row in part]
+
+        by_voter = defaultdict(list)
+        for row in problem_rows:
+            means = {field: row[f'{field}_mean'] for field in RATING_FIELDS}
+            for vote, vote_overall in zip(votes[row['title']], row.pop('overall_per_vote')):
+                by_voter[vote['voter']].append((means, vote, vote_overall))
+        voter_rows = [row for part in pool.map(voter_stats_chunk, chunked(list(by_voter.items()), n_chunks)) for row in part]
+
+    for row in problem_rows:
+        meta = metas.get(row['title'], {})
+        row['difficulty'] = meta.get('difficulty', '暂无评定')
+        row['tags'] = meta.get('tags', '')
+        row['comments'] = len(comments.get(row['title'], []))
+
+    comment_counts = defaultdict(int)
+    for comment_list in comments.values():
+        for comment in comment_list:
+            comment_counts[comment['user']] += 1
+    known = {row['voter'] for row in voter_rows}
+    for username in set(users) | set(comment_counts):
+        if username not in known:
+            voter_rows.append({'voter': username, 'votes': 0})
+    for row in voter_rows:
+        user = users.get(row['voter'], {})
+        row['comments'] = comment_counts.get(row['voter'], 0)
+        row['is_admin'] = bool(user.get('is_admin', False))
+        row['banned'] = bool(user.get('banned', False))
+
+    problem_rows.sort(key=lambda row: row['title'])
+    voter_rows.sort(key=lambda row: (-row['votes'], row['voter']))
+    return problem_rows, voter_rows
+
+
+def write_csv(path, rows):
+    fields = []
+    for row in rows:
+        for key in row:
+            if key not in fields:
+                fields.append(key)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线计算题目与投票者统计")
+    parser.add_argument('--votes', default='votes.json', help="votes.json 或 votes.snap")
+    parser.add_argument('--users', default='user.json', help="user.json（可选）")
+    parser.add_argument('--out', default='report', help="报告输出目录")
+    parser.add_argument('--workers', type=int, default=None, help="进程数，默认等于CPU核数")
+    parser.add_argument('--format', choices=['csv', 'json', 'both'], default='both')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    votes, comments, metas, users = load_dataset(args.votes, args.users)
+    loaded = time.perf_counter()
+    problem_rows, voter_rows = analyze(votes, comments, metas, users, args.workers)
+    analyzed = time.perf_counter()
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.format in ('csv', 'both'):
+        write_csv(os.path.join(args.out, 'problems.csv'), problem_rows)
+        write_csv(os.path.join(args.out, 'voters.csv'), voter_rows)
+    if args.format in ('json', 'both'):
+        with open(os.path.join(args.out, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump({'generated_at': time.time(), 'problems': problem_rows, 'voters': voter_rows},
+                      f, ensure_ascii=False, indent=2)
+
+    print(f"题目 {len(problem_rows)} 道，投票者 {len(voter_rows)} 人，"
+          f"读取 {loaded - start:.2f}s，计算 {analyzed - loaded:.2f}s，报告已写入 {args.out}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""投票异常检测（刷票、离群评分）
+
+只依赖 numpy，输入是按投票展开的一组数组，全部计算都是向量化的：
+    - 离群程度：每票相对于该题均值的标准分，统计每位用户的平均偏离和极端票比例
+    - 时间突发：每位用户在滑动时间窗内的最大提交次数（同一次批量提交只算一次），
+      每道题在时间窗内的最大投票数与全部题目的典型峰值相比
+    - 账号关联：两两比较用户在共同题目上的评分差异，几乎一致的账号对视为可疑
+
+主程序的后台线程定期调用 detect()，结果供管理员页面展示。
+"""
+import numpy as np
+
+Z_EXTREME = 3.0  # 标准分超过此值视为极端票
+STD_FLOOR = {'thinking': 100.0, 'implementing': 100.0, 'quality': 0.5}  # 标准差下限，避免票数少时标准分失真
+BURST_WINDOW = 60.0  # 时间突发的窗口（秒）
+BURST_USER_THRESHOLD = 10  # 单个用户窗口内提交次数超过此值视为突发（批量评分表一次提交算一次）
+BURST_PROBLEM_THRESHOLD = 15  # 单道题窗口内投票数至少超过此值才可能视为突发
+BURST_PROBLEM_RATIO = 3.0  # 且超过各题峰值中位数的这么多倍（赛后集中评分时所有题一起升高，不算突发）
+PAIR_MIN_COMMON = 5  # 两个账号至少共同评过这么多题才比较
+PAIR_MAX_RMS = 60.0  # 共同题目上思维/实现评分的均方根差小于此值视为高度一致
+MAX_PAIR_USERS = 2000  # 参与账号关联计算的最多用户数（按投票数取前N）
+PAIR_BLOCK = 1024  # 账号关联计算时每块的题目数
+WEIGHTS = {'deviation': 1.0, 'extreme': 2.0, 'burst': 1.5, 'pairs': 1.0}
+
+
+def _group_mean(values, groups, n_groups):
+    counts = np.bincount(groups, minlength=n_groups)
+    sums = np.bincount(groups, weights=values, minlength=n_groups)
+    return sums / np.maximum(counts, 1), counts
+
+
+def _window_counts(groups, times, window):
+    """每票所在组内，[t - window, t] 时间窗中的投票数（times中NaN的票记为0）"""
+    counts = np.zeros(len(times), dtype=np.int64)
+    valid = ~np.isnan(times)
+    if not valid.any():
+        return counts
+    g = groups[valid]
+    t = times[valid]
+    # 组号作为高位拼成单调的复合键，整体一次 searchsorted 即可
+    span = float(np.nanmax(t) - np.nanmin(t)) + 2 * window + 1.0
+    key = g.astype(float) * span + (t - np.nanmin(t))
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    left = np.searchsorted(sorted_key, sorted_key - window, side='left')
+    window_counts = np.arange(len(sorted_key)) - left + 1
+    result = np.empty(len(sorted_key), dtype=np.int64)
+    result[order] = window_counts
+    counts[valid] = result
+    return counts
+
+
+def _correlated_pairs(voter_idx, problem_idx, thinking, implementing, n_voters, n_problems):
+    """找出在共同题目上评分几乎相同的账号对，返回 [(u, v, 共同题数, 均方根差)]"""
+    per_voter = np.bincount(voter_idx, minlength=n_voters)
+    candidates = np.flatnonzero(per_voter >= PAIR_MIN_COMMON)
+    if len(candidates) < 2:
+        return []
+    candidates = candidates[np.argsort(-per_voter[candidates], kind='stable')[:MAX_PAIR_USERS]]
+    row_of = np.full(n_voters, -1)
+    row_of[candidates] = np.arange(len(candidates))
+    keep = row_of[voter_idx] >= 0
+    rows = row_of[voter_idx[keep]]
+    cols = problem_idx[keep]
+    used_cols, cols = np.unique(cols, return_inverse=True)
+
+    n = len(candidates)
+    pair_sq = np.zeros((n, n))
+    common = np.zeros((n, n))
+    field_values = (thinking[keep], implementing[keep])
+    # 按题目分块构造稠密矩阵，内存占用为 用户数 x 块大小
+    for start in range(0, len(used_cols), PAIR_BLOCK):
+        sel = (cols >= start) & (cols < start + PAIR_BLOCK)
+        r, c = rows[sel], cols[sel] - start
+        shape = (n, min(PAIR_BLOCK, len(used_cols) - start))
+        mask = np.zeros(shape)
+        mask[r, c] = 1.0
+        common += mask @ mask.T
+        for values in field_values:
+            a = np.zeros(shape)
+            a[r, c] = values[sel]
+            a2 = a * a
+            # 仅在双方都投过的题上累计 (a - b)^2
+            pair_sq += a2 @ mask.T + mask @ a2.T - 2 * (a @ a.T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rms = np.sqrt(np.maximum(pair_sq, 0) / (2 * common))
+    iu, ju = np.triu_indices(len(candidates), k=1)
+    hit = (common[iu, ju] >= PAIR_MIN_COMMON) & (rms[iu, ju] < PAIR_MAX_RMS)
+    return [(int(candidates[i]), int(candidates[j]), int(common[i, j]), float(rms[i, j]))
+            for i, j in zip(iu[hit], ju[hit])]
+
+
+def detect(titles, voters, problem_idx, voter_idx, thinking, implementing, quality, times, limit=50):
+    """对全部投票评分，返回按可疑程度排序的用户和题目列表"""
+    n_problems, n_voters = len(titles), len(voters)
+    if len(voter_idx) == 0:
+        return {'users': [], 'problems': [], 'pairs': [], 'burst_window': BURST_WINDOW, 'burst_baseline': 0.0}
+
+    # 离群程度：每票在各字段上的标准分，取最大值
+    z = np.zeros(len(voter_idx))
+    for name, values in (('thinking', thinking), ('implementing', implementing), ('quality', quality)):
+        mean, counts = _group_mean(values, problem_idx, n_problems)
+        sq_mean, _ = _group_mean(values * values, problem_idx, n_problems)
+        std = np.sqrt(np.maximum(sq_mean - mean * mean, 0))
+        std = np.maximum(std, STD_FLOOR[name])
+        field_z = np.abs(values - mean[problem_idx]) / std[problem_idx]
+        field_z[counts[problem_idx] < 3] = 0  # 票数太少的题没有可靠的共识
+        z = np.maximum(z, field_z)
+    mean_z, votes_per_user = _group_mean(z, voter_idx, n_voters)
+    extreme_frac, _ = _group_mean((z > Z_EXTREME).astype(float), voter_idx, n_voters)
+
+    # 时间突发：同一次提交的票时间戳相同，按 (用户, 时间) 去重后按提交次数计
+    user_burst = np.zeros(n_voters, dtype=np.int64)
+    timed = ~np.isnan(times)
+    if timed.any():
+        events = np.unique(np.stack([voter_idx[timed].astype(float), times[timed]]), axis=1)
+        event_voters = events[0].astype(np.int64)
+        np.maximum.at(user_burst, event_voters, _window_counts(event_voters, events[1], BURST_WINDOW))
+    problem_burst = np.zeros(n_problems, dtype=np.int64)
+    np.maximum.at(problem_burst, problem_idx, _window_counts(problem_idx, times, BURST_WINDOW))
+    voted_peaks = problem_burst[problem_burst > 0]
+    problem_baseline = float(np.median(voted_peaks)) if len(voted_peaks) else 0.0
+    problem_threshold = max(BURST_PROBLEM_THRESHOLD, BURST_PROBLEM_RATIO * problem_baseline)
+
+    # 账号关联
+    pairs = _correlated_pairs(voter_idx, problem_idx, thinking, implementing, n_voters, n_problems)
+    partners = np.zeros(n_voters)
+    for u, v, _, _ in pairs:
+        partners[u] += 1
+        partners[v] += 1
+
+    score = (WEIGHTS['deviation'] * mean_z
+             + WEIGHTS['extreme'] * extreme_frac * 3
+             + WEIGHTS['burst'] * np.maximum(user_burst / BURST_USER_THRESHOLD - 1, 0)
+             + WEIGHTS['pairs'] * np.minimum(partners, 5))
+    score[votes_per_user == 0] = 0
+
+    users = []
+    for u in np.argsort(-score, kind='stable')[:limit]:
+        if score[u] <= 0:
+            break
+        reasons = []
+        if extreme_frac[u] > 0:
+            reasons.append(f"极端票 {extreme_frac[u] * 100:.0f}%")
+        if mean_z[u] > 1.5:
+            reasons.append(f"平均偏离 {mean_z[u]:.1f}σ")
+        if user_burst[u] > BURST_USER_THRESHOLD:
+            reasons.append(f"{BURST_WINDOW:.0f}秒内提交 {user_burst[u]} 次")
+        if partners[u]:
+            reasons.append(f"与 {int(partners[u])} 个账号评分高度一致")
+        users.append({'user': voters[u], 'score': float(score[u]), 'votes': int(votes_per_user[u]),
+                      'mean_z': float(mean_z[u]), 'extreme_frac': float(extreme_frac[u]),
+                      'burst': int(user_burst[u]), 'partners': int(partners[u]), 'reasons': reasons})
+
+    problems = [{'title': titles[p], 'burst': int(problem_burst[p])}
+                for p in np.argsort(-problem_burst, kind='stable')[:limit] if problem_burst[p] > problem_threshold]
+    pairs.sort(key=lambda pair: pair[3])
+    return {
+        'users': users,
+        'problems': problems,
+        'pairs': [{'users': (voters[u], voters[v]), 'common': c, 'rms': r} for u, v, c, r in pairs[:limit]],
+        'burst_window': BURST_WINDOW,
+        'burst_baseline': problem_baseline,
+    }
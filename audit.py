@@ -0,0 +1,222 @@
+"""结构化操作审计记录
+
+log_action 在写 log.log 的同时把事件交给 AuditStore，后台线程每秒批量写入 SQLite，
+按用户、题目、操作类型和时间建立索引，管理员按条件查询时不需要扫描整个日志。
+过期事件按保留天数定期删除，删除后增量回收文件空间。
+
+用法:
+    python audit.py import log.log                        # 把已有的 log.log 导入审计库
+    python audit.py query --user alice --since "2025-01-01 20:00"
+    python audit.py query --problem "NOIP2023 T1" --type 评分提交
+"""
+import argparse
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    user TEXT NOT NULL,
+    action TEXT NOT NULL,
+    problem TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_user ON events (user, ts);
+CREATE INDEX IF NOT EXISTS events_problem ON events (problem, ts);
+CREATE INDEX IF NOT EXISTS events_action ON events (action, ts);
+"""
+MAINTENANCE_INTERVAL = 3600  # 清理过期事件的间隔（秒）
+LOG_LINE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) - \w+ - 用户: (.*?), 操作: (.*?)(?:, 详情: (.*))?$')
+DETAIL_PROBLEM = re.compile(r'^题目: (.*?)(?:, (?:思维|内容|原内容|难度|投票者|较易): .*)?$', re.S)
+
+
+class AuditStore:
+    """带索引的审计事件库，写入先进入内存缓冲，由后台线程批量提交"""
+
+    def __init__(self, path, retention_days=180, flush_interval=1.0):
+        self.path = path
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._recorded_actions = set()  # 本进程记录过的操作类型
+        self._stored_actions = None  # 启动前库中已有的操作类型，首次查询时读取一次
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA auto_vacuum = INCREMENTAL')  # 只对新建的库生效
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._last_maintenance = 0
+
+    def record(self, user, action, problem=None, details=None, ts=None):
+        """记录一条事件（只追加到内存缓冲，不做磁盘IO）"""
+        event = (ts if ts is not None else time.time(), str(user), action, problem, details)
+        with self._pending_lock:
+            self._pending.append(event)
+            self._recorded_actions.add(action)
+
+    def flush(self):
+        """把缓冲中的事件在一个事务中写入"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        with self._db_lock, self._conn:
+            self._conn.executemany('INSERT INTO events (ts, user, action, problem, details) VALUES (?, ?, ?, ?, ?)', pending)
+        return len(pending)
+
+    def compact(self):
+        """删除超过保留期的事件并回收空间，返回删除的条数"""
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with self._db_lock:
+            with self._conn:
+                deleted = self._conn.execute('DELETE FROM events WHERE ts < ?', (cutoff,)).rowcount
+            if deleted:
+                self._conn.execute('PRAGMA incremental_vacuum')
+                self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return deleted
+
+    def run(self):
+        """后台线程：定期写入缓冲并清理过期事件"""
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.time() - self._last_maintenance >= MAINTENANCE_INTERVAL:
+                    self._last_maintenance = time.time()
+                    self.compact()
+            except sqlite3.Error as e:
+                # 不能用 log_action 报错，否则会再次写入审计库
+                import logging
+                logging.error(f"写入审计记录失败: {e}")
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def query(self, user=None, problem=None, action=None, since=None, until=None, limit=200):
+        """按条件查询事件，按时间从新到旧；problem 中的 * 表示通配"""
+        self.flush()  # 让刚发生的事件也能查到
+        where, params = [], []
+        for column, value in (('user', user), ('action', action)):
+            if value:
+                where.append(f'{column} = ?')
+                params.append(value)
+        if problem:
+            if '*' in problem:
+                where.append("problem LIKE ? ESCAPE '\\'")
+                params.append(problem.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_').replace('*', '%'))
+            else:
+                where.append('problem = ?')
+                params.append(problem)
+        if since is not None:
+            where.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('ts <= ?')
+            params.append(until)
+        sql = 'SELECT ts, user, action, problem, details FROM events'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY ts DESC LIMIT ?'
+        params.append(limit)
+        with self._db_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{'ts': ts, 'user': u, 'action': a, 'problem': p, 'details': d} for ts, u, a, p, d in rows]
+
+    def actions(self):
+        """已记录过的操作类型（库中已有的只在首次调用时扫描一次，之后由 record 在内存中维护）"""
+        if self._stored_actions is None:
+            with self._db_lock:
+                if self._stored_actions is None:
+                    self._stored_actions = {row[0] for row in self._conn.execute('SELECT DISTINCT action FROM events')}
+        with self._pending_lock:
+            return sorted(self._stored_actions | self._recorded_actions)
+
+    def count(self):
+        with self._db_lock:
+            return self._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+def parse_log_line(line):
+    """解析 log_action 写入 log.log 的一行，返回 (时间戳, 用户, 操作, 详情)，不是操作记录时返回None"""
+    match = LOG_LINE.match(line.rstrip('\n'))
+    if not match:
+        return None
+    moment, millis, user, action, details = match.groups()
+    ts = datetime.strptime(moment, '%Y-%m-%d %H:%M:%S').timestamp() + int(millis) / 1000
+    return ts, user, action, details
+
+
+def problem_from_details(details):
+    """从详情文本 '题目: xxx, ...' 中取出题目名"""
+    match = DETAIL_PROBLEM.match(details or '')
+    return match.group(1) if match else None
+
+
+def import_log(store, path):
+    """把 log.log 中的历史操作导入审计库，返回导入条数"""
+    n = 0
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parsed = parse_log_line(line)
+            if parsed:
+                ts, user, action, details = parsed
+                store.record(user, action, problem_from_details(details), details, ts=ts)
+                n += 1
+                if n % 10000 == 0:
+                    store.flush()
+    store.flush()
+    return n
+
+
+def parse_time(text):
+    """解析 'YYYY-mm-dd[ HH:MM[:SS]]' 格式的时间"""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text.strip(), fmt).timestamp()
+        except ValueError:
+            pass
+    raise ValueError(f"无法解析时间: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="操作审计库的导入与查询")
+    parser.add_argument('action', choices=['import', 'query'])
+    parser.add_argument('log', nargs='?', default='log.log', help="import 时读取的日志文件")
+    parser.add_argument('--db', default='audit.db')
+    parser.add_argument('--user')
+    parser.add_argument('--problem')
+    parser.add_argument('--type', dest='event_action', help="操作类型，如 评分提交")
+    parser.add_argument('--since', type=parse_time)
+    parser.add_argument('--until', type=parse_time)
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+
+    store = AuditStore(args.db, retention_days=0)
+    start = time.perf_counter()
+    if args.action == 'import':
+        n = import_log(store, args.log)
+        print(f"已导入 {n} 条记录，耗时 {time.perf_counter() - start:.2f}s")
+    else:
+        for event in store.query(args.user, args.problem, args.event_action, args.since, args.until, args.limit):
+            moment = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['ts']))
+            print(f"{moment}  {event['user']}  {event['action']}  {event['details'] or ''}")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""增量备份与按时间点恢复
+
+备份目录中有两种文件，文件名中带序号和时间戳，只需列目录就能知道备份链的结构:
+    00000012-1760000000-base.json.gz    全量: 投票、评论、题目元数据和用户
+    00000013-1760000300-delta.json.gz   增量: 自上次备份以来变化过的题目（整题替换）和用户
+恢复某个时间点时，取该时间之前最近的一个全量备份，再按顺序应用其后的增量。
+备份文件由服务器的后台线程定期写入（见 main.run_backup），本模块只负责文件格式、清理和恢复。
+
+用法:
+    python backup.py list                                    # 列出备份
+    python backup.py restore --out restored                  # 恢复到最新状态
+    python backup.py restore --at "2025-01-01 12:00" --out .  # 恢复到指定时间点（先停止服务器）
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+BACKUP_NAME = re.compile(r'^(\d{8})-(\d+)-(base|delta)\.json\.gz$')
+
+
+def backup_path(backup_dir, seq, timestamp, kind):
+    return os.path.join(backup_dir, f"{seq:08d}-{int(timestamp)}-{kind}.json.gz")
+
+
+def list_backups(backup_dir):
+    """按序号列出备份文件 [{'seq', 'time', 'kind', 'path', 'size'}]"""
+    if not os.path.isdir(backup_dir):
+        return []
+    result = []
+    for name in os.listdir(backup_dir):
+        match = BACKUP_NAME.match(name)
+        if match:
+            path = os.path.join(backup_dir, name)
+            result.append({'seq': int(match.group(1)), 'time': int(match.group(2)), 'kind': match.group(3),
+                           'path': path, 'size': os.path.getsize(path)})
+    result.sort(key=lambda item: item['seq'])
+    return result
+
+
+def next_seq(backup_dir):
+    backups = list_backups(backup_dir)
+    return backups[-1]['seq'] + 1 if backups else 1
+
+
+def write_backup(backup_dir, seq, kind, payload, timestamp=None):
+    """把已编码的JSON写成压缩的备份文件（先写临时文件再原子替换），返回文件路径"""
+    os.makedirs(backup_dir, exist_ok=True)
+    path = backup_path(backup_dir, seq, timestamp or time.time(), kind)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(gzip.compress(payload, compresslevel=6))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_backup(path):
+    with open(path, 'rb') as f:
+        return json.loads(gzip.decompress(f.read()).decode('utf-8'))
+
+
+def apply_delta(state, delta):
+    """把增量应用到恢复中的状态上：题目整题替换，值为None的用户表示已删除"""
+    for title, entry in delta.get('problems', {}).items():
+        for key, target in (('votes', state['votes']), ('comments', state['comments']), ('meta', state['problem_metas'])):
+            value = entry.get(key)
+            if value:
+                target[title] = value
+            else:
+                target.pop(title, None)
+    for username, user in delta.get('users', {}).items():
+        if user is None:
+            state['users'].pop(username, None)
+        else:
+            state['users'][username] = user
+
+
+def restore_state(backup_dir, at=None):
+    """恢复到时间点at（时间戳，默认最新）的状态，返回 (state, 用到的备份列表)"""
+    backups = [item for item in list_backups(backup_dir) if at is None or item['time'] <= at]
+    base_pos = max((i for i, item in enumerate(backups) if item['kind'] == 'base'), default=None)
+    if base_pos is None:
+        raise ValueError("指定时间之前没有全量备份")
+    chain = backups[base_pos:]
+    base = read_backup(chain[0]['path'])
+    # 空的投票/评论列表与不存在等价，和增量的处理保持一致
+    state = {key: {name: value for name, value in base.get(key, {}).items() if value or key == 'users'}
+             for key in ('votes', 'comments', 'problem_metas', 'users')}
+    for item in chain[1:]:
+        apply_delta(state, read_backup(item['path']))
+    return state, chain
+
+
+def prune(backup_dir, keep_bases, max_age_days=None):
+    """按保留策略删除旧的备份链（全量及其后的增量），至少保留最新的一条链，返回删除的文件"""
+    backups = list_backups(backup_dir)
+    bases = [item for item in backups if item['kind'] == 'base']
+    if not bases:
+        return []
+    keep = bases[-keep_bases:] if keep_bases else bases
+    if max_age_days:
+        cutoff = time.time() - max_age_days * 86400
+        # 链的最后时间取下一个全量的时间，仍在保留期内的链都要保留
+        keep = [base for base in keep if base is bases[-1] or
+                bases[bases.index(base) + 1]['time'] >= cutoff]
+    oldest = keep[0]['seq']
+    removed = []
+    for item in backups:
+        if item['seq'] < oldest:
+            os.remove(item['path'])
+            removed.append(item['path'])
+    return removed
+
+
+def write_restored(state, out_dir, votes_file='votes.json', user_file='user.json'):
+    """把恢复出的状态写成服务器使用的数据文件"""
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, votes_file), 'w', encoding='utf-8') as f:
+        json.dump({'votes': state['votes'], 'comments': state['comments'], 'problem_metas': state['problem_metas']},
+                  f, ensure_ascii=False, indent=2)
+    with open(os.path.join(out_dir, user_file), 'w', encoding='utf-8') as f:
+        json.dump(state['users'], f, ensure_ascii=False, indent=2)
+
+
+def parse_time(text):
+    """解析时间点，支持时间戳和 'YYYY-mm-dd HH:MM[:SS]'"""
+    if re.fullmatch(r'\d+(\.\d+)?', text):
+        return float(text)
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"无法解析时间: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量备份的查看与按时间点恢复")
+    parser.add_argument('action', choices=['list', 'restore'])
+    parser.add_argument('--dir', default='backups', help="备份目录")
+    parser.add_argument('--at', type=parse_time, default=None, help="恢复到的时间点，默认最新")
+    parser.add_argument('--out', default='restored', help="恢复的数据文件输出目录")
+    args = parser.parse_args()
+
+    if args.action == 'list':
+        for item in list_backups(args.dir):
+            moment = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['time']))
+            print(f"{item['seq']:>8}  {moment}  {item['kind']:<5}  {item['size'] / 1024:>9.1f} KB")
+        return
+
+    start = time.perf_counter()
+    state, chain = restore_state(args.dir, args.at)
+    write_restored(state, args.out)
+    print(f"已用 1 个全量和 {len(chain) - 1} 个增量恢复到 "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(chain[-1]['time']))}，"
+          f"题目 {len(state['votes'])} 道，用户 {len(state['users'])} 人，"
+          f"耗时 {time.perf_counter() - start:.2f}s，已写入 {args.out}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""评分均值的自助法（bootstrap）置信区间
+
+对一道题的 n 张票有放回地重抽样 RESAMPLES 次，取各次均值的分位数作为置信区间。
+每块重抽样一次生成全部下标，用一次 bincount 折算成 (次数, n) 的计数矩阵，
+所有字段的均值再由一次矩阵乘法得到；票数很多时按 MAX_CELLS 分块，控制内存。
+
+主程序的后台线程只对投票有变化的题目调用 mean_intervals()，结果按题目版本缓存。
+"""
+import numpy as np
+
+RESAMPLES = 2000
+LEVEL = 0.95
+MAX_CELLS = 1 << 20  # 计数矩阵一块的最大元素数
+
+
+def mean_intervals(samples, resamples=RESAMPLES, level=LEVEL, rng=None):
+    """samples: (字段数, 票数) 数组，返回 (字段数, 2) 的置信区间下界和上界"""
+    samples = np.asarray(samples, dtype=float)
+    n = samples.shape[1]
+    rng = rng if rng is not None else np.random.default_rng()
+    means = np.empty((resamples, samples.shape[0]))
+    chunk = max(1, MAX_CELLS // n)
+    for start in range(0, resamples, chunk):
+        stop = min(resamples, start + chunk)
+        rows = stop - start
+        picks = rng.integers(0, n, size=(rows, n)) + np.arange(rows)[:, None] * n  # 每行的下标错开，一次计数
+        counts = np.bincount(picks.ravel(), minlength=rows * n).reshape(rows, n)
+        means[start:stop] = counts @ samples.T / n
+    alpha = (1 - level) / 2
+    return np.quantile(means, [alpha, 1 - alpha], axis=0).T
@@ -0,0 +1,165 @@
+"""多题库托管
+
+一个进程托管多场比赛。每场比赛是根目录下 contests/<名称>/ 中的一组数据文件
+（problem.txt 或 problems.d/、votes.json、votes.snap、comparisons.log、backups/），
+用户、管理员和标签权限使用根目录的 user.json、admin.txt，在所有比赛间共享。
+
+每场比赛在首次访问时才加载，加载后是 main 模块的一个独立实例（各自的全局数据、缓存和后台线程）。
+已加载的比赛超过数量上限或估算内存超过预算时，按最近最少使用淘汰没有在线会话的比赛：
+先保存数据并停止其后台线程，再释放整个实例。
+
+用法:
+    python contests.py                                   # 托管 contests/ 下的所有比赛，端口8999
+    python contests.py --dir archive --max-loaded 4 --memory-mb 256
+访问 / 选择比赛，或直接访问 /?app=<比赛名>；统计API为 /api/<比赛名>/stats，
+只对已加载的比赛提供数据，未加载的比赛返回503，不会因为轮询而加载比赛。
+运行中新建的比赛目录无需重启即可访问。
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import re
+from collections import OrderedDict
+
+import main
+import metrics
+
+CONTEST_NAME = re.compile(r'^[A-Za-z0-9_-]+$')  # 比赛目录名同时用作路由名
+EVICT_INTERVAL = 60  # 定期检查内存预算的间隔（秒）
+
+
+class ContestHost:
+    """按需加载比赛实例并按LRU淘汰（所有方法都在事件循环线程中调用）"""
+
+    def __init__(self, root, max_loaded=8, memory_budget=512 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.max_loaded = max_loaded
+        self.memory_budget = memory_budget
+        self.loaded = OrderedDict()  # {name: module}，最近使用的在末尾
+
+    def names(self):
+        """根目录下所有比赛名"""
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if CONTEST_NAME.match(name) and os.path.isdir(path) and any(
+                    os.path.exists(os.path.join(path, f)) for f in (main.PROBLEM_FILE, main.PROBLEM_DIR, main.VOTES_FILE)):
+                result.append(name)
+        return result
+
+    def get(self, name):
+        """取得比赛实例，未加载时加载；不存在的比赛抛出KeyError"""
+        module = self.loaded.get(name)
+        if module is None:
+            if name not in self.names():
+                raise KeyError(name)
+            module = self.loaded[name] = self._load(name)
+            self.evict(keep=name)
+        self.loaded.move_to_end(name)
+        return module
+
+    def peek(self, name):
+        """已加载的比赛实例，不加载也不改变LRU顺序；未加载时返回None，不存在的比赛抛出KeyError"""
+        module = self.loaded.get(name)
+        if module is None and name not in self.names():
+            raise KeyError(name)
+        return module
+
+    def stats_payload(self, name):
+        """统计API的响应；未加载的比赛返回None，避免在事件循环上同步加载并打乱LRU"""
+        module = self.peek(name)
+        return module.stats_payload() if module is not None else None
+
+    def _load(self, name):
+        spec = importlib.util.spec_from_file_location(f"contest_{name}", main.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        base = os.path.join(self.root, name)
+        for attr in ('VOTES_FILE', 'SNAPSHOT_FILE', 'PROBLEM_FILE', 'PROBLEM_DIR', 'BACKUP_DIR',
+                     'COMPARISON_FILE'):
+            setattr(module, attr, os.path.join(base, getattr(main, attr)))
+        if main.MIRROR_DIR:
+            module.MIRROR_DIR = os.path.join(main.MIRROR_DIR, name)
+        # 共享用户、管理员、权限和审计
+        module.USER_FILE = os.path.abspath(main.USER_FILE)
+        module.ADMIN_FILE = os.path.abspath(main.ADMIN_FILE)
+        module.users = main.users
+        module.OWNS_USERS = False  # 用户已由宿主加载，重新加载会丢掉内存中尚未保存的修改
+        module._permission_epoch = main._permission_epoch
+        module._run_password_job = main._run_password_job  # 共用宿主的密码哈希线程池，并发上限不随比赛数增加
+        module.audit_store = main.audit_store
+        with main.startup_phase(f"加载比赛 {name}"):
+            module.warm_up()
+        module.start_session_sweeper()
+        main.log_action("system", "加载比赛", name)
+        return module
+
+    def memory(self):
+        return sum(module.memory_estimate() for module in self.loaded.values())
+
+    def evict(self, keep=None):
+        """超出数量上限或内存预算时，按LRU卸载没有在线会话的比赛"""
+        while len(self.loaded) > 1 and (len(self.loaded) > self.max_loaded or self.memory() > self.memory_budget):
+            victim = next((name for name, module in self.loaded.items() if name != keep and not module.sessions), None)
+            if victim is None:
+                break
+            module = self.loaded.pop(victim)
+            module.shutdown()
+            main.log_action("system", "卸载比赛", f"{victim}, 已加载 {len(self.loaded)} 场, "
+                                                  f"估算内存 {self.memory() / 1024 / 1024:.1f} MB")
+
+    async def index(self):
+        """唯一注册的pywebio应用：/?app=<比赛名> 转发到该比赛，其余情况显示比赛选择页
+
+        pywebio 对未注册的 app 名称会使用 index，因此启动后新增的比赛目录无需重启即可访问
+        """
+        name = main.info.request.query_arguments.get('app', [b''])[0].decode('utf-8', 'replace')
+        if name and name != 'index' and name in self.names():
+            await self.get(name).main()
+            return
+        main.set_env(title="题目评分系统", output_max_width='95%')
+        main.put_markdown("# 题目评分系统")
+        names = self.names()
+        if not names:
+            main.put_text(f"{self.root} 下没有比赛")
+            return
+        rows = [['比赛', '状态', '']]
+        for name in names:
+            state = f"已加载，在线 {len(self.loaded[name].sessions)} 人" if name in self.loaded else "未加载"
+            rows.append([name, state, main.put_link("进入", app=name)])
+        main.put_table(rows)
+
+
+def run(root, port=8999, max_loaded=8, memory_mb=512):
+    main.setup_logging()
+    main.open_audit_store()
+    main.load_webio()
+    main.load_users()
+    host = ContestHost(root, max_loaded, memory_mb * 1024 * 1024)
+    names = host.names()
+    logging.info(f"托管比赛 {len(names)} 场: {', '.join(names)}")
+
+    metrics.register_gauge('vote_contests_loaded', "已加载的比赛数", lambda: len(host.loaded))
+    metrics.register_gauge('vote_sessions', "在线会话数", lambda: sum(len(m.sessions) for m in host.loaded.values()))
+    metrics.register_gauge('vote_memory_estimate_bytes', "估算内存占用", host.memory)
+    if main.API_PORT:
+        main.start_api_server(main.API_PORT, [(r"/api/([^/]+)/stats", host.stats_payload)])
+    if main.METRICS_PORT:
+        main.start_metrics_server(main.METRICS_PORT)
+    import tornado.ioloop
+    tornado.ioloop.PeriodicCallback(host.evict, EVICT_INTERVAL * 1000).start()
+
+    main.start_server({'index': host.index}, port=port, debug=True, cdn=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="在一个进程中托管多场比赛的评分系统")
+    parser.add_argument('--dir', default='contests', help="比赛根目录，每场比赛一个子目录")
+    parser.add_argument('--port', type=int, default=8999)
+    parser.add_argument('--max-loaded', type=int, default=8, help="同时加载的比赛数上限")
+    parser.add_argument('--memory-mb', type=int, default=512, help="已加载比赛的估算内存预算（MB）")
+    args = parser.parse_args()
+    run(args.dir, args.port, args.max_loaded, args.memory_mb)
@@ -0,0 +1,326 @@
+"""并发会话压力测试工具
+
+在本机启动评分系统（或连接已在本机运行的实例），用 websocket 直接模拟大量 pywebio 会话，
+无需浏览器。每个会话先登录，然后按配置的比例执行排序、查看详情、评分、评论等操作，
+最后按操作类型输出 p50/p95/p99 延迟和整体吞吐量。
+
+用法:
+    python loadtest.py --sessions 100 --duration 60
+    python loadtest.py --sessions 50 --mix view=5,sort=2,vote=2,comment=1 --think 0.5
+    python loadtest.py --port 8999 --no-server   # 压测本机已启动的实例
+    python loadtest.py --mix vote=1 --write-rate 0   # 保留服务器默认的写操作限流，被拒绝的写操作计入"限流"列
+"""
+import argparse
+import asyncio
+import html
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from tornado.websocket import websocket_connect
+
+DEFAULT_MIX = {'view': 4, 'sort': 2, 'vote': 2, 'comment': 1}
+SORT_COLUMNS = ['题目', '知识点难度', '投票数', '思维难度', '实现难度', '综合评分', '质量']
+TIMEOUT = 30  # 单个操作等待响应的最长时间（秒）
+REJECT_TOASTS = ('操作过于频繁', '当前提交人数过多', '服务器繁忙')  # 写操作准入控制拒绝时的提示
+
+
+class WriteRejected(Exception):
+    """写操作被服务器的准入控制拒绝"""
+
+
+def percentile(sorted_values, p):
+    """已排序列表的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p * len(sorted_values) / 100.0) - 1))
+    return sorted_values[k]
+
+
+def iter_specs(obj):
+    """遍历消息中嵌套的所有输出组件描述"""
+    if isinstance(obj, dict):
+        yield obj
+        for value in obj.values():
+            yield from iter_specs(value)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from iter_specs(value)
+
+
+class SimulatedSession:
+    """一个模拟的 pywebio 会话，按协议回应服务器的指令"""
+
+    def __init__(self, url, username, password):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.ws = None
+        self.row_callback = None  # 题目列表的委托回调id
+        self.titles = []
+        self.buttons = {}  # {按钮文字: (callback_id, value)}，以最近一次渲染为准
+
+    async def connect(self):
+        self.ws = await websocket_connect(self.url, max_message_size=64 * 1024 * 1024)
+
+    async def send(self, event, task_id, data):
+        await self.ws.write_message(json.dumps({'event': event, 'task_id': task_id, 'data': data}))
+
+    async def wait_for(self, predicate):
+        """读取服务器消息直到满足条件，期间自动回应 eval_js 并记录按钮"""
+        while True:
+            raw = await asyncio.wait_for(self.ws.read_message(), TIMEOUT)
+            if raw is None:
+                raise ConnectionError("连接已关闭")
+            messages = json.loads(raw)
+            for msg in messages if isinstance(messages, list) else [messages]:
+                if msg['command'] == 'run_script' and msg['spec'].get('eval'):
+                    await self.send('js_yield', msg['task_id'], None)  # 模拟没有任何cookie的浏览器
+                self._scan(msg)
+                if predicate(msg):
+                    return msg
+
+    def _scan(self, msg):
+        for spec in iter_specs(msg.get('spec')):
+            if spec.get('type') == 'buttons' and spec.get('callback_id'):
+                for button in spec['buttons']:
+                    self.buttons[button['label']] = (spec['callback_id'], button['value'])
+            elif spec.get('type') == 'html' and 'data-act=' in str(spec.get('content')):
+                content = spec['content']
+                match = re.search(r"WebIO\.pushData\([^)]*,'([^']+)'\)", html.unescape(content))
+                if match:
+                    self.row_callback = match.group(1)
+                self.titles = sorted({html.unescape(t) for t in re.findall(r'data-title="([^"]*)"', content)})
+
+    @staticmethod
+    def is_list(msg):
+        return msg['command'] == 'output' and any(
+            spec.get('type') == 'html' and 'data-act=' in str(spec.get('content')) for spec in iter_specs(msg.get('spec')))
+
+    @staticmethod
+    def is_rejected(msg):
+        return msg['command'] == 'toast' and any(text in str(msg['spec'].get('content')) for text in REJECT_TOASTS)
+
+    async def wait_for_write(self, predicate):
+        """提交写操作后等待结果，被限流时抛出 WriteRejected（被拒绝的操作不会刷新页面）"""
+        msg = await self.wait_for(lambda m: predicate(m) or self.is_rejected(m))
+        if self.is_rejected(msg):
+            raise WriteRejected(msg['spec'].get('content'))
+        return msg
+
+    @staticmethod
+    def is_input(msg):
+        return msg['command'] == 'input_group'
+
+    @staticmethod
+    def is_popup(msg):
+        return msg['command'] == 'popup'
+
+    async def click(self, label):
+        callback_id, value = self.buttons[label]
+        await self.send('callback', callback_id, value)
+
+    # 以下每个操作返回时即视为完成，延迟由调用方计时
+    async def login(self):
+        await self.connect()
+        msg = await self.wait_for(self.is_input)
+        await self.send('from_submit', msg['task_id'], {'username': self.username, 'password': self.password})
+        await self.wait_for(self.is_list)
+
+    async def sort(self):
+        prefix = random.choice(SORT_COLUMNS)
+        label = next(label for label in self.buttons if label.split(' ')[0] == prefix)
+        await self.click(label)
+        await self.wait_for(self.is_list)
+
+    async def view(self):
+        await self.send('callback', self.row_callback, {'act': 'view', 'title': random.choice(self.titles)})
+        await self.wait_for(self.is_popup)
+
+    async def vote(self):
+        await self.send('callback', self.row_callback, {'act': 'vote', 'title': random.choice(self.titles)})
+        msg = await self.wait_for(self.is_input)
+        await self.send('from_submit', msg['task_id'], {
+            'thinking': random.randint(800, 3500),
+            'implementing': random.randint(800, 3500),
+            'quality': round(random.uniform(-5, 5), 1),
+        })
+        await self.wait_for_write(self.is_list)
+
+    async def comment(self):
+        await self.view()
+        await self.click('添加评论')
+        msg = await self.wait_for(self.is_input)
+        await self.send('from_submit', msg['task_id'], {'text': f"压测评论 {random.random():.6f}"})
+        await self.wait_for_write(self.is_popup)
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+
+async def run_session(index, args, mix, results, deadline):
+    session = SimulatedSession(args.url, f"{args.user_prefix}{index}", args.password)
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    try:
+        start = time.perf_counter()
+        await session.login()
+        results['login'].append(time.perf_counter() - start)
+        actions, weights = zip(*mix.items())
+        done = 0
+        while time.perf_counter() < deadline and (not args.actions or done < args.actions):
+            if args.think:
+                await asyncio.sleep(random.expovariate(1.0 / args.think))
+            action = random.choices(actions, weights)[0]
+            start = time.perf_counter()
+            try:
+                await getattr(session, action)()
+            except WriteRejected:
+                results['rejected'][action] += 1
+                continue
+            except (asyncio.TimeoutError, KeyError, IndexError, StopIteration) as e:
+                results['errors'][action] += 1
+                if args.verbose:
+                    print(f"会话{index} {action} 失败: {e!r}", file=sys.stderr)
+                continue
+            results[action].append(time.perf_counter() - start)
+            done += 1
+    except Exception as e:
+        results['errors']['login'] += 1
+        if args.verbose:
+            print(f"会话{index} 异常: {e!r}", file=sys.stderr)
+    finally:
+        session.close()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"未知操作: {name}，可选: {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(args):
+    """在临时数据目录中启动服务器子进程"""
+    workdir = tempfile.mkdtemp(prefix='vote-loadtest-')
+    if args.data_dir:
+        for name in ('problem.txt', 'votes.json', 'votes.snap', 'user.json', 'admin.txt'):
+            if os.path.exists(os.path.join(args.data_dir, name)):
+                shutil.copy(os.path.join(args.data_dir, name), workdir)
+        if os.path.isdir(os.path.join(args.data_dir, 'problems.d')):
+            shutil.copytree(os.path.join(args.data_dir, 'problems.d'), os.path.join(workdir, 'problems.d'))
+    env = dict(os.environ, VOTE_API_PORT='0', VOTE_METRICS_PORT='0', VOTE_LIST_RENDER='html',
+               PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    if args.write_rate:
+        # 默认放开写操作限流，否则每个模拟用户连续写10次后就被拒绝，测不出持续写入的性能
+        env['VOTE_WRITE_RATE_PER_USER'] = str(args.write_rate)
+        env['VOTE_WRITE_RATE_GLOBAL'] = str(args.write_rate * max(args.sessions, 1))
+    proc = subprocess.Popen([sys.executable, '-c', f'import main; main.run_server(port={args.port})'],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', args.port), timeout=0.1):
+                return proc, workdir
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("服务器启动超时")
+
+
+def report(results, elapsed, as_json=False):
+    rows = []
+    total = 0
+    for action in ['login'] + list(DEFAULT_MIX):
+        values = sorted(results.get(action, []))
+        total += len(values)
+        if not values and not results['errors'][action] and not results['rejected'][action]:
+            continue
+        rows.append({
+            'action': action,
+            'count': len(values),
+            'errors': results['errors'][action],
+            'rejected': results['rejected'][action],
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': (values[-1] if values else 0) * 1000,
+        })
+    throughput = total / elapsed if elapsed > 0 else 0
+    if as_json:
+        print(json.dumps({'elapsed_s': elapsed, 'throughput': throughput, 'actions': rows}, ensure_ascii=False, indent=2))
+        return
+    print(f"{'操作':<10}{'次数':>8}{'失败':>6}{'限流':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for row in rows:
+        print(f"{row['action']:<10}{row['count']:>8}{row['errors']:>6}{row['rejected']:>6}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    print(f"总耗时 {elapsed:.1f}s，完成操作 {total} 次，吞吐量 {throughput:.1f} 次/秒")
+
+
+async def run(args):
+    mix = args.mix or DEFAULT_MIX
+    results = defaultdict(list)
+    results['errors'] = defaultdict(int)
+    results['rejected'] = defaultdict(int)
+    start = time.perf_counter()
+    deadline = start + args.ramp + args.duration
+    await asyncio.gather(*(run_session(i, args, mix, results, deadline) for i in range(args.sessions)))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评分系统并发会话压力测试（仅限本机）")
+    parser.add_argument('--sessions', type=int, default=20, help="并发会话数")
+    parser.add_argument('--duration', type=float, default=30, help="每个会话的持续时间（秒）")
+    parser.add_argument('--actions', type=int, default=0, help="每个会话最多执行的操作数，0表示不限")
+    parser.add_argument('--mix', type=parse_mix, default=None, help="操作比例，如 view=4,sort=2,vote=2,comment=1")
+    parser.add_argument('--think', type=float, default=1.0, help="操作间平均思考时间（秒），0表示不等待")
+    parser.add_argument('--ramp', type=float, default=5.0, help="会话在此时间内陆续建立（秒）")
+    parser.add_argument('--port', type=int, default=0, help="服务器端口，默认自动选择空闲端口")
+    parser.add_argument('--no-server', action='store_true', help="不启动服务器，直接压测本机已运行的实例")
+    parser.add_argument('--data-dir', default=None, help="复制该目录中的题库和数据作为压测初始数据")
+    parser.add_argument('--write-rate', type=float, default=1000,
+                        help="启动的服务器中每个用户每秒允许的写操作数，默认基本不限流；0表示使用服务器的默认限流")
+    parser.add_argument('--user-prefix', default='loadtest', help="模拟用户名前缀")
+    parser.add_argument('--password', default='loadtest', help="模拟用户密码")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出结果")
+    parser.add_argument('--verbose', action='store_true', help="输出每个失败操作的原因")
+    args = parser.parse_args()
+
+    if args.no_server and not args.port:
+        parser.error("--no-server 需要指定 --port")
+    args.port = args.port or free_port()
+    args.url = f"ws://127.0.0.1:{args.port}/?app=index"
+
+    proc = workdir = None
+    if not args.no_server:
+        proc, workdir = start_local_server(args)
+    try:
+        results, elapsed = asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+    report(results, elapsed, args.json)
+
+
+if __name__ == '__main__':
+    main()
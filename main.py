@@ -1,32 +1,296 @@
 import json
 import time
 import threading
-import asyncio
 import hashlib
+import hmac
+import html
 import os
-from collections import defaultdict
-import numpy as np
-from pywebio import start_server, config
-from pywebio.input import input, input_group, select, textarea, PASSWORD, NUMBER, FLOAT, TEXT
-from pywebio.output import put_button, put_table, put_text, put_row, put_column, put_markdown, put_collapse, popup, toast, clear, put_html, put_link, put_file
-from pywebio.session import run_async, run_js, eval_js, set_env, defer_call, info as session_info, local
-from pywebio.pin import put_input, pin_wait_change, pin
-from math import *
+import importlib
 import logging
+import random
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
 
+import metrics
+
+# pywebio 体积较大，仅在启动服务器时才导入（见 load_webio），
+# 这样离线工具 import main 时无需承担其导入开销
+WEBIO_NAMES = {
+    'pywebio': ['start_server', 'config'],
+    'pywebio.input': ['input', 'input_group', 'select', 'textarea', 'actions', 'PASSWORD', 'NUMBER', 'FLOAT', 'TEXT'],
+    'pywebio.output': ['put_button', 'put_table', 'put_text', 'put_row', 'put_column', 'put_markdown', 'put_collapse',
+                       'popup', 'toast', 'clear', 'put_html', 'put_link', 'put_file', 'put_scope'],
+    'pywebio.session': ['run_async', 'run_js', 'eval_js', 'set_env', 'defer_call', 'local', 'info', 'get_current_session',
+                        'run_asyncio_coroutine'],
+    'pywebio.io_ctrl': ['output_register_callback'],
+}
+_webio_loaded = False
+
+# 上面列出的名称在 load_webio() 之前为None；在此显式声明，方便阅读和静态检查
+start_server = config = None
+input = input_group = select = textarea = actions = PASSWORD = NUMBER = FLOAT = TEXT = None
+put_button = put_table = put_text = put_row = put_column = put_markdown = put_collapse = None
+popup = toast = clear = put_html = put_link = put_file = put_scope = None
+run_async = run_js = eval_js = set_env = defer_call = local = info = get_current_session = None
+run_asyncio_coroutine = None
+output_register_callback = None
+
+def load_webio():
+    """导入pywebio并把常用名称注入到模块全局命名空间"""
+    global _webio_loaded
+    if _webio_loaded:
+        return
+    g = globals()
+    for module_name, names in WEBIO_NAMES.items():
+        module = importlib.import_module(module_name)
+        for name in names:
+            g[name] = getattr(module, name)
+    _webio_loaded = True
+
+COMMENT_PAGE_SIZE = 20  # 评论每页条数
+RATING_SHEET_MAX = 50  # 批量评分表一次最多的题目数
+
+class CommentThread:
+    """单个题目的评论：按id有序存储，删除O(1)，支持按游标从新到旧分页"""
+    
+    def __init__(self, items=()):
+        self.by_id = {}  # {comment_id: comment}，id递增，插入顺序即时间顺序
+        self._ids = []  # 递增的id列表，删除时保留墓碑，墓碑过多时压缩
+        for comment in items:
+            self.add(comment)
+    
+    def add(self, comment):
+        """添加评论，没有id时自动分配"""
+        if 'id' not in comment:
+            comment['id'] = new_comment_id()
+        if self._ids and comment['id'] <= self._ids[-1]:
+            raise ValueError(f"评论id必须递增: {comment['id']}")
+        self.by_id[comment['id']] = comment
+        self._ids.append(comment['id'])
+        return comment
+    
+    def get(self, comment_id):
+        return self.by_id.get(comment_id)
+    
+    def remove(self, comment_id):
+        """按id删除评论，返回被删除的评论（不存在时返回None）"""
+        comment = self.by_id.pop(comment_id, None)
+        if comment is not None and len(self._ids) > 2 * len(self.by_id) + 32:
+            self._ids = [i for i in self._ids if i in self.by_id]
+        return comment
+    
+    def remove_where(self, predicate):
+        """删除满足条件的全部评论，返回删除数量"""
+        doomed = [i for i, c in self.by_id.items() if predicate(c)]
+        for comment_id in doomed:
+            self.remove(comment_id)
+        return len(doomed)
+    
+    def page(self, before=None, limit=COMMENT_PAGE_SIZE):
+        """从新到旧返回id小于before的最多limit条评论，以及下一页的游标（没有更多时为None）"""
+        from bisect import bisect_left
+        pos = len(self._ids) if before is None else bisect_left(self._ids, before)
+        result = []
+        while pos > 0 and len(result) < limit:
+            pos -= 1
+            comment = self.by_id.get(self._ids[pos])
+            if comment is not None:
+                result.append(comment)
+        has_more = any(self._ids[i] in self.by_id for i in range(pos - 1, -1, -1))
+        return result, (result[-1]['id'] if result and has_more else None)
+    
+    def to_list(self):
+        return list(self.by_id.values())
+    
+    def __len__(self):
+        return len(self.by_id)
+    
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+_comment_ids = [0]  # 最近分配的评论id
+
+def new_comment_id():
+    """分配新的全局递增评论id"""
+    _comment_ids[0] += 1
+    return _comment_ids[0]
+
+def comments_from_json(data):
+    """把votes.json中的评论列表转换为CommentThread
+
+    id齐全且不重复时按id排列；有旧评论缺少id或id重复时，该题的评论按时间顺序重新编号，而不是拒绝加载
+    """
+    max_id = max((c['id'] for lst in data.values() for c in lst if isinstance(c.get('id'), int)), default=0)
+    _comment_ids[0] = max(_comment_ids[0], max_id)
+    result = defaultdict(CommentThread)
+    for title, lst in data.items():
+        ids = [c.get('id') for c in lst]
+        if all(isinstance(i, int) for i in ids) and len(set(ids)) == len(ids):
+            ordered = sorted(lst, key=lambda c: c['id'])
+        else:
+            ordered = sorted(lst, key=lambda c: c.get('time', 0))  # 稳定排序，同一时间保持原顺序
+            for comment in ordered:
+                comment['id'] = new_comment_id()
+            logging.warning(f"题目 {title} 的评论id缺失或重复，已按时间重新编号 {len(ordered)} 条")
+        thread = CommentThread()
+        for comment in ordered:
+            thread.add(comment)
+        result[title] = thread
+    return result
+
+def comments_to_json():
+    """评论转换为可写入votes.json的列表格式"""
+    return {title: thread.to_list() for title, thread in comments.items() if thread}
+
+class TokenBucket:
+    """令牌桶：以 rate 次/秒恢复，最多积累 burst 个令牌"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, max_wait=0.0):
+        """取一个令牌，返回需要等待的秒数；等待超过 max_wait 时不取令牌并返回None"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def retry_after(self):
+        """距离下一个令牌可用的秒数"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def full(self):
+        """令牌是否已恢复满；满的桶与新建的桶没有区别，可以丢弃"""
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
 # 全局数据结构
 problems = []  # 存储字典: [{'title': '题目名称', 'link': '题目链接'}, ...]
+problem_index = {}  # {problem_title: problem}，与problems共享同一批字典
+catalogue_version = 0  # 题库每次增删题目时递增
+_catalogue_sources = {}  # {文件路径: ((mtime_ns, size), [problem])}
+catalogue_lock = threading.Lock()
 votes = defaultdict(list)  # {problem_title: [vote_data]}
-comments = defaultdict(list)  # {problem_title: [comment_data]}
+comments = defaultdict(CommentThread)  # {problem_title: CommentThread}
 problem_metas = defaultdict(dict)  # {problem_title: {'difficulty': '难度', 'tags': '标签'}}
 users = {}  # {username: user_data}
 data_lock = threading.Lock()
 last_save_time = time.time()
+data_version = 0  # 投票、评论或元数据每次变更时递增
+saved_version = 0  # 最近一次保存时的数据版本
+_stats_cache = {}  # {problem_title: stats}，投票变化时失效
+SORT_COLUMNS = ('title', 'difficulty', 'count', 'thinking', 'implementing', 'overall', 'quality', 'pairwise', 'overall_lower', 'calibrated')
+_sort_orders = {}  # {column: [(key, 题库位置, title)]}，按升序维护
+_sort_keys = {}  # {problem_title: {column: 排序条目}}
+_sort_dirty = set()  # 统计失效、排序位置待更新的题目
+_sort_catalogue_version = None  # 排序索引对应的题库版本，None 表示需要整体重建
+_warm_up_lock = threading.Lock()
+_warmed_up = False
+STARTUP_PROFILE = os.environ.get('VOTE_PROFILE_STARTUP') == '1'  # 为1时用cProfile记录启动过程
+API_PORT = int(os.environ.get('VOTE_API_PORT', '9000'))  # 统计API端口，设为0则不启动
+METRICS_PORT = int(os.environ.get('VOTE_METRICS_PORT', '9001'))  # 性能指标端口，只监听本机，设为0则不启动
+METRICS_ADDRESS = os.environ.get('VOTE_METRICS_ADDRESS', '127.0.0.1')
+BOOT_ID = format(int(time.time()), 'x')  # 进程启动标识，保证重启后ETag不会与旧数据冲突
+_stats_api_cache = None  # (version, body, gzipped_body)
+LIST_RENDER_MODE = os.environ.get('VOTE_LIST_RENDER', 'html')  # 题目列表渲染方式: html(单段HTML) 或 widgets(逐个组件)
+_row_html_cache = {}  # {problem_title: (stats, key, row_html)}
+voter_profiles = {}  # {username: {'votes': 投票数, 'comments': 评论数, 'dev_sum': {字段: 与平均分偏差之和}}}
+_problem_deviations = {}  # {problem_title: {voter: (思维偏差, 实现偏差, 质量偏差)}}，即各题已计入档案的部分
+profiles_version = 0  # 投票者档案每次变化时递增
+_leaderboard_cache = None  # (profiles_version, 排名列表, {用户: 名次}, {条数: html})
+LEADERBOARD_SIZE = 20  # 主页排行榜显示人数
+ANOMALY_INTERVAL = 60  # 异常检测间隔（秒）
+suspicion_report = None  # 最近一次异常检测结果，由后台线程整体替换
+PAIRWISE_K = 24  # 难度对比的Elo增量更新K值
+PAIRWISE_REFIT_INTERVAL = 300  # 用全部对比重新拟合的间隔（秒）
+pairwise_ratings = {}  # {problem_title: 对比难度分}，只包含参与过对比的题目
+pairwise_counts = defaultdict(int)  # {problem_title: 参与对比的次数}
+pairwise_version = 0  # 对比难度每次变化时递增
+_comparison_titles = []  # 对比中出现过的题目，下标即题目编号
+_comparison_ids = {}  # {problem_title: 编号}
+_comparison_winners = array('i')  # 每条对比中较难题目的编号
+_comparison_losers = array('i')  # 每条对比中较容易题目的编号
+_user_comparisons = defaultdict(set)  # {username: {(题目, 题目)}}，已对比过的题目对（按名称排序）
+_pairwise_fitted = 0  # 最近一次批量拟合时的对比条数
+CI_FIELDS = ('thinking', 'implementing', 'overall', 'quality')
+CI_INTERVAL = 10  # 置信区间后台更新间隔（秒）
+_problem_versions = {}  # {problem_title: 最近一次变更时的data_version}
+_vote_epoch = 0  # 最近一次全局变更时的data_version，早于它的题目版本都视为过期
+confidence_intervals = {}  # {problem_title: (题目版本, {字段: (下界, 上界)}，票数不足2时为None)}，由后台线程逐题替换
+ci_version = 0  # 置信区间每轮有更新时递增
+CALIBRATION_ENABLED = os.environ.get('VOTE_CALIBRATION', '1') != '0'  # 为0时不计算也不显示校准评分
+CALIBRATION_INTERVAL = 30  # 校准评分的重新拟合间隔（秒）
+calibrated_ratings = {}  # {problem_title: {'thinking', 'implementing', 'overall'}}，由后台线程整体替换
+voter_biases = {}  # {username: 评分偏差}，下次拟合的初值
+calibration_version = 0  # 校准评分每次更新时递增
+_calibrated_data_version = None  # 校准评分对应的数据版本
+SESSION_IDLE_TIMEOUT = float(os.environ.get('VOTE_SESSION_IDLE_TIMEOUT', 2 * 3600))  # 会话空闲多久后关闭（秒），0表示不关闭
+MAX_SESSIONS = int(os.environ.get('VOTE_MAX_SESSIONS', 1000))  # 同时在线的会话上限，0表示不限
+SESSION_SWEEP_INTERVAL = 60  # 检查空闲会话的间隔（秒）
+VOTE_BYTES, COMMENT_BYTES, PROBLEM_BYTES = 400, 600, 3000  # 估算内存时每条投票/评论/每道题（含统计缓存）的字节数
+SESSION_TASK_COST = 4096  # 估算内存时每个回调/输入协程按此字节数计
+sessions = {}  # {id(session): {'session', 'user', 'ip', 'start', 'last_active', 'actions'}}
+_permission_index = None  # ((catalogue_version, 权限版本), {problem_title: frozenset(可编辑的用户)})
+_permission_epoch = [0]  # 标签权限的变化次数；多题库托管时各实例共享同一个列表
+_shutdown = threading.Event()  # 置位后后台线程退出（多题库托管卸载题库时使用）
+_session_sweeper = None
+audit_store = None  # 服务器启动后为 audit.AuditStore，离线工具中为None
+OWNS_USERS = True  # 是否由本实例加载用户文件；多题库托管中的比赛实例共享宿主已加载的users，为False
 
 # 文件路径
 USER_FILE = 'user.json'
 ADMIN_FILE = 'admin.txt'
+VOTES_FILE = 'votes.json'
+SNAPSHOT_FILE = 'votes.snap'  # 二进制快照，存在时保存投票会同步更新（见 snapshot.py）
+PROBLEM_FILE = 'problem.txt'
+PROBLEM_DIR = 'problems.d'  # 可选，大题库可拆成多个 *.txt 放在此目录
+CATALOGUE_POLL_INTERVAL = 2  # 题库文件检查间隔（秒）
+AUDIT_FILE = 'audit.db'  # 结构化操作审计库（见 audit.py）
+COMPARISON_FILE = 'comparisons.log'  # 难度对比记录，每行一条JSON，只追加
+MIRROR_DIR = os.environ.get('VOTE_MIRROR_DIR', '')  # 静态只读镜像目录（见 mirror.py），为空表示不生成
+MIRROR_INTERVAL = 10  # 镜像增量更新的间隔（秒）
+_mirror = None
+_mirror_dirty = set()  # 上次生成镜像后变化过的题目
+_mirror_catalogue_version = None  # 镜像对应的题库版本，None 表示需要全部校对
+AUDIT_RETENTION_DAYS = 180  # 审计事件保留天数
+BACKUP_DIR = 'backups'  # 增量备份目录（见 backup.py）
+BACKUP_INTERVAL = int(os.environ.get('VOTE_BACKUP_INTERVAL', 300))  # 备份间隔（秒），0表示关闭
+BACKUP_BASE_EVERY = 288  # 连续这么多个增量后重新做一次全量
+BACKUP_KEEP_BASES = 7  # 最多保留的备份链（全量及其增量）数
+BACKUP_MAX_AGE_DAYS = 30  # 超过此天数的备份链会被清理
+PROFILE_MAX_SECONDS = 300  # 管理员命令 profile 的最长采样时间（秒）
+WRITE_RATE_PER_USER = float(os.environ.get('VOTE_WRITE_RATE_PER_USER', 0.5))  # 每个用户每秒恢复的写操作次数
+WRITE_BURST_PER_USER = 10  # 每个用户可连续进行的写操作次数
+WRITE_RATE_GLOBAL = float(os.environ.get('VOTE_WRITE_RATE_GLOBAL', 50))  # 全站每秒恢复的写操作次数
+WRITE_BURST_GLOBAL = 200
+WRITE_MAX_DELAY = 2.0  # 全站令牌不足时最多排队等待的秒数，更久则拒绝
+WRITE_QUEUE_MAX = 1000  # 尚未落盘的写操作上限，超过时拒绝新的写操作
+ADMIN_OVERRIDE_RATE = 1.0  # 每个客户端IP每秒允许的管理员密码代登录尝试次数（每次要对每位管理员算一遍哈希）
+ADMIN_OVERRIDE_BURST = 5
+SAVE_MIN_INTERVAL = float(os.environ.get('VOTE_SAVE_MIN_INTERVAL', 1.0))  # 保存线程两次保存之间的最短间隔（秒）
+_profiler = None  # 正在运行的采样分析器
+
+_backup_lock = threading.Lock()
+_backup_dirty = set()  # 上次备份后变化过的题目
+_backup_needs_base = True  # 启动后或发生全局变更时需要全量备份
+_backup_users = {}  # {username: 上次备份时的JSON}，用于找出变化的用户
+_backup_chain = 0  # 当前全量之后已写的增量数
+_user_buckets = {}  # {username: TokenBucket}，写操作限流；恢复满的桶由 evict_idle_sessions 清理
+_global_bucket = TokenBucket(WRITE_RATE_GLOBAL, WRITE_BURST_GLOBAL)
+_admin_override_buckets = {}  # {客户端IP: TokenBucket}，尝试管理员密码的限流
+_pending_writes = 0  # 已修改内存数据但尚未落盘的写操作数
+_write_lock = threading.Lock()
+_save_requested = threading.Event()
+_save_lock = threading.Lock()  # 串行化保存；序列化和写文件时不持有data_lock
 
 async def set_cookie(name, value, max_age):
     run_js("""
@@ -66,15 +330,14 @@ def setup_logging():
         ]
     )
 
-def log_action(username, action, details=None):
-    """记录用户操作到日志"""
+def log_action(username, action, details=None, problem=None):
+    """记录用户操作到日志，服务器运行时同时写入审计库"""
     log_message = f"用户: {username}, 操作: {action}"
     if details:
         log_message += f", 详情: {details}"
     logging.info(log_message)
-
-# 在文件开头调用设置日志
-setup_logging()
+    if audit_store is not None:
+        audit_store.record(username, action, problem, details)
 
 # 难度级别定义 - 使用提供的CSS颜色变量
 DIFFICULTY_LEVELS = {
@@ -103,11 +366,30 @@ def calc_overall(x, y):
             left = mid + eps
     return left
 
+def calc_overall_array(x, y):
+    """calc_overall 的向量化版本：对每个元素执行相同的二分，结果逐元素一致"""
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    left = np.ones(np.broadcast(x, y).shape)
+    right = np.full(left.shape, 8000.0)
+    active = right - left > eps
+    while active.any():
+        mid = (left + right) / 2
+        p = 1.0 / (1 + np.power(10, (x - mid) / 400.0)) * (1.0 / (1 + np.power(10, (y - mid) / 400.0)))
+        go_left = active & (p > 0.5)
+        go_right = active & ~(p > 0.5)
+        right = np.where(go_left, mid - eps, right)
+        left = np.where(go_right, mid + eps, left)
+        active = right - left > eps
+    return left
+
 # 在get_difficulty_html函数中使用这些颜色类
+@lru_cache(maxsize=4096)
 def get_difficulty_html(difficulty):
     """获取难度级别的HTML表示"""
     if difficulty not in DIFFICULTY_LEVELS:
-        return difficulty
+        return html.escape(difficulty)
     
     color_class = DIFFICULTY_LEVELS[difficulty]
     return f'<span style="color: {color_class}; font-weight: bold;">{difficulty}</span>'
@@ -137,11 +419,13 @@ def get_rating_color(rating):
     else:
         return "#000000"  # 黑色 - 超过3700
 
+@lru_cache(maxsize=4096)
 def format_rating_with_color(rating):
     """格式化评分并添加颜色"""
     color = get_rating_color(rating)
     return f'<span style="color: {color}; font-weight: bold">{rating:.1f}</span>'
 
+@lru_cache(maxsize=4096)
 def format_quality_score(score):
     """格式化质量分数，如果小于等于-2则添加特殊样式和符号"""
     if score <= -4:
@@ -151,16 +435,89 @@ def format_quality_score(score):
     else:
         return f'{score:.2f}'
 
-def hash_password(password):
-    """对密码进行哈希处理"""
+def _hash_sha256(password):
+    """旧版无盐SHA-256，仅用于校验并升级user.json中的历史密码"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+def _hash_scrypt(password, salt, n=2**14, r=8, p=1):
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+def _hash_pbkdf2_sha256(password, salt, iterations=310000):
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+# 可选的密码哈希算法及其参数，存储格式为 "算法$参数...$盐$摘要"
+PASSWORD_HASHERS = {
+    'scrypt': _hash_scrypt,
+    'pbkdf2_sha256': _hash_pbkdf2_sha256,
+}
+PASSWORD_SCHEME = os.environ.get('VOTE_PASSWORD_SCHEME', 'scrypt')
+PASSWORD_KDF_PARAMS = {
+    'scrypt': {'n': 2**14, 'r': 8, 'p': 1},
+    'pbkdf2_sha256': {'iterations': 310000},
+}
+PASSWORD_HASH_WORKERS = 2  # 同时进行的密码哈希数量上限，避免登录高峰拖慢页面渲染
+_password_executor = None
+
+def hash_password(password, scheme=None):
+    """用加盐KDF对密码进行哈希处理（阻塞，会话中请使用 hash_password_async）"""
+    scheme = scheme or PASSWORD_SCHEME
+    return PASSWORD_HASHERS[scheme](password, os.urandom(16), **PASSWORD_KDF_PARAMS[scheme])
+
+def password_needs_upgrade(stored):
+    """判断存储的密码哈希是否不是当前算法和参数"""
+    parts = stored.split('$')
+    if parts[0] != PASSWORD_SCHEME:
+        return True
+    if PASSWORD_SCHEME == 'scrypt':
+        params = PASSWORD_KDF_PARAMS['scrypt']
+        return parts[1:4] != [str(params['n']), str(params['r']), str(params['p'])]
+    return parts[1] != str(PASSWORD_KDF_PARAMS[PASSWORD_SCHEME]['iterations'])
+
+def verify_password(password, stored):
+    """校验密码是否与存储的哈希匹配，兼容旧版SHA-256"""
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            computed = _hash_scrypt(password, bytes.fromhex(parts[4]), n=n, r=r, p=p)
+        elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            computed = _hash_pbkdf2_sha256(password, bytes.fromhex(parts[2]), iterations=int(parts[1]))
+        elif len(parts) == 1:
+            computed = _hash_sha256(password)
+        else:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(computed, stored)
+
+def _run_password_job(func, *args):
+    """在线程池中执行密码哈希（hashlib的KDF会释放GIL，不阻塞事件循环）"""
+    global _password_executor
+    if _password_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+    import asyncio
+    return asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+
+async def hash_password_async(password):
+    """在线程池中计算密码哈希"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(password, stored):
+    """在线程池中校验密码"""
+    return await _run_password_job(verify_password, password, stored)
+
+@metrics.timed('load_users', 'vote_persistence_seconds')
 def load_users():
     """加载用户数据"""
-    global users
     try:
         with open(USER_FILE, 'r', encoding='utf-8') as f:
-            users = json.load(f)
+            loaded = json.load(f)
+        # 原地更新，多题库托管时各实例共享同一个users字典
+        users.clear()
+        users.update(loaded)
             
         # 确保所有用户都有banned字段
         for username in users:
@@ -169,9 +526,11 @@ def load_users():
                 
         save_users()  # 保存更新后的用户数据
     except FileNotFoundError:
-        users = {}
+        users.clear()
         save_users()
+    invalidate_permissions()
 
+@metrics.timed('save_users', 'vote_persistence_seconds')
 def save_users():
     """保存用户数据"""
     with open(USER_FILE, 'w', encoding='utf-8') as f:
@@ -193,43 +552,115 @@ def is_admin(username):
     admins = load_admins()
     return username in admins
 
+def parse_problem_file(path):
+    """解析题目文件：每两行一个题目，第一行是标题，第二行是链接"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    
+    entries = []
+    for i in range(0, len(lines), 2):
+        if i + 1 < len(lines):
+            entries.append({
+                'title': lines[i],
+                'link': lines[i+1]
+            })
+        else:
+            # 如果最后一行没有对应的链接，只添加标题
+            entries.append({
+                'title': lines[i],
+                'link': ''
+            })
+    return entries
+
+def catalogue_files():
+    """题库文件列表：problem.txt 加上 problems.d/ 目录下按文件名排序的 *.txt"""
+    files = [PROBLEM_FILE]
+    if os.path.isdir(PROBLEM_DIR):
+        files.extend(os.path.join(PROBLEM_DIR, name) for name in sorted(os.listdir(PROBLEM_DIR))
+                     if name.endswith('.txt'))
+    return files
+
+@metrics.timed('load_problems', 'vote_persistence_seconds')
 def load_problems():
-    """从problem.txt加载题目标题和链接"""
-    global problems
-    try:
-        with open('problem.txt', 'r', encoding='utf-8') as f:
-            lines = [line.strip() for line in f if line.strip()]
-            
-            # 每两行一个题目，第一行是标题，第二行是链接
-            problems = []
-            for i in range(0, len(lines), 2):
-                if i + 1 < len(lines):
-                    problems.append({
-                        'title': lines[i],
-                        'link': lines[i+1]
-                    })
-                else:
-                    # 如果最后一行没有对应的链接，只添加标题
-                    problems.append({
-                        'title': lines[i],
-                        'link': ''
-                    })
-                    
-    except FileNotFoundError:
-        # 如果文件不存在，创建示例数据
-        problems = [
-            {"title": "题目A", "link": "https://example.com/problemA"},
-            {"title": "题目B", "link": "https://example.com/problemB"},
-            {"title": "题目C", "link": "https://example.com/problemC"},
-            {"title": "题目D", "link": "https://example.com/problemD"},
-            {"title": "题目E", "link": "https://example.com/problemE"}
-        ]
-        with open('problem.txt', 'w', encoding='utf-8') as f:
-            for problem in problems:
-                f.write(problem['title'] + '\n')
-                f.write(problem['link'] + '\n')
-        print("已创建示例problem.txt文件")
-        log_action("system", "创建示例problem.txt文件")
+    """加载题库，只重新解析发生变化的文件，并把增删的题目增量应用到题目列表和标题索引"""
+    global problems, catalogue_version
+    with catalogue_lock:
+        files = catalogue_files()
+        if not _catalogue_sources and not any(os.path.exists(path) for path in files):
+            create_example_problems()
+        
+        changed = False
+        for path in list(_catalogue_sources):
+            if path not in files or not os.path.exists(path):
+                del _catalogue_sources[path]
+                changed = True
+        for path in files:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            source = _catalogue_sources.get(path)
+            if source is None or source[0] != signature:
+                _catalogue_sources[path] = (signature, parse_problem_file(path))
+                changed = True
+        if not changed:
+            return
+        
+        # 按文件顺序合并，重复标题以先出现的为准
+        new_problems = []
+        new_titles = {}
+        for path in files:
+            if path not in _catalogue_sources:
+                continue
+            for entry in _catalogue_sources[path][1]:
+                if entry['title'] not in new_titles:
+                    new_titles[entry['title']] = entry
+                    new_problems.append(entry)
+        
+        added = [title for title in new_titles if title not in problem_index]
+        removed = [title for title in problem_index if title not in new_titles]
+        relinked = [title for title, entry in new_titles.items()
+                    if title in problem_index and problem_index[title]['link'] != entry['link']]
+        for title in removed:
+            del problem_index[title]
+        for title in added + relinked:
+            problem_index[title] = new_titles[title]
+        
+        # 重新绑定而不是原地修改，正在渲染的会话仍可安全地遍历旧列表
+        problems = [problem_index[entry['title']] for entry in new_problems]
+        if added or removed or relinked:
+            catalogue_version += 1
+            if catalogue_version > 1:  # 首次加载不记录
+                log_action("system", "题库更新", f"新增: {len(added)}, 删除: {len(removed)}, 链接变更: {len(relinked)}")
+
+def create_example_problems():
+    """创建示例problem.txt文件"""
+    example = [
+        {"title": "题目A", "link": "https://example.com/problemA"},
+        {"title": "题目B", "link": "https://example.com/problemB"},
+        {"title": "题目C", "link": "https://example.com/problemC"},
+        {"title": "题目D", "link": "https://example.com/problemD"},
+        {"title": "题目E", "link": "https://example.com/problemE"}
+    ]
+    with open(PROBLEM_FILE, 'w', encoding='utf-8') as f:
+        for problem in example:
+            f.write(problem['title'] + '\n')
+            f.write(problem['link'] + '\n')
+    print("已创建示例problem.txt文件")
+    log_action("system", "创建示例problem.txt文件")
+
+def get_problem(problem_title):
+    """按标题查找题目，O(1)"""
+    return problem_index.get(problem_title)
+
+def watch_problems():
+    """题库监视线程：定期检查题库文件的修改时间并增量重载"""
+    while not _shutdown.wait(CATALOGUE_POLL_INTERVAL):
+        try:
+            load_problems()
+        except Exception as e:
+            logging.error(f"重载题库出错: {str(e)}")
 
 def convert_quality_rating(rating):
     """将质量评分从800-3500范围转换到-5~+5范围"""
@@ -238,11 +669,35 @@ def convert_quality_rating(rating):
         return (rating - 800.0) / 2700.0 * 10 - 5
     return rating
 
+def snapshot_is_fresh():
+    """快照存在且不比votes.json旧时优先使用快照"""
+    try:
+        snap_mtime = os.path.getmtime(SNAPSHOT_FILE)
+    except OSError:
+        return False
+    try:
+        return snap_mtime >= os.path.getmtime(VOTES_FILE)
+    except OSError:
+        return True
+
+@metrics.timed('load_votes', 'vote_persistence_seconds')
 def load_votes():
     """从文件加载投票数据"""
     global votes, comments, problem_metas
+    invalidate_stats()
+    if snapshot_is_fresh():
+        from snapshot import Snapshot, LazyVotes
+        try:
+            snap = Snapshot(SNAPSHOT_FILE)
+        except (OSError, ValueError) as e:
+            logging.error(f"加载快照失败，改用{VOTES_FILE}: {str(e)}")
+        else:
+            votes = LazyVotes(snap)
+            comments = comments_from_json(snap.comments)
+            problem_metas = defaultdict(dict, snap.problem_metas)
+            return
     try:
-        with open('votes.json', 'r', encoding='utf-8') as f:
+        with open(VOTES_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
             # 检查是否为旧格式
             if data and isinstance(next(iter(data.values())), list):
@@ -253,39 +708,384 @@ def load_votes():
                             vote['quality'] = convert_quality_rating(vote['quality'])
                     votes[k] = v_list
                 # 初始化空的评论数据
-                comments = defaultdict(list)
+                comments = defaultdict(CommentThread)
                 # 初始化空的元数据
                 problem_metas = defaultdict(dict)
             else:
                 # 新格式，包含投票和评论
                 votes = defaultdict(list, data.get('votes', {}))
-                comments = defaultdict(list, data.get('comments', {}))
+                comments = comments_from_json(data.get('comments', {}))
                 problem_metas = defaultdict(dict, data.get('problem_metas', {}))
     except (FileNotFoundError, StopIteration):
         save_votes()  # 创建初始文件
 
+def copy_votes():
+    """在数据锁内调用：浅拷贝所有投票列表，不触发快照还原
+
+    返回 (拷贝, 待读取)，快照中尚未还原的题目只记下题目名，锁外再交给 read_pending_votes 补齐
+    """
+    copied = {title: list(vote_list) for title, vote_list in dict.items(votes)}
+    if not hasattr(votes, 'pending_titles'):
+        return copied, None
+    return copied, (votes.snapshot, votes.pending_titles())
+
+def read_pending_votes(copied, pending):
+    """在锁外调用：从只读快照读出 copy_votes 记下的题目并补进拷贝，LazyVotes 本身保持未还原"""
+    if pending is not None:
+        snap, titles = pending
+        for title in titles:
+            copied[title] = snap.problem_votes(title)
+    return copied
+
+@metrics.timed('save_votes', 'vote_persistence_seconds')
 def save_votes():
     """保存投票数据到文件"""
-    with data_lock:
-        with open('votes.json', 'w', encoding='utf-8') as f:
+    global saved_version
+    with _save_lock:
+        # 数据锁内只做浅拷贝（投票列表和元数据在修改时整体替换，拷贝后不会再变）
+        with data_lock:
+            version = data_version
+            vote_lists, pending = copy_votes()
             data = {
-                'votes': dict(votes),
-                'comments': dict(comments),
-                'problem_metas': dict(problem_metas)
+                'votes': vote_lists,
+                'comments': comments_to_json(),
+                'problem_metas': {title: dict(meta) for title, meta in problem_metas.items()}
             }
+        read_pending_votes(vote_lists, pending)
+        with open(VOTES_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        if os.path.exists(SNAPSHOT_FILE):
+            from snapshot import write_snapshot
+            write_snapshot(SNAPSHOT_FILE, data['votes'], data['comments'], data['problem_metas'])
+        saved_version = version
 
 def auto_save():
     """自动保存线程函数"""
     global last_save_time
-    while True:
-        time.sleep(5)  # 每5秒检查一次
+    while not _shutdown.wait(5):  # 每5秒检查一次
         current_time = time.time()
-        if current_time - last_save_time >= 30:  # 距离上次保存已过30秒
+        # 距离上次保存已过30秒且数据有变化
+        if current_time - last_save_time >= 30 and data_version != saved_version:
             save_votes()
             last_save_time = current_time
             # logging.info(f"自动保存完成: {time.strftime('%Y-%m-%d %H:%M:%S')}")
 
+def request_save():
+    """写操作完成后调用：交给保存线程尽快落盘，短时间内的多次写入合并为一次保存"""
+    global _pending_writes
+    with _write_lock:
+        _pending_writes += 1
+    _save_requested.set()
+
+def save_worker():
+    """保存线程：处理 request_save 的请求，保存失败时保留待写计数并稍后重试
+
+    两次保存至少间隔 SAVE_MIN_INTERVAL 秒，期间到达的写操作合并到下一次保存
+    """
+    global _pending_writes, last_save_time
+    while not _shutdown.is_set():
+        if not _save_requested.wait(1):
+            continue
+        if _shutdown.wait(max(0.0, last_save_time + SAVE_MIN_INTERVAL - time.time())):
+            break  # 退出时由 shutdown() 保存
+        _save_requested.clear()
+        with _write_lock:
+            pending = _pending_writes
+        try:
+            save_votes()
+        except OSError as e:
+            logging.error(f"保存投票数据失败: {str(e)}")
+            _save_requested.set()
+            _shutdown.wait(1)
+            continue
+        last_save_time = time.time()
+        with _write_lock:
+            _pending_writes -= pending
+
+def reject_write(reason, message):
+    metrics.inc('vote_writes_rejected_total', reason)
+    toast(message)
+    return False
+
+async def admit_write():
+    """写操作准入控制：依次检查写队列、用户令牌桶和全站令牌桶
+
+    全站令牌短缺不多时排队等待（计入 delayed），其余情况拒绝并提示用户，返回是否允许写入
+    """
+    if _pending_writes >= WRITE_QUEUE_MAX:
+        return reject_write('queue_full', "服务器繁忙，请稍后再试")
+    username = local.current_user
+    bucket = _user_buckets.get(username)
+    if bucket is None:
+        bucket = _user_buckets[username] = TokenBucket(WRITE_RATE_PER_USER, WRITE_BURST_PER_USER)
+    if bucket.reserve() is None:
+        return reject_write('user_rate', f"操作过于频繁，请 {int(bucket.retry_after()) + 1} 秒后再试")
+    wait = _global_bucket.reserve(WRITE_MAX_DELAY)
+    if wait is None:
+        bucket.tokens += 1  # 被全站限流拒绝的操作不消耗用户的额度
+        return reject_write('global_rate', "当前提交人数过多，请稍后再试")
+    if wait > 0:
+        import asyncio
+        metrics.inc('vote_writes_delayed_total', 'global_rate')
+        await run_asyncio_coroutine(asyncio.sleep(wait))
+    return True
+
+def admin_override_bucket():
+    """当前客户端尝试管理员密码的令牌桶"""
+    ip = info.user_ip
+    bucket = _admin_override_buckets.get(ip)
+    if bucket is None:
+        bucket = _admin_override_buckets[ip] = TokenBucket(ADMIN_OVERRIDE_RATE, ADMIN_OVERRIDE_BURST)
+    return bucket
+
+@metrics.timed('run_backup', 'vote_persistence_seconds')
+def run_backup(force_base=False):
+    """写一次备份：只序列化变化过的题目和用户，需要时做全量；没有变化时返回None"""
+    global _backup_needs_base, _backup_chain
+    import backup
+    with _backup_lock:
+        with data_lock:
+            base = force_base or _backup_needs_base or _backup_chain >= BACKUP_BASE_EVERY
+            user_state = {username: json.dumps(user, ensure_ascii=False, sort_keys=True)
+                          for username, user in list(users.items())}
+            # 锁内只做浅拷贝（投票列表和元数据在修改时整体替换），序列化在锁外进行
+            pending = None
+            if base:
+                changed_users, removed_users = user_state, []
+                vote_lists, pending = copy_votes()
+                payload = {
+                    'votes': vote_lists,
+                    'comments': comments_to_json(),
+                    'problem_metas': {title: dict(meta) for title, meta in problem_metas.items()},
+                }
+            else:
+                changed_users = {username: state for username, state in user_state.items()
+                                 if _backup_users.get(username) != state}
+                removed_users = [username for username in _backup_users if username not in user_state]
+                if not _backup_dirty and not changed_users and not removed_users:
+                    return None
+                payload = {'problems': {
+                    title: {
+                        'votes': list(votes[title]) if title in votes else [],
+                        'comments': comments[title].to_list() if title in comments else [],
+                        'meta': dict(problem_metas[title]) if title in problem_metas else None,
+                    } for title in _backup_dirty
+                }}
+            payload['users'] = dict.fromkeys(removed_users)
+            payload['users'].update((username, json.loads(state)) for username, state in changed_users.items())
+            payload['data_version'] = data_version
+            dirty = set(_backup_dirty)
+            _backup_dirty.clear()
+            _backup_needs_base = False
+        
+        # 读取快照中未还原的题目、序列化、压缩和写文件都不持有数据锁
+        if base:
+            read_pending_votes(payload['votes'], pending)
+        encoded = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        kind = 'base' if base else 'delta'
+        try:
+            path = backup.write_backup(BACKUP_DIR, backup.next_seq(BACKUP_DIR), kind, encoded)
+        except OSError as e:
+            with data_lock:
+                _backup_dirty.update(dirty)
+                _backup_needs_base = _backup_needs_base or base
+            logging.error(f"备份失败: {e}")
+            return None
+        _backup_users.clear()
+        _backup_users.update(user_state)
+        if base:
+            _backup_chain = 0
+            for removed in backup.prune(BACKUP_DIR, BACKUP_KEEP_BASES, BACKUP_MAX_AGE_DAYS):
+                logging.info(f"清理过期备份: {removed}")
+        else:
+            _backup_chain += 1
+        logging.info(f"备份完成: {path}, 题目 {len(dirty) if not base else len(payload['votes'])} 道, "
+                     f"{os.path.getsize(path) / 1024:.1f} KB")
+        return path
+
+def backup_worker():
+    """后台备份线程：每隔BACKUP_INTERVAL秒写一次增量"""
+    while not _shutdown.wait(BACKUP_INTERVAL):
+        try:
+            run_backup()
+        except Exception as e:
+            logging.error(f"备份出错: {e}")
+
+def _plain_number(value):
+    """快照中的整数评分以浮点数存储，写入镜像时还原成整数，保证指纹稳定"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+def mirror_source(problem, with_details):
+    """在data_lock内取出生成一道题镜像数据所需的原始数据，只拷贝不计算"""
+    title = problem['title']
+    cached = title in _stats_cache
+    need_columns = with_details or not cached
+    return {
+        'problem': problem,
+        'meta': dict(problem_metas.get(title, {})),
+        'cached': cached,
+        'stats': _stats_cache.get(title),
+        'columns': vote_columns(title) if need_columns else None,
+        'comments': (list(comments[title]) if title in comments else []) if with_details else None,
+    }
+
+def mirror_item(source, with_details):
+    """由 mirror_source 取出的数据生成镜像中一道题的数据；with_details为False时只生成列表需要的摘要"""
+    problem = source['problem']
+    title = problem['title']
+    columns = source['columns']
+    if source['cached']:
+        stats = source['stats']
+    else:
+        stats = _compute_stats(title, columns) if columns is not None else None
+    meta = source['meta']
+    difficulty = meta.get('difficulty', '暂无评定')
+    item = {
+        'title': title,
+        'link': problem['link'],
+        'difficulty': difficulty,
+        'difficulty_rank': DIFFICULTY_ORDER.get(difficulty, 99),
+        'tags': meta.get('tags', ''),
+        'stats': None,
+    }
+    if stats:
+        item['stats'] = {'count': stats['count']}
+        for field in ('thinking', 'implementing', 'overall', 'quality'):
+            item['stats'][field] = {'mean': float(stats[field]['mean']), 'std': float(stats[field]['std'])}
+    if not with_details:
+        return item
+    
+    item['votes'] = []
+    if columns is not None:
+        overall = calc_overall_array(columns['thinking'], columns['implementing']).tolist()
+        for k, voter in enumerate(columns['voter']):
+            item['votes'].append({
+                'voter': voter,
+                'thinking': _plain_number(columns['thinking'][k]),
+                'implementing': _plain_number(columns['implementing'][k]),
+                'quality': _plain_number(columns['quality'][k]),
+                'overall': overall[k],
+            })
+    item['comments'] = [{'user': c['user'], 'text': c['text'], 'time': c['time']} for c in reversed(source['comments'])]
+    return item
+
+@metrics.timed('build_mirror', 'vote_persistence_seconds')
+def build_mirror(out_dir=None, full=False):
+    """增量更新静态镜像：只为变化过的题目重新生成页面，返回重写的详情页数量"""
+    global _mirror, _mirror_catalogue_version
+    from mirror import Mirror
+    out_dir = out_dir or MIRROR_DIR
+    if _mirror is None or _mirror.out_dir != out_dir:
+        _mirror = Mirror(out_dir)
+    with data_lock:
+        # 与 refresh_sort_index 相同，先读版本再读列表，镜像不会被标上比内容更新的版本
+        version = catalogue_version
+        current = problems
+        full = full or _mirror_catalogue_version != version
+        if full:
+            candidates = list(current)
+        else:
+            candidates = [problem_index[title] for title in _mirror_dirty if title in problem_index]
+        _mirror_dirty.clear()
+        detail_sources = [mirror_source(problem, True) for problem in candidates]
+        summary_sources = [mirror_source(problem, False) for problem in current]
+        catalogue = [problem['title'] for problem in current]
+    # 统计、渲染和写文件不持有数据锁
+    details = {source['problem']['title']: mirror_item(source, True) for source in detail_sources}
+    summaries = {source['problem']['title']: mirror_item(source, False) for source in summary_sources}
+    written = _mirror.update(details, summaries, catalogue)
+    _mirror_catalogue_version = version
+    if written:
+        logging.info(f"静态镜像已更新: 重写 {written} 道题")
+    return written
+
+def mirror_worker():
+    """静态镜像线程：启动时按指纹校对全部页面，之后定期只更新变化过的题目"""
+    while not _shutdown.is_set():
+        if _mirror_dirty or _mirror_catalogue_version != catalogue_version:
+            try:
+                build_mirror()
+            except Exception as e:
+                logging.error(f"生成静态镜像出错: {e}")
+        _shutdown.wait(MIRROR_INTERVAL)
+
+@contextmanager
+def startup_phase(name):
+    """记录启动阶段的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logging.info(f"启动阶段: {name}, 耗时: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+def load_data():
+    """加载用户、题目和投票数据（不依赖pywebio，离线工具可直接调用）"""
+    if OWNS_USERS:
+        with startup_phase("加载用户"):
+            load_users()
+    with startup_phase("加载题目"):
+        load_problems()
+    with startup_phase("加载投票"):
+        load_votes()
+    with startup_phase("重建投票者档案"):
+        rebuild_voter_profiles()
+    with startup_phase("加载难度对比"):
+        load_comparisons()
+
+def warm_up():
+    """在端口开放前完成导入、数据加载和统计预计算，避免首个访问者承担冷启动开销"""
+    global _warmed_up
+    with _warm_up_lock:
+        if _warmed_up:
+            return
+        with startup_phase("导入pywebio"):
+            load_webio()
+        with startup_phase("导入numpy"):
+            import numpy  # noqa: F401
+        load_data()
+        with startup_phase("预计算统计"):
+            for problem in problems:
+                calculate_stats(problem['title'])
+        
+        # 启动自动保存和题库监视线程（整个进程只启动一次）
+        threading.Thread(target=auto_save, daemon=True).start()
+        threading.Thread(target=save_worker, daemon=True).start()
+        threading.Thread(target=watch_problems, daemon=True).start()
+        threading.Thread(target=anomaly_worker, daemon=True).start()
+        threading.Thread(target=pairwise_worker, daemon=True).start()
+        threading.Thread(target=ci_worker, daemon=True).start()
+        if CALIBRATION_ENABLED:
+            threading.Thread(target=calibration_worker, daemon=True).start()
+        if BACKUP_INTERVAL:
+            threading.Thread(target=backup_worker, daemon=True).start()
+        if MIRROR_DIR:
+            threading.Thread(target=mirror_worker, daemon=True).start()
+        _warmed_up = True
+
+def shutdown():
+    """停止后台线程和会话清理并保存未保存的数据（多题库托管卸载题库时调用）"""
+    _shutdown.set()
+    if _session_sweeper is not None:
+        _session_sweeper.stop()
+    if data_version != saved_version:
+        save_votes()
+    snapshot = getattr(votes, 'snapshot', None)
+    if snapshot is not None:
+        with _save_lock, _backup_lock:  # 保存和备份会在锁外读取快照
+            snapshot.close()
+
+def vote_count():
+    """投票总数；快照中尚未还原的题目直接按数组长度计，不触发还原"""
+    n_votes = sum(len(vote_list) for vote_list in dict.values(votes))
+    return n_votes + (votes.pending_count() if hasattr(votes, 'pending_count') else 0)
+
+def memory_estimate():
+    """粗略估算本题库数据占用的内存（字节）；快照中尚未还原的投票在页缓存中，不计入"""
+    n_votes = sum(len(vote_list) for vote_list in dict.values(votes))
+    n_comments = sum(len(thread) for thread in comments.values())
+    return n_votes * VOTE_BYTES + n_comments * COMMENT_BYTES + len(problems) * PROBLEM_BYTES
+
 def validate_rating(r, field_name):
     """验证评分是否在有效范围内"""
     if field_name == 'quality':
@@ -296,20 +1096,193 @@ def validate_rating(r, field_name):
             return f"{field_name}评分必须在800-3500之间"
     return None
 
+def touch_data(problem_title=None):
+    """记录一次数据变更：递增数据版本并使相关统计缓存失效（调用方需持有data_lock）"""
+    global data_version, _backup_needs_base, _mirror_catalogue_version, _vote_epoch
+    data_version += 1
+    invalidate_stats(problem_title)
+    if problem_title is None:
+        _backup_needs_base = True
+        _mirror_catalogue_version = None
+        _vote_epoch = data_version
+    else:
+        _backup_dirty.add(problem_title)
+        _mirror_dirty.add(problem_title)
+        _problem_versions[problem_title] = data_version
+
+def problem_version(problem_title):
+    """题目数据的版本号，题目或全局数据变化后增大"""
+    return max(_problem_versions.get(problem_title, 0), _vote_epoch)
+
+def invalidate_stats(problem_title=None):
+    """使统计缓存失效，不指定题目时清空全部缓存"""
+    global _sort_catalogue_version
+    if problem_title is None:
+        _stats_cache.clear()
+        _sort_catalogue_version = None
+    else:
+        _stats_cache.pop(problem_title, None)
+        _sort_dirty.add(problem_title)
+
 def calculate_stats(problem_title):
-    """计算指定题目的统计信息"""
+    """计算指定题目的统计信息（带缓存）"""
+    if problem_title in _stats_cache:
+        return _stats_cache[problem_title]
+    stats = _compute_stats(problem_title)
+    _stats_cache[problem_title] = stats
+    return stats
+
+DIFFICULTY_ORDER = {d: i for i, d in enumerate(DIFFICULTY_LEVELS.keys())}
+
+def problem_sort_entries(problem_title, pos):
+    """计算题目在各排序列中的条目 (key, 题库位置, title)"""
+    stats = calculate_stats(problem_title)
+    difficulty = problem_metas.get(problem_title, {}).get('difficulty', '暂无评定')
+    keys = {
+        'title': problem_title,
+        'difficulty': DIFFICULTY_ORDER.get(difficulty, 99),
+        'count': stats['count'] if stats else 0,
+    }
+    for field in ('thinking', 'implementing', 'overall', 'quality'):
+        mean = float(stats[field]['mean']) if stats else 0
+        keys[field] = mean if mean == mean else 0  # NaN无法参与二分查找
+    keys['pairwise'] = pairwise_ratings.get(problem_title, 0)
+    interval = confidence_interval(problem_title)
+    keys['overall_lower'] = interval['overall'][0] if interval else 0
+    calibrated = calibrated_ratings.get(problem_title)
+    keys['calibrated'] = calibrated['overall'] if calibrated else 0
+    return {column: (keys[column], pos, problem_title) for column in SORT_COLUMNS}
+
+def refresh_sort_index():
+    """题库变化时整体重建排序索引，否则只把统计变化过的题目移动到新位置"""
+    global _sort_catalogue_version
+    from bisect import bisect_left, insort
+    if _sort_catalogue_version != catalogue_version:
+        # 先读版本再读列表: load_problems 先替换列表再增大版本，重建期间题库再次更新时下次仍会重建
+        version = catalogue_version
+        current = problems
+        _sort_dirty.clear()
+        _sort_keys.clear()
+        for pos, problem in enumerate(current):
+            _sort_keys[problem['title']] = problem_sort_entries(problem['title'], pos)
+        for column in SORT_COLUMNS:
+            _sort_orders[column] = sorted(entries[column] for entries in _sort_keys.values())
+        _sort_catalogue_version = version
+        return
+    
+    while _sort_dirty:
+        title = _sort_dirty.pop()
+        old = _sort_keys.get(title)
+        if old is None:
+            continue  # 不在题库中的题目不参与排序
+        new = problem_sort_entries(title, old['title'][1])
+        _sort_keys[title] = new
+        for column in SORT_COLUMNS:
+            if new[column] == old[column]:
+                continue
+            order = _sort_orders[column]
+            i = bisect_left(order, old[column])
+            if i < len(order) and order[i] == old[column]:
+                del order[i]
+            insort(order, new[column])
+
+def sorted_problem_titles(column, ascending=True):
+    """按指定列排序的题目名列表，升序或降序都只是遍历维护好的索引
+
+    键相同的题目始终按题库顺序排列（与对原列表做稳定排序的结果一致），降序时只翻转不同键之间的顺序
+    """
+    refresh_sort_index()
+    order = _sort_orders.get(column) or _sort_orders['title']
+    if ascending:
+        return [entry[2] for entry in order]
+    result = []
+    end = len(order)
+    while end > 0:
+        start = end - 1
+        while start > 0 and order[start - 1][0] == order[end - 1][0]:
+            start -= 1
+        result.extend(entry[2] for entry in order[start:end])
+        end = start
+    return result
+
+def vote_columns(problem_title):
+    """按列取出题目的投票（voter/thinking/implementing/quality 各一个列表），没有投票时返回None"""
+    # 快照中尚未还原的题目直接使用映射内存中的数组，避免还原成字典
+    columns = votes.pending_columns(problem_title) if hasattr(votes, 'pending_columns') else None
+    if columns is not None:
+        return {
+            'voter': columns['voter'],
+            'thinking': columns['thinking'].tolist(),
+            'implementing': columns['implementing'].tolist(),
+            'quality': columns['quality'].tolist(),
+            'time': columns['time'].tolist() if 'time' in columns else [float('nan')] * len(columns['voter']),
+        }
     if problem_title not in votes or not votes[problem_title]:
         return None
+    vote_list = votes[problem_title]
+    return {
+        'voter': [v['voter'] for v in vote_list],
+        'thinking': [v['thinking'] for v in vote_list],
+        'implementing': [v['implementing'] for v in vote_list],
+        'quality': [v['quality'] for v in vote_list],
+        'time': [v.get('time', float('nan')) for v in vote_list],  # 早期投票没有记录时间
+    }
+
+def vote_titles():
+    """所有有投票记录的题目（快照中未还原的题目不会被还原）"""
+    return votes.titles() if hasattr(votes, 'titles') else list(votes.keys())
+
+def collect_vote_arrays():
+    """把全部投票展开成numpy数组，供后台分析任务使用
     
-    thinking_ratings = [v['thinking'] for v in votes[problem_title]]
-    implementing_ratings = [v['implementing'] for v in votes[problem_title]]
-    quality_ratings = [v['quality'] for v in votes[problem_title]]
+    逐题在data_lock内取出该题的各列（每次只短暂持锁），同一道题的各列长度一致；
+    不同题目取自不同时刻，整体不是同一时刻的快照，分析任务对此不敏感。
+    """
+    import numpy as np
+    with data_lock:
+        titles = vote_titles()
+    voter_ids = {}
+    problem_idx, voter_idx = [], []
+    fields = {'thinking': [], 'implementing': [], 'quality': [], 'time': []}
+    kept_titles = []
+    for title in titles:
+        with data_lock:
+            columns = vote_columns(title)
+        if columns is None:
+            continue
+        p = len(kept_titles)
+        kept_titles.append(title)
+        for voter in columns['voter']:
+            voter_idx.append(voter_ids.setdefault(voter, len(voter_ids)))
+        problem_idx.extend([p] * len(columns['voter']))
+        for field, values in fields.items():
+            values.extend(columns[field])
+    return {
+        'titles': kept_titles,
+        'voters': list(voter_ids),
+        'problem_idx': np.asarray(problem_idx, dtype=np.int64),
+        'voter_idx': np.asarray(voter_idx, dtype=np.int64),
+        **{field: np.asarray(values, dtype=float) for field, values in fields.items()},
+    }
+
+@metrics.timed('compute_stats', 'vote_stats_seconds')
+def _compute_stats(problem_title, columns=None):
+    """实际计算指定题目的统计信息；传入已取出的投票列时不再读取投票"""
+    import numpy as np
+    
+    if columns is None:
+        columns = vote_columns(problem_title)
+    if columns is None:
+        return None
+    thinking_ratings = columns['thinking']
+    implementing_ratings = columns['implementing']
+    quality_ratings = columns['quality']
     
     # 计算综合评分（思维和实现的平均值）
     overall_ratings = [calc_overall(t, i) for t, i in zip(thinking_ratings, implementing_ratings)]
     
     return {
-        'count': len(votes[problem_title]),
+        'count': len(thinking_ratings),
         'thinking': {
             'mean': np.mean(thinking_ratings),
             'std': np.std(thinking_ratings)
@@ -328,6 +1301,560 @@ def calculate_stats(problem_title):
         }
     }
 
+AGREEMENT_FIELDS = ('thinking', 'implementing', 'quality')
+
+def _voter_profile(username):
+    profile = voter_profiles.get(username)
+    if profile is None:
+        profile = voter_profiles[username] = {'votes': 0, 'comments': 0, 'dev_sum': dict.fromkeys(AGREEMENT_FIELDS, 0.0)}
+    return profile
+
+def update_voter_agreement(problem_title):
+    """某题投票变化后增量更新投票者档案：只撤销并重新计入该题投票者的偏差，O(该题投票数)
+    
+    调用方需持有data_lock。
+    """
+    global profiles_version
+    for voter, deviations in _problem_deviations.pop(problem_title, {}).items():
+        profile = _voter_profile(voter)
+        profile['votes'] -= 1
+        for field, dev in zip(AGREEMENT_FIELDS, deviations):
+            profile['dev_sum'][field] -= dev
+    
+    columns = vote_columns(problem_title)
+    if columns is not None:
+        means = [sum(columns[field]) / len(columns[field]) for field in AGREEMENT_FIELDS]
+        contributions = {}
+        for k, voter in enumerate(columns['voter']):
+            deviations = tuple(abs(columns[field][k] - mean) for field, mean in zip(AGREEMENT_FIELDS, means))
+            contributions[voter] = deviations
+            profile = _voter_profile(voter)
+            profile['votes'] += 1
+            for field, dev in zip(AGREEMENT_FIELDS, deviations):
+                profile['dev_sum'][field] += dev
+        _problem_deviations[problem_title] = contributions
+    profiles_version += 1
+
+def update_comment_count(username, delta):
+    """评论增删时更新投票者档案中的评论数（调用方需持有data_lock）"""
+    global profiles_version
+    _voter_profile(username)['comments'] += delta
+    profiles_version += 1
+
+def rebuild_voter_profiles():
+    """从全部投票和评论重建投票者档案，只在加载数据或批量删除后调用"""
+    global voter_profiles, _problem_deviations, profiles_version
+    voter_profiles = {}
+    _problem_deviations = {}
+    for problem_title in vote_titles():
+        update_voter_agreement(problem_title)
+    for thread in comments.values():
+        for comment in thread:
+            _voter_profile(comment['user'])['comments'] += 1
+    profiles_version += 1
+
+def voter_agreement(profile):
+    """投票者与共识的平均绝对偏差 {字段: MAD}，没有投票时为None"""
+    if not profile['votes']:
+        return None
+    return {field: profile['dev_sum'][field] / profile['votes'] for field in AGREEMENT_FIELDS}
+
+def voter_leaderboard():
+    """按投票数（其次评论数）排序的投票者列表，档案变化后才重新排序"""
+    global _leaderboard_cache
+    if _leaderboard_cache is None or _leaderboard_cache[0] != profiles_version:
+        ranking = sorted((name for name, p in voter_profiles.items() if p['votes'] or p['comments']),
+                         key=lambda name: (-voter_profiles[name]['votes'], -voter_profiles[name]['comments'], name))
+        _leaderboard_cache = (profiles_version, ranking, {name: i + 1 for i, name in enumerate(ranking)}, {})
+    return _leaderboard_cache
+
+def leaderboard_html(current_user, limit=LEADERBOARD_SIZE):
+    """投票者排行榜的HTML，同一档案版本只生成一次"""
+    version, ranking, ranks, html_cache = voter_leaderboard()
+    if limit in html_cache:
+        table = html_cache[limit]
+    else:
+        rows = []
+        for name in ranking[:limit]:
+            profile = voter_profiles[name]
+            agreement = voter_agreement(profile)
+            cells = [f'{agreement[field]:.1f}' if field != 'quality' else f'{agreement[field]:.2f}'
+                     for field in AGREEMENT_FIELDS] if agreement else ['-'] * len(AGREEMENT_FIELDS)
+            rows.append(f'<tr><td>{ranks[name]}</td><td>{html.escape(name)}</td><td>{profile["votes"]}</td>'
+                        f'<td>{profile["comments"]}</td><td>{"</td><td>".join(cells)}</td></tr>')
+        header = ''.join(f'<th>{h}</th>' for h in ['排名', '用户', '投票数', '评论数', '思维偏差', '实现偏差', '质量偏差'])
+        table = html_cache[limit] = f'<table><tr>{header}</tr>{"".join(rows)}</table>'
+    
+    mine = ''
+    if current_user in ranks:
+        profile = voter_profiles[current_user]
+        agreement = voter_agreement(profile)
+        deviation = (f"，与平均分偏差: 思维 {agreement['thinking']:.1f} / 实现 {agreement['implementing']:.1f} / "
+                     f"质量 {agreement['quality']:.2f}") if agreement else ''
+        mine = (f'<p>我的排名: 第{ranks[current_user]}名，投票 {profile["votes"]} 次，'
+                f'评论 {profile["comments"]} 条{deviation}</p>')
+    return mine + table + '<p>偏差为该用户评分与各题平均分的平均绝对差，越小说明越接近大家的共识。</p>'
+
+def run_anomaly_detection():
+    """对全部投票做一次异常检测并发布结果"""
+    global suspicion_report
+    import anomaly
+    start = time.perf_counter()
+    version = data_version
+    arrays = collect_vote_arrays()
+    report = anomaly.detect(arrays['titles'], arrays['voters'], arrays['problem_idx'], arrays['voter_idx'],
+                            arrays['thinking'], arrays['implementing'], arrays['quality'], arrays['time'])
+    report['generated_at'] = time.time()
+    report['data_version'] = version
+    report['duration'] = time.perf_counter() - start
+    suspicion_report = report  # 整体替换，读者不会看到半成品
+
+def anomaly_worker():
+    """异常检测线程：数据有变化时定期重新检测，不在请求路径上运行"""
+    while not _shutdown.is_set():
+        if suspicion_report is None or suspicion_report['data_version'] != data_version:
+            try:
+                run_anomaly_detection()
+            except Exception as e:
+                logging.error(f"异常检测出错: {str(e)}")
+        _shutdown.wait(ANOMALY_INTERVAL)
+
+@metrics.timed('update_confidence_intervals', 'vote_solver_seconds')
+def update_confidence_intervals():
+    """重新计算投票有变化的题目的自助法置信区间，返回计算的题目数"""
+    global ci_version
+    import numpy as np
+    import bootstrap
+    updated = 0
+    for problem in list(problems):
+        title = problem['title']
+        cached = confidence_intervals.get(title)
+        if cached is not None and cached[0] == problem_version(title):
+            continue
+        with data_lock:  # 版本和投票列在锁内一起取，保证各列长度一致且与版本对应
+            version = problem_version(title)
+            columns = vote_columns(title)
+        result = None
+        try:
+            if columns is not None and len(columns['voter']) >= 2:
+                samples = np.array([columns['thinking'], columns['implementing'],
+                                    calc_overall_array(columns['thinking'], columns['implementing']), columns['quality']],
+                                   dtype=float)
+                bounds = bootstrap.mean_intervals(samples)
+                result = {field: (float(low), float(high)) for field, (low, high) in zip(CI_FIELDS, bounds)}
+        except Exception as e:
+            # 一道题出错不影响其余题目，下一轮会重试
+            logging.error(f"计算题目 {title} 的置信区间出错: {str(e)}")
+            continue
+        confidence_intervals[title] = (version, result)
+        _sort_dirty.add(title)
+        updated += 1
+    if updated:
+        ci_version += 1
+    return updated
+
+def ci_worker():
+    """置信区间线程：定期为投票有变化的题目重新做自助法重抽样，不在请求路径上计算"""
+    while not _shutdown.is_set():
+        try:
+            update_confidence_intervals()
+        except Exception as e:
+            logging.error(f"计算置信区间出错: {str(e)}")
+        _shutdown.wait(CI_INTERVAL)
+
+def confidence_interval(problem_title):
+    """最近一次算出的置信区间 {字段: (下界, 上界)}，尚未计算或票数不足时返回None"""
+    cached = confidence_intervals.get(problem_title)
+    return cached[1] if cached is not None else None
+
+def interval_html(stats, interval, field='overall'):
+    if not stats:
+        return "暂无数据"
+    if stats['count'] < 2:
+        return "票数不足"
+    if interval is None:
+        return "计算中"
+    low, high = interval[field]
+    if field == 'quality':
+        return f"{low:.2f} ~ {high:.2f}"
+    return f"{low:.0f} ~ {high:.0f}"
+
+@metrics.timed('run_calibration', 'vote_solver_seconds')
+def run_calibration():
+    """拟合投票者偏差并发布校准后的思维、实现和综合评分，从上一次的偏差热启动"""
+    global calibrated_ratings, voter_biases, calibration_version, _calibrated_data_version
+    import numpy as np
+    import calibration
+    version = data_version
+    arrays = collect_vote_arrays()
+    if not arrays['titles']:
+        calibrated_ratings, _calibrated_data_version = {}, version
+        return
+    init = np.array([voter_biases.get(voter, 0.0) for voter in arrays['voters']])
+    difficulty, bias, iterations = calibration.fit(
+        arrays['problem_idx'], arrays['voter_idx'], np.array([arrays['thinking'], arrays['implementing']]),
+        len(arrays['titles']), len(arrays['voters']), init)
+    overall = calc_overall_array(difficulty[0], difficulty[1])
+    ratings = {title: {'thinking': float(t), 'implementing': float(i), 'overall': float(o)}
+               for title, t, i, o in zip(arrays['titles'], difficulty[0], difficulty[1], overall)}
+    changed = set(ratings).symmetric_difference(calibrated_ratings)
+    changed.update(title for title, rating in ratings.items()
+                   if title in calibrated_ratings and calibrated_ratings[title]['overall'] != rating['overall'])
+    calibrated_ratings = ratings
+    voter_biases = dict(zip(arrays['voters'], bias.tolist()))
+    _calibrated_data_version = version
+    calibration_version += 1
+    _sort_dirty.update(changed)
+    logging.info(f"校准评分完成: {len(arrays['titles'])} 道题, {len(arrays['voters'])} 位投票者, 迭代 {iterations} 轮")
+
+def calibration_worker():
+    """校准评分线程：数据有变化时定期重新拟合"""
+    while not _shutdown.is_set():
+        if _calibrated_data_version != data_version:
+            try:
+                run_calibration()
+            except Exception as e:
+                logging.error(f"校准评分出错: {str(e)}")
+        _shutdown.wait(CALIBRATION_INTERVAL)
+
+def calibrated_html(problem_title):
+    calibrated = calibrated_ratings.get(problem_title)
+    if calibrated is None:
+        return "暂无数据"
+    return format_rating_with_color(calibrated['overall'])
+
+def comparison_id(problem_title):
+    i = _comparison_ids.get(problem_title)
+    if i is None:
+        i = _comparison_ids[problem_title] = len(_comparison_titles)
+        _comparison_titles.append(problem_title)
+    return i
+
+def apply_comparison(username, harder, easier, incremental=True):
+    """在内存中记录一条对比，并按Elo规则增量更新两道题的对比难度（调用方需持有data_lock）"""
+    global pairwise_version
+    import pairwise
+    _comparison_winners.append(comparison_id(harder))
+    _comparison_losers.append(comparison_id(easier))
+    pairwise_counts[harder] += 1
+    pairwise_counts[easier] += 1
+    _user_comparisons[username].add((min(harder, easier), max(harder, easier)))
+    if incremental:
+        a = pairwise_ratings.get(harder, pairwise.BASE)
+        b = pairwise_ratings.get(easier, pairwise.BASE)
+        delta = PAIRWISE_K * (1 - getEloWinProbability(a, b))
+        pairwise_ratings[harder] = a + delta
+        pairwise_ratings[easier] = b - delta
+        _sort_dirty.update((harder, easier))
+    pairwise_version += 1
+
+def record_comparison(username, harder, easier):
+    """记录用户认为 harder 比 easier 更难，并追加写入对比记录文件"""
+    with data_lock:
+        apply_comparison(username, harder, easier)
+        with open(COMPARISON_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([time.time(), username, harder, easier], ensure_ascii=False) + '\n')
+
+def load_comparisons():
+    """读取对比记录并做一次批量拟合"""
+    try:
+        with open(COMPARISON_FILE, 'r', encoding='utf-8') as f:
+            with data_lock:
+                for line in f:
+                    try:
+                        _, username, harder, easier = json.loads(line)
+                    except ValueError:
+                        continue  # 写了一半的行
+                    apply_comparison(username, harder, easier, incremental=False)
+    except FileNotFoundError:
+        return
+    refit_pairwise()
+
+@metrics.timed('refit_pairwise', 'vote_solver_seconds')
+def refit_pairwise():
+    """用全部对比重新拟合Bradley-Terry难度；拟合期间新到的对比在结果上补做增量更新"""
+    global pairwise_ratings, pairwise_version, _pairwise_fitted
+    import numpy as np
+    import pairwise
+    with data_lock:
+        m = len(_comparison_winners)
+        if not m:
+            return
+        titles = list(_comparison_titles)
+        winners = np.frombuffer(_comparison_winners[:m], dtype=np.int32)
+        losers = np.frombuffer(_comparison_losers[:m], dtype=np.int32)
+        init = np.array([pairwise_ratings.get(title, pairwise.BASE) for title in titles])
+    fitted, iterations = pairwise.fit(winners, losers, len(titles), init)
+    with data_lock:
+        ratings = dict(zip(titles, fitted.tolist()))
+        for title in _comparison_titles[len(titles):]:
+            ratings[title] = pairwise.BASE  # 拟合期间首次参与对比的题目
+        late = range(m, len(_comparison_winners))
+        pairwise.elo_replay(ratings, [_comparison_titles[_comparison_winners[i]] for i in late],
+                            [_comparison_titles[_comparison_losers[i]] for i in late],
+                            PAIRWISE_K, getEloWinProbability)
+        pairwise_ratings = ratings
+        _pairwise_fitted = m
+        pairwise_version += 1
+        _sort_dirty.update(ratings)  # 所有参与对比的题目的排序位置都可能变化
+    logging.info(f"难度对比拟合完成: {m} 条对比, {len(titles)} 道题, 迭代 {iterations} 轮")
+
+def pairwise_worker():
+    """对比难度拟合线程：有新对比时定期做一次批量拟合"""
+    while not _shutdown.wait(PAIRWISE_REFIT_INTERVAL):
+        if len(_comparison_winners) != _pairwise_fitted:
+            try:
+                refit_pairwise()
+            except Exception as e:
+                logging.error(f"难度对比拟合出错: {str(e)}")
+
+def pick_comparison_pair(username):
+    """为用户挑一对未对比过的题目：优先对比次数少的题，对手取对比难度接近的题"""
+    import pairwise
+    if len(problems) < 2:
+        return None
+    done = _user_comparisons.get(username, ())
+    for _ in range(20):
+        first = min(random.sample(problems, min(8, len(problems))), key=lambda p: pairwise_counts.get(p['title'], 0))['title']
+        rating = pairwise_ratings.get(first, pairwise.BASE)
+        candidates = [(abs(pairwise_ratings.get(p['title'], pairwise.BASE) - rating), p['title'])
+                      for p in random.sample(problems, min(8, len(problems)))
+                      if p['title'] != first and (min(first, p['title']), max(first, p['title'])) not in done]
+        if candidates:
+            pair = [first, min(candidates)[1]]
+            random.shuffle(pair)  # 避免总把对比次数少的题放在左边
+            return pair
+    return None
+
+def pairwise_entry(problem_title):
+    """(对比难度, 对比次数)，没有参与过对比时返回None"""
+    count = pairwise_counts.get(problem_title, 0)
+    if not count:
+        return None
+    return pairwise_ratings.get(problem_title), count
+
+def pairwise_html(entry):
+    if entry is None:
+        return "暂无对比"
+    return f'{format_rating_with_color(entry[0])} ({entry[1]}次)'
+
+@metrics.timed('compare_problems')
+async def compare_problems():
+    if await check_and_notify_banned():
+        return
+
+    """难度对比：连续展示两道题，选择更难的一道"""
+    if not hasattr(local, 'current_user') or not local.current_user:
+        toast("请先登录")
+        return
+    
+    done = 0
+    admitted = False
+    while True:
+        pair = pick_comparison_pair(local.current_user)
+        if pair is None:
+            toast("暂时没有可以对比的题目")
+            break
+        choice = await actions(f"哪道题更难？（本次已对比 {done} 组）", buttons=[
+            {'label': pair[0], 'value': 0},
+            {'label': pair[1], 'value': 1},
+            {'label': "跳过", 'value': 'skip'},
+            {'label': "结束", 'value': 'stop'},
+        ], help_text="只比较思维和实现的总体难度，不确定时可以跳过")
+        if choice == 'stop':
+            break
+        if choice == 'skip':
+            continue
+        
+        if await check_and_notify_banned():
+            return
+        # 每条对比只是追加一行记录，一次对比会话只计一次写操作，否则连续对比10组后就会被限流
+        if not admitted:
+            if not await admit_write():
+                break
+            admitted = True
+        
+        harder, easier = pair[choice], pair[1 - choice]
+        record_comparison(local.current_user, harder, easier)
+        log_action(local.current_user, "难度对比", f"题目: {harder}, 较易: {easier}", problem=harder)
+        done += 1
+    
+    if done:
+        toast(f"已提交 {done} 组对比！")
+        await refresh_page()
+
+async def show_suspicion_report():
+    if await check_and_notify_banned():
+        return
+    
+    """显示可疑用户列表（管理员）"""
+    if not hasattr(local, 'current_user') or not local.current_user or not users[local.current_user]['is_admin']:
+        toast("无权执行此操作")
+        return
+    
+    report = suspicion_report
+    if report is None:
+        toast("异常检测尚未完成，请稍后再试")
+        return
+    
+    content = [put_text(f"检测时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['generated_at']))}，"
+                        f"耗时 {report['duration'] * 1000:.0f}ms，每{ANOMALY_INTERVAL}秒在数据变化后自动更新")]
+    if report['users']:
+        user_table = [['用户', '可疑度', '投票数', '原因']]
+        for item in report['users']:
+            user_table.append([item['user'], f"{item['score']:.2f}", str(item['votes']), "；".join(item['reasons'])])
+        content.append(put_table(user_table))
+    else:
+        content.append(put_text("暂无可疑用户"))
+    if report['pairs']:
+        content.append(put_markdown("### 评分高度一致的账号"))
+        content.append(put_table([['账号', '共同题数', '均方根差']] +
+                                 [[" / ".join(item['users']), str(item['common']), f"{item['rms']:.1f}"] for item in report['pairs']]))
+    if report['problems']:
+        content.append(put_markdown("### 短时间内集中投票的题目"))
+        content.append(put_text(f"各题{report['burst_window']:.0f}秒内最多投票数的中位数为 {report['burst_baseline']:.0f}，"
+                                f"以下题目明显高于其他题目"))
+        content.append(put_table([['题目', f"{report['burst_window']:.0f}秒内最多投票数"]] +
+                                 [[item['title'], str(item['burst'])] for item in report['problems']]))
+    popup("可疑投票", content, size='large')
+    log_action(local.current_user, "查看可疑投票")
+
+def register_session():
+    """登记当前会话，会话已满时返回False"""
+    session = get_current_session()
+    key = id(session)
+    if key in sessions:
+        touch_session()
+        return True
+    if MAX_SESSIONS and len(sessions) >= MAX_SESSIONS:
+        evict_idle_sessions()
+        if len(sessions) >= MAX_SESSIONS:
+            return False
+    now = time.time()
+    sessions[key] = {'session': session, 'user': None, 'ip': info.user_ip, 'start': now, 'last_active': now, 'actions': 0}
+    defer_call(lambda: sessions.pop(key, None))
+    return True
+
+def touch_session():
+    """记录当前会话的一次操作"""
+    record = sessions.get(id(get_current_session()))
+    if record is not None:
+        record['last_active'] = time.time()
+        record['actions'] += 1
+        record['user'] = getattr(local, 'current_user', None)
+
+def session_memory(record):
+    """粗略估算会话占用的内存（字节）：会话变量加上挂起的回调和输入协程"""
+    import sys
+    session = record['session']
+    size = sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in session.save.items())
+    return size + len(getattr(session, 'coros', ())) * SESSION_TASK_COST
+
+def prune_buckets(buckets):
+    """丢弃已恢复满的令牌桶，避免按用户或IP创建的桶无限增长"""
+    for key, bucket in list(buckets.items()):
+        if bucket.full():
+            del buckets[key]
+
+def evict_idle_sessions():
+    """关闭空闲超时的会话，并清理闲置的令牌桶（在事件循环线程中调用）"""
+    prune_buckets(_user_buckets)
+    prune_buckets(_admin_override_buckets)
+    if not SESSION_IDLE_TIMEOUT:
+        return
+    deadline = time.time() - SESSION_IDLE_TIMEOUT
+    for key, record in list(sessions.items()):
+        if record['last_active'] >= deadline:
+            continue
+        sessions.pop(key, None)
+        session = record['session']
+        if session.closed():
+            continue
+        try:
+            session.send_task_command({'command': 'close_session'})  # 通知浏览器断开连接
+        except Exception:
+            pass
+        session.close()
+        log_action(record['user'] or "anonymous", "会话超时关闭",
+                   f"空闲 {(time.time() - record['last_active']) / 60:.0f} 分钟")
+
+def start_session_sweeper():
+    """在事件循环上定期清理空闲会话"""
+    global _session_sweeper
+    import tornado.ioloop
+    _session_sweeper = tornado.ioloop.PeriodicCallback(evict_idle_sessions, SESSION_SWEEP_INTERVAL * 1000)
+    _session_sweeper.start()
+
+async def show_sessions():
+    if await check_and_notify_banned():
+        return
+    
+    """显示在线会话（管理员）"""
+    if not hasattr(local, 'current_user') or not local.current_user or not users[local.current_user]['is_admin']:
+        toast("无权执行此操作")
+        return
+    
+    now = time.time()
+    rows = []
+    total_memory = 0
+    for record in sorted(sessions.values(), key=lambda r: r['last_active'], reverse=True):
+        memory = session_memory(record)
+        total_memory += memory
+        rows.append([record['user'] or "未登录", record['ip'],
+                     time.strftime('%m-%d %H:%M', time.localtime(record['start'])),
+                     f"{(now - record['last_active']) / 60:.0f} 分钟", str(record['actions']), f"{memory / 1024:.0f} KB"])
+    limit = MAX_SESSIONS or "不限"
+    idle = f"{SESSION_IDLE_TIMEOUT / 60:.0f} 分钟" if SESSION_IDLE_TIMEOUT else "不关闭"
+    popup("在线会话", [
+        put_text(f"在线 {len(sessions)} / {limit}，空闲超时 {idle}，估算内存共 {total_memory / 1024 / 1024:.1f} MB"),
+        put_table([['用户', 'IP', '开始时间', '空闲', '操作数', '估算内存']] + rows),
+    ], size='large')
+    log_action(local.current_user, "查看在线会话")
+
+async def show_audit_log():
+    if await check_and_notify_banned():
+        return
+    
+    """按条件查询操作审计记录（管理员）"""
+    if not hasattr(local, 'current_user') or not local.current_user or not users[local.current_user]['is_admin']:
+        toast("无权执行此操作")
+        return
+    if audit_store is None:
+        toast("审计库未启用")
+        return
+    
+    data = await input_group("查询操作记录", [
+        input("用户", name="user", placeholder="留空表示全部"),
+        input("题目", name="problem", placeholder="留空表示全部，可用 * 通配"),
+        select("操作类型", options=["全部"] + audit_store.actions(), name="action"),
+        input("开始时间", name="since", placeholder="YYYY-mm-dd HH:MM，留空不限"),
+        input("结束时间", name="until", placeholder="YYYY-mm-dd HH:MM，留空不限"),
+        input("最多条数", name="limit", type=NUMBER, value=200),
+    ], cancelable=True)
+    if data is None:
+        return
+    
+    from audit import parse_time
+    try:
+        since = parse_time(data['since']) if data['since'].strip() else None
+        until = parse_time(data['until']) if data['until'].strip() else None
+    except ValueError as e:
+        toast(str(e))
+        return
+    
+    start = time.perf_counter()
+    events = audit_store.query(user=data['user'].strip() or None, problem=data['problem'].strip() or None,
+                               action=None if data['action'] == "全部" else data['action'],
+                               since=since, until=until, limit=max(1, min(data['limit'] or 200, 5000)))
+    elapsed = time.perf_counter() - start
+    rows = [[time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e['ts'])), e['user'], e['action'], e['details'] or '']
+            for e in events]
+    popup("操作记录", [
+        put_text(f"共 {len(events)} 条（按时间从新到旧），查询耗时 {elapsed * 1000:.0f}ms"),
+        put_table([['时间', '用户', '操作', '详情']] + rows) if rows else put_text("没有符合条件的记录"),
+    ], size='large')
+    log_action(local.current_user, "查询操作记录", f"用户: {data['user']}, 题目: {data['problem']}, 操作: {data['action']}")
+
 def check_user_banned(username):
     """检查用户是否被封禁"""
     if username in users and users[username].get('banned', False):
@@ -336,6 +1863,7 @@ def check_user_banned(username):
 
 async def check_and_notify_banned():
     """检查当前用户是否被封禁并通知"""
+    touch_session()
     if hasattr(local, 'current_user') and local.current_user:
         if check_user_banned(local.current_user):
             toast("您的账户已被封禁，无法执行任何操作")
@@ -343,7 +1871,9 @@ async def check_and_notify_banned():
             return True
     return False
 
+@metrics.timed('execute_admin_command')
 async def execute_admin_command():
+    global _profiler
     if await check_and_notify_banned():
         return
     
@@ -367,7 +1897,9 @@ async def execute_admin_command():
                                "5. allow [username] [tag_permission] - 给予用户某个tag_permission\n"
                                "6. disallow [username] [tag_permission] - 取消用户tag_permission\n"
                                "7. delete [username] - 删除用户及其名下的所有评论、vote\n"
-                               "8. passwd [username] [password] - 给用户更改密码")
+                               "8. passwd [username] [password] - 给用户更改密码\n"
+                               "9. backup - 立即做一次全量备份（恢复请使用 backup.py restore）\n"
+                               "10. profile [seconds] - 采样分析服务器若干秒（默认30），完成后下载折叠栈文件")
         ],
         cancelable=True
     )
@@ -489,6 +2021,7 @@ async def execute_admin_command():
             
             if tag_permission not in users[username]['tag_permissions']:
                 users[username]['tag_permissions'].append(tag_permission)
+                invalidate_permissions()
                 save_users()
                 
                 log_action(local.current_user, "授予标签权限", f"用户: {username}, 权限: {tag_permission}")
@@ -514,6 +2047,7 @@ async def execute_admin_command():
             
             if tag_permission in users[username]['tag_permissions']:
                 users[username]['tag_permissions'].remove(tag_permission)
+                invalidate_permissions()
                 save_users()
                 
                 log_action(local.current_user, "移除标签权限", f"用户: {username}, 权限: {tag_permission}")
@@ -554,12 +2088,16 @@ async def execute_admin_command():
                 
                 # 删除评论
                 for problem_title in list(comments.keys()):
-                    comments[problem_title] = [c for c in comments[problem_title] if c['user'] != username]
+                    comments[problem_title].remove_where(lambda c: c['user'] == username)
                     if not comments[problem_title]:
                         del comments[problem_title]
+                touch_data()
+                # 投票和评论都删除后再重建，否则该用户会带着评论数留在档案和排行榜中
+                rebuild_voter_profiles()
             
             # 删除用户
             del users[username]
+            invalidate_permissions()
             save_users()
             save_votes()
             
@@ -577,12 +2115,42 @@ async def execute_admin_command():
                 toast(f"用户 {username} 不存在")
                 return
             
-            users[username]['password'] = hash_password(password)
+            users[username]['password'] = await hash_password_async(password)
             save_users()
             
             log_action(local.current_user, "重置用户密码", f"用户: {username}")
             toast(f"已重置 {username} 的密码")
             
+        elif cmd == "backup":
+            # 在后台线程中备份，不阻塞事件循环
+            threading.Thread(target=run_backup, kwargs={'force_base': True}, daemon=True).start()
+            log_action(local.current_user, "手动备份")
+            toast(f"已开始全量备份，备份文件位于 {BACKUP_DIR}/")
+            
+        elif cmd == "profile":
+            if len(args) > 1 or (args and not args[0].isdigit()):
+                toast("用法: profile [seconds]")
+                return
+            seconds = min(int(args[0]) if args else 30, PROFILE_MAX_SECONDS)
+            if _profiler is not None:
+                toast("已有采样正在进行，请稍后再试")
+                return
+            import asyncio
+            _profiler = metrics.StackSampler().start()
+            log_action(local.current_user, "性能采样", f"时长: {seconds}s")
+            toast(f"开始采样 {seconds} 秒，完成后会提供下载")
+            try:
+                # 采样在后台线程进行，这里只是异步等待，不阻塞事件循环
+                await run_asyncio_coroutine(asyncio.sleep(seconds))
+            finally:
+                sampler, _profiler = _profiler.stop(), None
+            name = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+            popup("性能采样结果", [
+                put_text(f"共采样 {sampler.samples} 次（每 {sampler.interval * 1000:.0f} ms 一次），"
+                         f"折叠栈格式，可用 flamegraph.pl 或 speedscope 查看"),
+                put_file(name, sampler.collapsed().encode('utf-8'), '下载采样结果'),
+            ])
+            
         else:
             toast(f"未知命令: {cmd}")
             
@@ -591,6 +2159,7 @@ async def execute_admin_command():
         logging.error(f"执行命令出错: {command}, 错误: {str(e)}")
 
 # 在login函数中添加封禁检查
+@metrics.timed('login')
 async def login():
     """用户登录/注册"""
     while True:
@@ -605,7 +2174,6 @@ async def login():
             continue
             
         username = data['username']
-        password_hash = hash_password(data['password'])
         
         if username in users:
             # 检查用户是否被封禁
@@ -614,11 +2182,28 @@ async def login():
                 toast("此账户已被封禁，无法登录")
                 continue
 
-            force_login = False
-            for adminname in users:
-                if users[adminname]['is_admin'] and users[adminname]['password'] == password_hash:
-                    force_login = True
-            if users[username]['password'] == password_hash or force_login:
+            # 先校验本人密码，失败时再尝试管理员密码（管理员可用自己的密码登录任意账户）
+            # 尝试管理员密码要对每位管理员各算一次哈希，按客户端IP限流，避免登录风暴时CPU开销成倍增加，
+            # 同时一个来源的大量失败登录不会挡住其他来源的管理员
+            password_hash = None
+            if await verify_password_async(data['password'], users[username]['password']):
+                if password_needs_upgrade(users[username]['password']):
+                    users[username]['password'] = await hash_password_async(data['password'])
+                    log_action(username, "密码哈希升级", PASSWORD_SCHEME)
+                password_hash = users[username]['password']
+            else:
+                admins = [adminname for adminname in list(users)
+                          if adminname != username and users[adminname]['is_admin']]
+                if admins:
+                    if admin_override_bucket().reserve() is None:
+                        log_action(username, "登录失败", "尝试过于频繁")
+                        toast("登录尝试过于频繁，请稍后再试")
+                        continue
+                    for adminname in admins:
+                        if await verify_password_async(data['password'], users[adminname]['password']):
+                            password_hash = users[adminname]['password']
+                            break
+            if password_hash is not None:
                 local.current_user = username
                 
                 # 从cookie加载排序偏好，如果没有则设置默认值
@@ -651,6 +2236,10 @@ async def login():
                 toast("密码错误，请重试")
         else:
             # 新用户注册
+            password_hash = await hash_password_async(data['password'])
+            if username in users:  # 计算哈希期间已被其他会话注册
+                toast("用户名已被注册，请重试")
+                continue
             users[username] = {
                 'password': password_hash,
                 'created_at': time.time(),
@@ -675,13 +2264,82 @@ async def login():
             toast(f"新用户注册成功，欢迎 {username}!")
             return
 
+def build_tag_automaton(tags):
+    """用全部标签权限构建Aho-Corasick自动机，返回 (goto, fail, output)"""
+    goto = [{}]
+    output = [set()]
+    for tag in tags:
+        node = 0
+        for ch in tag:
+            if ch not in goto[node]:
+                goto.append({})
+                output.append(set())
+                goto[node][ch] = len(goto) - 1
+            node = goto[node][ch]
+        output[node].add(tag)
+    
+    fail = [0] * len(goto)
+    queue = list(goto[0].values())
+    for node in queue:
+        for ch, child in goto[node].items():
+            queue.append(child)
+            f = fail[node]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[child] = goto[f][ch] if ch in goto[f] and goto[f][ch] != child else 0
+            output[child] |= output[fail[child]]
+    return goto, fail, output
+
+def match_tags(automaton, text):
+    """一次扫描找出text中出现的所有标签"""
+    goto, fail, output = automaton
+    found = set()
+    node = 0
+    for ch in text:
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        if output[node]:
+            found |= output[node]
+    return found
+
+def invalidate_permissions():
+    """标签权限或用户变化后调用，下次检查权限时重建题目-编辑者映射"""
+    global _permission_index
+    _permission_epoch[0] += 1
+    _permission_index = None
+
+def permission_index():
+    """获取 {题目: 可编辑的非管理员用户集合}，题库或权限变化后才重建"""
+    global _permission_index
+    index = _permission_index
+    key = (catalogue_version, _permission_epoch[0])
+    if index is not None and index[0] == key:
+        return index
+    holders = defaultdict(set)  # {tag: {username}}
+    for username, user in users.items():
+        for tag in user.get('tag_permissions', []):
+            holders[tag].add(username)
+    automaton = build_tag_automaton(holders)
+    editors = {}
+    for problem in problems:
+        matched = match_tags(automaton, problem['title']) if holders else ()
+        if matched:
+            editors[problem['title']] = frozenset().union(*(holders[tag] for tag in matched))
+    index = _permission_index = (key, editors)
+    return index
+
 def can_edit_problem(username, problem_title):
     """判断用户是否有权限编辑某题目"""
     if users[username]['is_admin']:
         return True
-    perms = users[username].get('tag_permissions', [])
-    return any(tag in problem_title for tag in perms)
+    if problem_title not in problem_index:
+        # 不在题库中的题目没有预先计算，直接判断
+        perms = users[username].get('tag_permissions', [])
+        return any(tag in problem_title for tag in perms)
+    return username in permission_index()[1].get(problem_title, ())
 
+@metrics.timed('add_comment')
 async def add_comment(problem_title):
     if await check_and_notify_banned():
         return
@@ -699,32 +2357,39 @@ async def add_comment(problem_title):
     )
     
     if data is None:  # 用户取消了输入
-        log_action(local.current_user, "取消评论", f"题目: {problem_title}")
+        log_action(local.current_user, "取消评论", f"题目: {problem_title}", problem=problem_title)
         toast("已取消评论")
         return
     
     if await check_and_notify_banned():
         return
     
+    if not await admit_write():
+        return
+    
+    submit_comment(local.current_user, problem_title, data['text'])
+    
+    log_action(local.current_user, "添加评论", f"题目: {problem_title}, 内容: {data['text']}", problem=problem_title)
+    toast("评论提交成功！")
+    await show_problem_details(problem_title)
+
+def submit_comment(username, problem_title, text):
+    """添加一条评论并请求保存，返回新评论"""
     comment = {
-        'user': local.current_user,
-        'text': data['text'],
+        'user': username,
+        'text': text,
         'time': time.time()
     }
     
     with data_lock:
-        comments[problem_title].append(comment)
+        comments[problem_title].add(comment)
+        touch_data(problem_title)
+        update_comment_count(username, 1)
     
-    # 更新最后保存时间并立即保存
-    global last_save_time
-    last_save_time = time.time()
-    save_votes()
-    
-    log_action(local.current_user, "添加评论", f"题目: {problem_title}, 内容: {data['text']}")
-    toast("评论提交成功！")
-    await show_problem_details(problem_title)
+    request_save()
+    return comment
 
-async def delete_comment(problem_title, comment):
+async def delete_comment(problem_title, comment_id):
     if await check_and_notify_banned():
         return
 
@@ -733,26 +2398,40 @@ async def delete_comment(problem_title, comment):
         toast("请先登录")
         return
     
+    thread = comments.get(problem_title)
+    comment = thread.get(comment_id) if thread else None
+    if comment is None:
+        toast("评论不存在或已被删除")
+        return
+    
     # 检查权限：管理员或评论所有者
     if local.current_user != comment['user'] and not users[local.current_user]['is_admin']:
         toast("无权删除此评论")
         return
     
-    with data_lock:
-        comments[problem_title] = [c for c in comments[problem_title] 
-                                 if not (c['user'] == comment['user'] and 
-                                         c['text'] == comment['text'] and 
-                                         c['time'] == comment['time'])]
+    if not await admit_write():
+        return
     
-    # 更新最后保存时间并立即保存
-    global last_save_time
-    last_save_time = time.time()
-    save_votes()
+    remove_comment(problem_title, comment_id)
     
-    log_action(local.current_user, "删除评论", f"题目: {problem_title}, 原内容: {comment['text']}")
+    log_action(local.current_user, "删除评论", f"题目: {problem_title}, 原内容: {comment['text']}", problem=problem_title)
     toast("评论已删除！")
     await show_problem_details(problem_title)
 
+def remove_comment(problem_title, comment_id):
+    """删除评论并请求保存，返回被删除的评论（不存在时返回None）"""
+    with data_lock:
+        thread = comments.get(problem_title)
+        comment = thread.remove(comment_id) if thread is not None else None
+        if comment is not None:
+            update_comment_count(comment['user'], -1)
+            touch_data(problem_title)
+    
+    if comment is not None:
+        request_save()
+    return comment
+
+@metrics.timed('vote_for_problem')
 async def vote_for_problem(problem_title):
     if await check_and_notify_banned():
         return
@@ -775,35 +2454,124 @@ async def vote_for_problem(problem_title):
     )
     
     if data is None:  # 用户取消了输入
-        log_action(local.current_user, "取消评分", f"题目: {problem_title}")
+        log_action(local.current_user, "取消评分", f"题目: {problem_title}", problem=problem_title)
         toast("已取消评分")
         return
     
     if await check_and_notify_banned():
         return
     
-    # 添加投票者信息
-    data['voter'] = local.current_user
+    if not await admit_write():
+        return
     
-    # 保存投票 - 如果同一人已投过票，则删除旧投票
+    submit_votes(local.current_user, {problem_title: data})
+    
+    log_action(local.current_user, "评分提交", f"题目: {problem_title}, 思维: {data['thinking']}, 实现: {data['implementing']}, 质量: {data['quality']}", problem=problem_title)
+    toast("评分提交成功！")
+    await refresh_page()
+
+def submit_votes(username, ratings):
+    """把一批评分 {problem_title: {'thinking', 'implementing', 'quality'}} 作为一次原子更新写入并保存一次"""
+    now = time.time()
     with data_lock:
-        if problem_title not in votes:
-            votes[problem_title] = []
-        
-        # 检查是否已有同一人的投票
-        # 移除同一投票者的旧投票
-        votes[problem_title] = [v for v in votes[problem_title] if v['voter'] != local.current_user]
-        
-        # 添加新投票
-        votes[problem_title].append(data)
+        for problem_title, rating in ratings.items():
+            # 添加投票者信息和投票时间
+            rating['voter'] = username
+            rating['time'] = now
+            
+            # 保存投票 - 如果同一人已投过票，则删除旧投票；新列表构建完整后再整体替换
+            old_votes = votes[problem_title] if problem_title in votes else []
+            votes[problem_title] = [v for v in old_votes if v['voter'] != username] + [rating]
+            touch_data(problem_title)
+            update_voter_agreement(problem_title)
     
-    # 更新最后保存时间并立即保存
-    global last_save_time
-    last_save_time = time.time()
-    save_votes()
+    request_save()
+
+def own_vote(username, problem_title):
+    """用户在某题上的现有投票，没有时返回None"""
+    columns = vote_columns(problem_title)
+    if columns is None or username not in columns['voter']:
+        return None
+    k = columns['voter'].index(username)
+    return {field: columns[field][k] for field in ('thinking', 'implementing', 'quality')}
+
+@metrics.timed('rating_sheet')
+async def rating_sheet():
+    if await check_and_notify_banned():
+        return
     
-    log_action(local.current_user, "评分提交", f"题目: {problem_title}, 思维: {data['thinking']}, 实现: {data['implementing']}, 质量: {data['quality']}")
-    toast("评分提交成功！")
+    """批量评分：一张表填写多道题，校验后一次性提交"""
+    if not hasattr(local, 'current_user') or not local.current_user:
+        toast("请先登录")
+        return
+    
+    titles = [problem['title'] for problem in problems]
+    if len(titles) > RATING_SHEET_MAX:
+        query = await input_group("批量评分", [
+            input(f"题目较多，请输入题目名关键字筛选（每次最多{RATING_SHEET_MAX}题）", name="keyword", required=True),
+        ], cancelable=True)
+        if query is None:
+            return
+        titles = [title for title in titles if query['keyword'].strip() in title]
+        if not titles:
+            toast("没有匹配的题目")
+            return
+        if len(titles) > RATING_SHEET_MAX:
+            toast(f"匹配 {len(titles)} 题，只显示前 {RATING_SHEET_MAX} 题")
+            titles = titles[:RATING_SHEET_MAX]
+    
+    existing = {title: own_vote(local.current_user, title) for title in titles}
+    fields = [('thinking', "思维难度 (800-3500)", NUMBER), ('implementing', "实现难度 (800-3500)", NUMBER),
+              ('quality', "质量 (-5~+5)", FLOAT)]
+    inputs = []
+    for i, title in enumerate(titles):
+        for field, label, input_type in fields:
+            old = existing[title][field] if existing[title] else None
+            if old is not None and input_type == NUMBER:
+                old = int(old)
+            inputs.append(input(f"{title} - {label}", name=f"{field}_{i}", type=input_type,
+                                value=old, placeholder="留空表示不评此题"))
+    
+    def check_sheet(data):
+        for i in range(len(titles)):
+            row = [data[f"{field}_{i}"] for field, _, _ in fields]
+            if all(value is None for value in row):
+                continue
+            for (field, _, _), value in zip(fields, row):
+                if value is None:
+                    return f"{field}_{i}", "同一题的三项评分需要都填写或都留空"
+                error = validate_rating(value, field)
+                if error:
+                    return f"{field}_{i}", error
+    
+    data = await input_group(f"批量评分（{len(titles)} 题，留空的题目不评分）", inputs,
+                             validate=check_sheet, cancelable=True)
+    if data is None:
+        toast("已取消评分")
+        return
+    
+    if await check_and_notify_banned():
+        return
+    
+    # 只提交新填写或有改动的题目
+    ratings = {}
+    for i, title in enumerate(titles):
+        rating = {field: data[f"{field}_{i}"] for field, _, _ in fields}
+        if rating['thinking'] is None or rating == existing[title]:
+            continue
+        ratings[title] = rating
+    if not ratings:
+        toast("没有需要提交的评分")
+        return
+    
+    if not await admit_write():
+        return
+    
+    submit_votes(local.current_user, ratings)
+    
+    for title, rating in ratings.items():
+        log_action(local.current_user, "评分提交", f"题目: {title}, 思维: {rating['thinking']}, 实现: {rating['implementing']}, 质量: {rating['quality']}", problem=title)
+    toast(f"已提交 {len(ratings)} 道题的评分！")
     await refresh_page()
 
 async def edit_problem_meta(problem_title):
@@ -830,7 +2598,7 @@ async def edit_problem_meta(problem_title):
     )
 
     if data is None:
-        log_action(local.current_user, "取消编辑题目元数据", f"题目: {problem_title}")
+        log_action(local.current_user, "取消编辑题目元数据", f"题目: {problem_title}", problem=problem_title)
         toast("已取消编辑")
         return
     
@@ -841,31 +2609,36 @@ async def edit_problem_meta(problem_title):
         toast("无权执行此操作")
         return
     
-    with data_lock:
-        problem_metas[problem_title] = {
-            'difficulty': data['difficulty'],
-            'tags': data['tags']
-        }
+    if not await admit_write():
+        return
     
-    global last_save_time
-    last_save_time = time.time()
-    save_votes()
+    set_problem_meta(problem_title, data['difficulty'], data['tags'])
     
-    log_action(local.current_user, "编辑题目元数据", f"题目: {problem_title}, 难度: {data['difficulty']}, 标签: {data['tags']}")
+    log_action(local.current_user, "编辑题目元数据", f"题目: {problem_title}, 难度: {data['difficulty']}, 标签: {data['tags']}", problem=problem_title)
     toast("元数据更新成功！")
     await show_problem_details(problem_title)
 
+def set_problem_meta(problem_title, difficulty, tags):
+    """更新题目的知识点难度和标签并请求保存"""
+    with data_lock:
+        problem_metas[problem_title] = {
+            'difficulty': difficulty,
+            'tags': tags
+        }
+        touch_data(problem_title)
+    
+    request_save()
+
+@metrics.timed('show_problem_details')
 async def show_problem_details(problem_title):
     """显示题目详细投票数据"""
     stats = calculate_stats(problem_title)
-    problem_comments = comments.get(problem_title, [])
+    interval = confidence_interval(problem_title)
+    problem_comments = comments.get(problem_title)
     
     # 查找题目的链接
-    problem_link = ""
-    for problem in problems:
-        if problem['title'] == problem_title:
-            problem_link = problem['link']
-            break
+    problem = get_problem(problem_title)
+    problem_link = problem['link'] if problem else ""
     
     # 获取题目的元数据
     meta = problem_metas.get(problem_title, {})
@@ -885,8 +2658,14 @@ async def show_problem_details(problem_title):
     content.append(put_markdown("### 题目信息"))
     info_table = [
         ['知识点难度', put_html(get_difficulty_html(difficulty))],
-        ['标签', tags if tags else "暂无标签"]
+        ['标签', tags if tags else "暂无标签"],
+        ['对比难度', put_html(pairwise_html(pairwise_entry(problem_title)))]
     ]
+    calibrated = calibrated_ratings.get(problem_title) if CALIBRATION_ENABLED else None
+    if calibrated:
+        info_table.append(['校准后难度', put_html(f"思维 {format_rating_with_color(calibrated['thinking'])} / "
+                                              f"实现 {format_rating_with_color(calibrated['implementing'])} / "
+                                              f"综合 {format_rating_with_color(calibrated['overall'])}")])
     
     # 如果有权限（管理员或匹配tag_permissions），添加编辑按钮
     if hasattr(local, 'current_user') and local.current_user and can_edit_problem(local.current_user, problem_title):
@@ -921,11 +2700,11 @@ async def show_problem_details(problem_title):
         content.extend([
             put_markdown("### 统计信息"),
             put_table([
-                ['指标', '平均分', '标准差'],
-                ['思维难度', put_html(format_rating_with_color(stats['thinking']['mean'])), f"{stats['thinking']['std']:.2f}"],
-                ['实现难度', put_html(format_rating_with_color(stats['implementing']['mean'])), f"{stats['implementing']['std']:.2f}"],
-                ['综合评分', put_html(format_rating_with_color(stats['overall']['mean'])), f"{stats['overall']['std']:.2f}"],
-                ['质量', put_html(format_quality_score(stats['quality']['mean'])), f"{stats['quality']['std']:.2f}"]  # 修改这里
+                ['指标', '平均分', '标准差', '95%置信区间'],
+                ['思维难度', put_html(format_rating_with_color(stats['thinking']['mean'])), f"{stats['thinking']['std']:.2f}", interval_html(stats, interval, 'thinking')],
+                ['实现难度', put_html(format_rating_with_color(stats['implementing']['mean'])), f"{stats['implementing']['std']:.2f}", interval_html(stats, interval, 'implementing')],
+                ['综合评分', put_html(format_rating_with_color(stats['overall']['mean'])), f"{stats['overall']['std']:.2f}", interval_html(stats, interval, 'overall')],
+                ['质量', put_html(format_quality_score(stats['quality']['mean'])), f"{stats['quality']['std']:.2f}", interval_html(stats, interval, 'quality')]  # 修改这里
             ]),
             put_markdown(f"### 详细投票数据 (共{stats['count']}条)"),
             put_table(table_data),
@@ -937,23 +2716,9 @@ async def show_problem_details(problem_title):
     content.append(put_markdown("### 评论"))
     
     if problem_comments:
-        comment_data = [['用户', '评论', '时间', '操作']]
-        for comment in problem_comments:
-            row = [
-                comment['user'],
-                comment['text'],
-                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(comment['time'])),
-            ]
-            
-            # 添加删除按钮（管理员或评论所有者）
-            if hasattr(local, 'current_user') and local.current_user and (users[local.current_user]['is_admin'] or local.current_user == comment['user']):
-                row.append(put_button("删除", onclick=lambda c=comment, p=problem_title: run_async(delete_comment(p, c))))
-            else:
-                row.append("")
-                
-            comment_data.append(row)
-        
-        content.append(put_table(comment_data))
+        # 评论从新到旧分页加载，后续页追加到同一个scope中
+        scope = f"comments_{id(content)}"
+        content.append(put_scope(scope, [comment_page_table(problem_title, None, scope)]))
     else:
         content.append(put_text("暂无评论"))
     
@@ -967,6 +2732,36 @@ async def show_problem_details(problem_title):
     
     popup(title=f"题目: {problem_title}", content=content)
 
+def comment_page_table(problem_title, before, scope):
+    """渲染一页评论（从新到旧），还有更早的评论时附带“加载更多”按钮"""
+    page, next_cursor = comments[problem_title].page(before)
+    comment_data = [['用户', '评论', '时间', '操作']]
+    for comment in page:
+        row = [
+            comment['user'],
+            comment['text'],
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(comment['time'])),
+        ]
+        
+        # 添加删除按钮（管理员或评论所有者）
+        if hasattr(local, 'current_user') and local.current_user and (users[local.current_user]['is_admin'] or local.current_user == comment['user']):
+            row.append(put_button("删除", onclick=lambda cid=comment['id'], p=problem_title: run_async(delete_comment(p, cid))))
+        else:
+            row.append("")
+            
+        comment_data.append(row)
+    
+    if next_cursor is None:
+        return put_table(comment_data)
+    more_scope = f"{scope}_{next_cursor}"
+    more = put_button("加载更多评论", onclick=lambda: load_more_comments(problem_title, next_cursor, scope, more_scope), small=True)
+    return put_column([put_table(comment_data), put_scope(more_scope, [more])])
+
+def load_more_comments(problem_title, before, scope, more_scope):
+    """加载下一页评论，并移除旧的“加载更多”按钮"""
+    clear(more_scope)
+    put_column([comment_page_table(problem_title, before, scope)], scope=scope)
+
 async def delete_vote(problem_title, vote_data):
     if await check_and_notify_banned():
         return
@@ -981,6 +2776,17 @@ async def delete_vote(problem_title, vote_data):
         toast("无权删除此投票")
         return
     
+    if not await admit_write():
+        return
+    
+    remove_vote(problem_title, vote_data)
+    
+    log_action(local.current_user, "删除投票", f"题目: {problem_title}, 投票者: {vote_data['voter']}", problem=problem_title)
+    toast("投票已删除！")
+    await show_problem_details(problem_title)
+
+def remove_vote(problem_title, vote_data):
+    """删除投票者和三项评分都与vote_data相同的投票并请求保存"""
     with data_lock:
         if problem_title in votes:
             # 移除指定的投票
@@ -989,15 +2795,10 @@ async def delete_vote(problem_title, vote_data):
                                            v['thinking'] == vote_data['thinking'] and 
                                            v['implementing'] == vote_data['implementing'] and 
                                            v['quality'] == vote_data['quality'])]
+            touch_data(problem_title)
+            update_voter_agreement(problem_title)
     
-    # 更新最后保存时间并立即保存
-    global last_save_time
-    last_save_time = time.time()
-    save_votes()
-    
-    log_action(local.current_user, "删除投票", f"题目: {problem_title}, 投票者: {vote_data['voter']}")
-    toast("投票已删除！")
-    await show_problem_details(problem_title)
+    request_save()
 
 async def logout():
     """用户登出"""
@@ -1064,8 +2865,8 @@ async def check_cookie_login():
     password_hash = await get_cookie('password_hash')
     # run_js("console.log(username, password_hash);", username=username, password_hash=password_hash)
     if username and password_hash and username in users:
-        # 验证密码哈希
-        if users[username]['password'] == password_hash:
+        # 验证密码哈希（cookie可能含非ASCII字符，按字节比较，否则compare_digest会抛出TypeError）
+        if hmac.compare_digest(users[username]['password'].encode('utf-8'), str(password_hash).encode('utf-8')):
             local.current_user = username
             
             # 从cookie加载排序偏好
@@ -1098,6 +2899,121 @@ async def check_cookie_login():
     
     return False
 
+PROBLEM_TABLE_HEADER = (['题目', '知识点难度', '标签', '投票数', '思维难度(平均±标准差)', '实现难度(平均±标准差)', '综合评分(平均±标准差)', '质量(平均±标准差)', '综合评分95%区间']
+                        + (['校准综合'] if CALIBRATION_ENABLED else []) + ['对比难度', '操作'])
+
+def problem_table_widgets(problem_stats):
+    """用pywebio组件构建题目列表（每个单元格、按钮都是独立组件）"""
+    table_data = [list(PROBLEM_TABLE_HEADER)]
+    
+    # 构建表格数据
+    for problem in problem_stats:
+        stats = problem['stats']
+        
+        if stats:
+            # 创建带颜色的平均分和标准差显示
+            thinking_html = put_html(f'{format_rating_with_color(stats["thinking"]["mean"])}±{stats["thinking"]["std"]:.1f}')
+            implementing_html = put_html(f'{format_rating_with_color(stats["implementing"]["mean"])}±{stats["implementing"]["std"]:.1f}')
+            overall_html = put_html(f'{format_rating_with_color(stats["overall"]["mean"])}±{stats["overall"]["std"]:.1f}')
+            quality_html = put_html(f'{format_quality_score(stats["quality"]["mean"])}±{stats["quality"]["std"]:.2f}')  # 修改这里
+            count = stats['count']
+        else:
+            thinking_html = implementing_html = overall_html = quality_html = "暂无数据"  # 修改这里
+            count = 0
+            
+        # 创建题目名称的超链接
+        if problem['link']:
+            problem_cell = put_link(problem['title'], url=problem['link'], new_window=True)
+        else:
+            problem_cell = problem['title']
+            
+        table_data.append([
+            problem_cell,
+            put_html(get_difficulty_html(problem['difficulty'])),
+            problem['tags'],
+            str(count),
+            thinking_html,
+            implementing_html,
+            overall_html,
+            quality_html,  # 修改这里
+            interval_html(stats, problem['interval']),
+            *([put_html(calibrated_html(problem['title']))] if CALIBRATION_ENABLED else []),
+            put_html(pairwise_html(problem['pairwise'])),
+            put_row([
+                put_button("查看", onclick=lambda p=problem['title']: run_async(show_problem_details(p))),
+                put_button("评分", onclick=lambda p=problem['title']: run_async(vote_for_problem(p))) if hasattr(local, 'current_user') and local.current_user else put_text("请登录")
+            ])
+        ])
+    
+    return table_data
+
+def on_problem_row_action(data):
+    """题目列表的委托回调：所有行的“查看”“评分”按钮共用这一个回调"""
+    touch_session()
+    if not isinstance(data, dict) or get_problem(data.get('title')) is None:
+        return
+    if data.get('act') == 'view':
+        run_async(show_problem_details(data['title']))
+    elif data.get('act') == 'vote':
+        run_async(vote_for_problem(data['title']))
+
+def problem_row_callback_id():
+    """获取本会话的题目行回调id，每个会话只注册一次"""
+    if getattr(local, 'row_action_callback_id', None) is None:
+        local.row_action_callback_id = output_register_callback(on_problem_row_action)
+    return local.row_action_callback_id
+
+def problem_row_html(problem, logged_in):
+    """生成题目列表中一行的HTML，统计对象和元数据不变时直接复用缓存"""
+    stats = problem['stats']
+    key = (problem['link'], problem['difficulty'], problem['tags'], problem['pairwise'], problem['interval'],
+           calibrated_ratings.get(problem['title']), logged_in)
+    cached = _row_html_cache.get(problem['title'])
+    if cached is not None and cached[0] is stats and cached[1] == key:
+        return cached[2]
+    
+    if stats:
+        thinking_html = f'{format_rating_with_color(stats["thinking"]["mean"])}±{stats["thinking"]["std"]:.1f}'
+        implementing_html = f'{format_rating_with_color(stats["implementing"]["mean"])}±{stats["implementing"]["std"]:.1f}'
+        overall_html = f'{format_rating_with_color(stats["overall"]["mean"])}±{stats["overall"]["std"]:.1f}'
+        quality_html = f'{format_quality_score(stats["quality"]["mean"])}±{stats["quality"]["std"]:.2f}'
+        count = stats['count']
+    else:
+        thinking_html = implementing_html = overall_html = quality_html = "暂无数据"
+        count = 0
+    
+    title = html.escape(problem['title'])
+    if problem['link']:
+        problem_cell = f'<a href="{html.escape(problem["link"])}" target="_blank">{title}</a>'
+    else:
+        problem_cell = title
+    
+    actions = f'<button class="btn btn-primary" data-act="view" data-title="{title}">查看</button> '
+    if logged_in:
+        actions += f'<button class="btn btn-primary" data-act="vote" data-title="{title}">评分</button>'
+    else:
+        actions += '请登录'
+    
+    calibrated_cell = f'<td>{calibrated_html(problem["title"])}</td>' if CALIBRATION_ENABLED else ''
+    row = (f'<tr><td>{problem_cell}</td><td>{get_difficulty_html(problem["difficulty"])}</td>'
+           f'<td>{html.escape(problem["tags"])}</td><td>{count}</td><td>{thinking_html}</td>'
+           f'<td>{implementing_html}</td><td>{overall_html}</td><td>{quality_html}</td>'
+           f'<td>{interval_html(stats, problem["interval"])}</td>{calibrated_cell}'
+           f'<td>{pairwise_html(problem["pairwise"])}</td><td>{actions}</td></tr>')
+    _row_html_cache[problem['title']] = (stats, key, row)
+    return row
+
+def problem_table_html(problem_stats):
+    """把整个题目列表渲染成一段预转义的HTML，行内按钮通过事件委托交给同一个回调"""
+    logged_in = bool(getattr(local, 'current_user', None))
+    callback_id = problem_row_callback_id()
+    header = ''.join(f'<th>{html.escape(h)}</th>' for h in PROBLEM_TABLE_HEADER)
+    rows = ''.join(problem_row_html(problem, logged_in) for problem in problem_stats)
+    onclick = ("var b=event.target.closest('button[data-act]');"
+               f"if(b)WebIO.pushData({{act:b.dataset.act,title:b.dataset.title}},'{callback_id}')")
+    return f'<table onclick="{onclick}"><tr>{header}</tr>{rows}</table>'
+
+@metrics.timed('main')
 async def main():
     if await check_and_notify_banned():
         return
@@ -1106,13 +3022,15 @@ async def main():
     # 设置页面标题
     set_env(title="题目评分系统", output_max_width='95%')
     
-    # 加载数据
-    load_users()
-    load_problems()
-    load_votes()
+    # 在线会话已满时只显示提示页，不占用会话资源
+    if not register_session():
+        put_markdown("# 题目评分系统")
+        put_markdown(f"当前在线人数已达上限（{MAX_SESSIONS}），请稍后再试。页面将在30秒后自动重试。")
+        run_js("setTimeout(function(){location.reload()}, 30000)")
+        return
     
-    # 启动自动保存线程
-    threading.Thread(target=auto_save, daemon=True).start()
+    # 数据已在启动时预热，这里只做兜底
+    warm_up()
     
     # 检查cookie中的登录信息
     if not hasattr(local, 'current_user') or not local.current_user:
@@ -1127,14 +3045,20 @@ async def main():
     if users[local.current_user]['is_admin']:
         user_info += " (管理员)"
     
-    user_row = [put_text(user_info), put_button("登出", onclick=lambda: run_async(logout()))]
+    user_row = [put_text(user_info), put_button("登出", onclick=lambda: run_async(logout())),
+                put_button("批量评分", onclick=lambda: run_async(rating_sheet())),
+                put_button("难度对比", onclick=lambda: run_async(compare_problems()))]
     
     # 如果是管理员，添加下载日志按钮和命令执行按钮
     if users[local.current_user]['is_admin']:
         user_row.append(put_button("下载日志", onclick=lambda: run_async(download_log_file())))
         user_row.append(put_button("执行命令", onclick=lambda: run_async(execute_admin_command())))
+        user_row.append(put_button("可疑投票", onclick=lambda: run_async(show_suspicion_report())))
+        user_row.append(put_button("在线会话", onclick=lambda: run_async(show_sessions())))
+        user_row.append(put_button("操作记录", onclick=lambda: run_async(show_audit_log())))
     
     put_row(user_row)
+    put_collapse("投票者排行榜", [put_html(leaderboard_html(local.current_user))])
     
     put_text("欢迎使用题目评分系统！您可以为以下题目的思维难度、实现难度和质量进行评分。")
     put_markdown("**注意**: 同一人多次对同一题目评分时，只保留最后一次评分。")
@@ -1151,100 +3075,188 @@ async def main():
         put_button(f"思维难度{get_sort_indicator('thinking')}", onclick=lambda: run_async(sort_table('thinking'))),
         put_button(f"实现难度{get_sort_indicator('implementing')}", onclick=lambda: run_async(sort_table('implementing'))),
         put_button(f"综合评分{get_sort_indicator('overall')}", onclick=lambda: run_async(sort_table('overall'))),
-        put_button(f"质量{get_sort_indicator('quality')}", onclick=lambda: run_async(sort_table('quality')))
+        put_button(f"质量{get_sort_indicator('quality')}", onclick=lambda: run_async(sort_table('quality'))),
+        put_button(f"综合下界{get_sort_indicator('overall_lower')}", onclick=lambda: run_async(sort_table('overall_lower'))),
+        *([put_button(f"校准综合{get_sort_indicator('calibrated')}", onclick=lambda: run_async(sort_table('calibrated')))]
+          if CALIBRATION_ENABLED else []),
+        put_button(f"对比难度{get_sort_indicator('pairwise')}", onclick=lambda: run_async(sort_table('pairwise')))
     ])
     
-    table_data = [['题目', '知识点难度', '标签', '投票数', '思维难度(平均±标准差)', '实现难度(平均±标准差)', '综合评分(平均±标准差)', '质量(平均±标准差)', '操作']]
+    # 按当前排序设置从排序索引中取出题目顺序，再组装统计信息
+    if local.sort_column:
+        ordered_titles = sorted_problem_titles(local.sort_column, local.sort_ascending)
+    else:
+        # 默认按题目名称排序
+        ordered_titles = sorted_problem_titles('title')
     
-    # 为每个题目计算统计信息
     problem_stats = []
-    for problem in problems:
-        stats = calculate_stats(problem['title'])
-        meta = problem_metas.get(problem['title'], {})
-        difficulty = meta.get('difficulty', '暂无评定')
-        tags = meta.get('tags', '')
+    for title in ordered_titles:
+        problem = problem_index.get(title)
+        if problem is None:
+            continue  # 题库监视线程刚删除了该题，排序索引要到下次刷新才会更新
+        meta = problem_metas.get(title, {})
         
         problem_stats.append({
-            'title': problem['title'],
+            'title': title,
             'link': problem['link'],
-            'difficulty': difficulty,
-            'tags': tags,
-            'stats': stats
+            'difficulty': meta.get('difficulty', '暂无评定'),
+            'tags': meta.get('tags', ''),
+            'stats': calculate_stats(title),
+            'pairwise': pairwise_entry(title),
+            'interval': confidence_interval(title)
         })
     
-    # 根据当前排序设置对题目进行排序
-    if local.sort_column:
-        def get_sort_key(item):
-            if local.sort_column == 'title':
-                return item['title']
-            elif local.sort_column == 'difficulty':
-                # 将难度级别映射为数字以便排序
-                difficulty_order = {d: i for i, d in enumerate(DIFFICULTY_LEVELS.keys())}
-                return difficulty_order.get(item['difficulty'], 99)
-            elif local.sort_column == 'count':
-                return item['stats']['count'] if item['stats'] else 0
-            elif local.sort_column == 'thinking':
-                return item['stats']['thinking']['mean'] if item['stats'] else 0
-            elif local.sort_column == 'implementing':
-                return item['stats']['implementing']['mean'] if item['stats'] else 0
-            elif local.sort_column == 'overall':
-                return item['stats']['overall']['mean'] if item['stats'] else 0
-            elif local.sort_column == 'quality':
-                return item['stats']['quality']['mean'] if item['stats'] else 0
-            return 0
-        
-        problem_stats.sort(key=get_sort_key, reverse=not local.sort_ascending)
-    else:
-        # 默认按题目名称排序
-        problem_stats.sort(key=lambda x: x['title'])
-    
-    # 构建表格数据
-    for problem in problem_stats:
-        stats = problem['stats']
-        
-        if stats:
-            # 创建带颜色的平均分和标准差显示
-            thinking_html = put_html(f'{format_rating_with_color(stats["thinking"]["mean"])}±{stats["thinking"]["std"]:.1f}')
-            implementing_html = put_html(f'{format_rating_with_color(stats["implementing"]["mean"])}±{stats["implementing"]["std"]:.1f}')
-            overall_html = put_html(f'{format_rating_with_color(stats["overall"]["mean"])}±{stats["overall"]["std"]:.1f}')
-            quality_html = put_html(f'{format_quality_score(stats["quality"]["mean"])}±{stats["quality"]["std"]:.2f}')  # 修改这里
-            count = stats['count']
-        else:
-            thinking_html = implementing_html = overall_html = quality_html = "暂无数据"  # 修改这里
-            count = 0
-            
-        # 创建题目名称的超链接
-        if problem['link']:
-            problem_cell = put_link(problem['title'], url=problem['link'], new_window=True)
-        else:
-            problem_cell = problem['title']
-            
-        table_data.append([
-            problem_cell,
-            put_html(get_difficulty_html(problem['difficulty'])),
-            problem['tags'],
-            str(count),
-            thinking_html,
-            implementing_html,
-            overall_html,
-            quality_html,  # 修改这里
-            put_row([
-                put_button("查看", onclick=lambda p=problem['title']: run_async(show_problem_details(p))),
-                put_button("评分", onclick=lambda p=problem['title']: run_async(vote_for_problem(p))) if hasattr(local, 'current_user') and local.current_user else put_text("请登录")
-            ])
-        ])
-    
     # 显示排序按钮和表格
     put_row([sort_buttons])
-    put_table(table_data)
+    if LIST_RENDER_MODE == 'html':
+        put_html(problem_table_html(problem_stats))
+    else:
+        put_table(problem_table_widgets(problem_stats))
     
     put_markdown("---")
-    put_text(f"数据最后保存时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-    put_text("系统每30秒自动保存数据")
+    put_text(f"数据最后保存时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_save_time))}")
+    put_text(f"提交后系统会在约 {SAVE_MIN_INTERVAL:g} 秒内自动保存，短时间内的多次提交合并为一次保存")
     
     # 添加刷新按钮
     put_button("刷新页面", onclick=lambda: run_async(refresh_page()))
 
+def stats_payload():
+    """生成统计API的响应，按数据版本缓存序列化结果及其gzip压缩版本"""
+    global _stats_api_cache
+    import gzip
+    version = f"{BOOT_ID}-{data_version}-{catalogue_version}-{pairwise_version}-{ci_version}-{calibration_version}"
+    if _stats_api_cache is not None and _stats_api_cache[0] == version:
+        return _stats_api_cache
+    
+    items = []
+    for problem in problems:
+        stats = calculate_stats(problem['title'])
+        interval = confidence_interval(problem['title'])
+        meta = problem_metas.get(problem['title'], {})
+        item = {
+            'title': problem['title'],
+            'link': problem['link'],
+            'difficulty': meta.get('difficulty', '暂无评定'),
+            'tags': meta.get('tags', ''),
+            'count': stats['count'] if stats else 0,
+        }
+        for field in ('thinking', 'implementing', 'overall', 'quality'):
+            item[field] = {'mean': float(stats[field]['mean']), 'std': float(stats[field]['std']),
+                           'ci95': list(interval[field]) if interval else None} if stats else None
+        entry = pairwise_entry(problem['title'])
+        item['pairwise'] = {'rating': entry[0], 'comparisons': entry[1]} if entry else None
+        item['calibrated'] = calibrated_ratings.get(problem['title'])
+        items.append(item)
+    
+    body = json.dumps({'version': version, 'problems': items}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _stats_api_cache = (version, body, gzip.compress(body, compresslevel=6))
+    return _stats_api_cache
+
+def start_api_server(port, routes=None):
+    """在与pywebio相同的事件循环上启动只读统计API: GET /api/stats，支持ETag/304和gzip
+    
+    routes 为 [(路径正则, 生成响应的函数)]，路径中的分组作为参数传给函数，
+    函数抛出KeyError时返回404，返回None表示数据暂不可用，返回503
+    """
+    import tornado.web
+    
+    class StatsHandler(tornado.web.RequestHandler):
+        def initialize(self, payload):
+            self.payload = payload
+        
+        def get(self, *args):
+            try:
+                result = self.payload(*args)
+            except KeyError:
+                raise tornado.web.HTTPError(404)
+            if result is None:
+                self.set_status(503)
+                self.set_header('Retry-After', '60')
+                return
+            version, body, gzipped = result
+            etag = f'"{version}"'
+            self.set_header('ETag', etag)
+            self.set_header('Cache-Control', 'no-cache')
+            self.set_header('Vary', 'Accept-Encoding')
+            inm = self.request.headers.get('If-None-Match', '')
+            if etag in [tag.strip() for tag in inm.split(',')] or inm.strip() == '*':
+                self.set_status(304)
+                return
+            self.set_header('Content-Type', 'application/json; charset=utf-8')
+            if 'gzip' in self.request.headers.get('Accept-Encoding', ''):
+                self.set_header('Content-Encoding', 'gzip')
+                self.write(gzipped)
+            else:
+                self.write(body)
+        
+        head = get
+        
+        def compute_etag(self):
+            return None  # ETag由数据版本决定，不对响应体做哈希
+    
+    def log_request(handler):
+        # 轮询请求很频繁，只记录出错的请求，避免刷屏log.log
+        if handler.get_status() >= 400:
+            logging.warning(f"统计API请求失败: {handler.get_status()} {handler.request.uri}")
+    
+    routes = routes or [(r"/api/stats", stats_payload)]
+    app = tornado.web.Application([(pattern, StatsHandler, {'payload': payload}) for pattern, payload in routes],
+                                  log_function=log_request)
+    app.listen(port)
+    logging.info(f"统计API已启动: http://127.0.0.1:{port}/api/stats")
+
+def start_metrics_server(port, address=None):
+    """在与pywebio相同的事件循环上启动性能指标接口 GET /metrics，默认只监听本机，不与公开的统计API共用端口"""
+    import tornado.web
+    
+    class MetricsHandler(tornado.web.RequestHandler):
+        def get(self):
+            self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.write(metrics.render_prometheus())
+    
+    address = address or METRICS_ADDRESS
+    app = tornado.web.Application([(r"/metrics", MetricsHandler)], log_function=lambda handler: None)
+    app.listen(port, address=address)
+    logging.info(f"性能指标已启动: http://{address}:{port}/metrics")
+
+def open_audit_store():
+    """打开审计库并启动后台写入线程"""
+    global audit_store
+    from audit import AuditStore
+    audit_store = AuditStore(AUDIT_FILE, AUDIT_RETENTION_DAYS).start()
+    return audit_store
+
+def register_gauges():
+    """在 /metrics 中导出的当前状态"""
+    metrics.register_gauge('vote_sessions', "在线会话数", lambda: len(sessions))
+    metrics.register_gauge('vote_problems', "题目数", lambda: len(problems))
+    metrics.register_gauge('vote_votes', "投票总数", vote_count)
+    metrics.register_gauge('vote_data_version', "数据版本号", lambda: data_version)
+    metrics.register_gauge('vote_memory_estimate_bytes', "估算内存占用", memory_estimate)
+    metrics.register_gauge('vote_write_queue_depth', "尚未落盘的写操作数", lambda: _pending_writes)
+
+def run_server(port=8999):
+    """预热后启动服务器"""
+    setup_logging()
+    open_audit_store()
+    if STARTUP_PROFILE:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    with startup_phase("启动总计"):
+        warm_up()
+    if STARTUP_PROFILE:
+        profiler.disable()
+        profiler.dump_stats('startup.prof')
+        logging.info("启动性能分析结果已保存到 startup.prof")
+    register_gauges()
+    if API_PORT:
+        start_api_server(API_PORT)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    start_session_sweeper()
+    start_server(main, port=port, debug=True, cdn=False)
+
 if __name__ == '__main__':
     # 启动服务器
-    start_server(main, port=8999, debug=True, cdn=False)
+    run_server()
@@ -0,0 +1,194 @@
+"""性能指标与采样分析
+
+- timed(name): 给处理函数和持久化函数计时，结果记入直方图。
+  协程只统计实际运行的时间，不包括等待用户输入（input_group 等）的时间。
+- render_prometheus(): 以 Prometheus 文本格式输出所有直方图、计数器和仪表值，
+  由只监听本机的 /metrics 接口提供（main.start_metrics_server，端口 VOTE_METRICS_PORT）。
+- StackSampler: 采样分析器，每隔几毫秒抓取一次所有线程的调用栈，
+  结果为 flamegraph.pl / speedscope 可直接读取的折叠栈格式。
+
+同一进程中多次导入的 main 实例（多题库托管）共用这里的全局指标。
+"""
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_lock = threading.Lock()
+_histograms = {}  # {(metric, label_value): [每个桶的计数..., sum, count]}
+_counters = defaultdict(float)  # {(metric, label_value): value}
+_gauges = {}  # {metric: (说明, 取值函数)}
+HELP = {
+    'vote_handler_seconds': "页面处理函数实际运行时间（不含等待用户输入）",
+    'vote_persistence_seconds': "数据加载、保存、备份和镜像生成耗时",
+    'vote_stats_seconds': "题目统计计算耗时（缓存未命中时）",
+    'vote_solver_seconds': "后台求解任务（成对比较拟合、置信区间、偏差校准）耗时",
+    'vote_handler_errors_total': "处理函数抛出的异常数",
+    'vote_writes_rejected_total': "被准入控制拒绝的写操作数",
+    'vote_writes_delayed_total': "因全站限流排队等待后执行的写操作数",
+}
+LABEL_NAMES = {
+    'vote_handler_seconds': 'handler',
+    'vote_handler_errors_total': 'handler',
+    'vote_writes_rejected_total': 'reason',
+    'vote_writes_delayed_total': 'reason',
+}
+
+
+def observe(metric, label, seconds):
+    with _lock:
+        entry = _histograms.get((metric, label))
+        if entry is None:
+            entry = _histograms[(metric, label)] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[i] += 1
+                break
+        entry[-2] += seconds
+        entry[-1] += 1
+
+
+def inc(metric, label, value=1):
+    with _lock:
+        _counters[(metric, label)] += value
+
+
+def register_gauge(metric, help_text, func):
+    _gauges[metric] = (help_text, func)
+
+
+class _TimedCoroutine:
+    """逐步驱动被包装的协程，只累计每一步 send/throw 的耗时"""
+
+    def __init__(self, coro, metric, label):
+        self.coro = coro
+        self.metric = metric
+        self.label = label
+
+    def __await__(self):
+        busy = 0.0
+        value, error = None, None
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    yielded = self.coro.throw(error) if error is not None else self.coro.send(value)
+                except StopIteration as e:
+                    return e.value
+                finally:
+                    busy += time.perf_counter() - start
+                try:
+                    value, error = (yield yielded), None
+                except BaseException as e:  # 把外部抛入的异常（如会话关闭）交给被包装的协程
+                    value, error = None, e
+        except Exception as e:
+            # 用户关闭页面时 pywebio 向协程抛出 SessionClosedException，不算处理出错
+            if type(e).__name__ != 'SessionClosedException':
+                inc('vote_handler_errors_total', self.label)
+            raise
+        finally:
+            observe(self.metric, self.label, busy)
+
+
+def timed(label, metric='vote_handler_seconds'):
+    """计时装饰器，支持普通函数和协程函数"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await _TimedCoroutine(func(*args, **kwargs), metric, label)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    observe(metric, label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render_prometheus():
+    """Prometheus 文本格式（0.0.4）"""
+    with _lock:
+        histograms = {key: list(value) for key, value in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for metric in sorted({metric for metric, _ in histograms}):
+        lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} histogram")
+        name = LABEL_NAMES.get(metric, 'function')
+        for (m, label), entry in sorted(histograms.items()):
+            if m != metric:
+                continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS, entry):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{name}="{label}",le="+Inf"}} {entry[-1]}')
+            lines.append(f'{metric}_sum{{{name}="{label}"}} {entry[-2]:.6f}')
+            lines.append(f'{metric}_count{{{name}="{label}"}} {entry[-1]}')
+    for metric in sorted({metric for metric, _ in counters}):
+        lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} counter")
+        name = LABEL_NAMES.get(metric, 'function')
+        for (m, label), value in sorted(counters.items()):
+            if m == metric:
+                lines.append(f'{metric}{{{name}="{label}"}} {value:g}')
+    for metric, (help_text, func) in sorted(_gauges.items()):
+        try:
+            value = float(func())
+        except Exception:
+            continue
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value:g}")
+    return '\n'.join(lines) + '\n'
+
+
+class StackSampler:
+    """采样分析器：后台线程定期抓取所有其他线程的调用栈并计数"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        """折叠栈文本，每行 '栈帧;栈帧;... 次数'"""
+        return ''.join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
@@ -0,0 +1,187 @@
+"""静态只读镜像
+
+把题目列表和每道题的详情写成纯 HTML/JSON 文件，任何静态文件服务器（nginx、python -m http.server 等）
+都能直接提供，匿名浏览不再需要 pywebio 会话。
+
+每道题的页面按内容指纹增量生成：只重写投票、评论或元数据变化过的题目。
+manifest.json 记录 {题目: [页面id, 指纹]}，服务器重启后也不会全部重写。
+
+目录结构:
+    index.html / index.json     题目列表（点击表头在浏览器中排序）
+    p/<id>.html / p/<id>.json   题目详情，id 为题目名的哈希
+    manifest.json
+
+服务器设置环境变量 VOTE_MIRROR_DIR 后由后台线程自动维护镜像；也可以离线生成:
+    python mirror.py site/        # 读取当前目录的数据文件，生成到 site/
+"""
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+
+from main import format_quality_score, format_rating_with_color, get_difficulty_html
+
+RATING_FIELDS = ['thinking', 'implementing', 'overall', 'quality']
+PAGE_STYLE = """<style>
+body{font-family:-apple-system,"Segoe UI","Microsoft YaHei",sans-serif;max-width:95%;margin:20px auto;color:#212529}
+table{border-collapse:collapse;margin:10px 0}th,td{border:1px solid #dee2e6;padding:4px 8px}
+th{background:#f8f9fa}th[data-col]{cursor:pointer}
+</style>"""
+# 按 data-v 属性排序表格，同一列再点一次反向
+SORT_SCRIPT = """<script>
+document.querySelectorAll('th[data-col]').forEach(function(th){th.onclick=function(){
+var t=th.closest('table'),c=+th.dataset.col,asc=th.dataset.asc!=='1',rows=[].slice.call(t.rows,1);
+rows.sort(function(a,b){var x=a.cells[c].dataset.v,y=b.cells[c].dataset.v,nx=parseFloat(x),ny=parseFloat(y);
+var r=isNaN(nx)||isNaN(ny)?x.localeCompare(y):nx-ny;return asc?r:-r});
+th.dataset.asc=asc?'1':'0';rows.forEach(function(r){t.tBodies[0].appendChild(r)})}});
+</script>"""
+
+
+def page_id(title):
+    return hashlib.sha1(title.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint(data):
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def write_file(path, content):
+    """先写临时文件再原子替换，静态服务器不会读到写了一半的文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def page(title, body, generated_at):
+    moment = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(generated_at))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>{PAGE_STYLE}</head>'
+            f'<body>{body}<hr><p>只读镜像，生成时间: {moment}</p>{SORT_SCRIPT}</body></html>')
+
+
+def rating_cells(stats):
+    """列表和详情共用的统计单元格，data-v 用于排序"""
+    if not stats:
+        return ''.join('<td data-v="-1">暂无数据</td>' for _ in RATING_FIELDS)
+    cells = []
+    for field in RATING_FIELDS:
+        mean, std = stats[field]['mean'], stats[field]['std']
+        shown = format_quality_score(mean) + f'±{std:.2f}' if field == 'quality' else format_rating_with_color(mean) + f'±{std:.1f}'
+        cells.append(f'<td data-v="{mean:.4f}">{shown}</td>')
+    return ''.join(cells)
+
+
+def render_problem(item, generated_at):
+    """题目详情页"""
+    title = html.escape(item['title'])
+    parts = [f'<p><a href="../index.html">返回题目列表</a></p><h1>{title}</h1>']
+    if item['link']:
+        parts.append(f'<p>题目链接: <a href="{html.escape(item["link"])}" target="_blank">{html.escape(item["link"])}</a></p>')
+    parts.append('<h3>题目信息</h3><table>'
+                 f'<tr><td>知识点难度</td><td>{get_difficulty_html(item["difficulty"])}</td></tr>'
+                 f'<tr><td>标签</td><td>{html.escape(item["tags"]) or "暂无标签"}</td></tr></table>')
+    stats = item['stats']
+    if stats:
+        parts.append('<h3>统计信息</h3><table><tr><th>思维难度</th><th>实现难度</th><th>综合评分</th><th>质量</th></tr>'
+                     f'<tr>{rating_cells(stats)}</tr></table>')
+        rows = ''.join(
+            f'<tr><td data-v="{html.escape(v["voter"])}">{html.escape(v["voter"])}</td><td data-v="{v["thinking"]}">{v["thinking"]}</td>'
+            f'<td data-v="{v["implementing"]}">{v["implementing"]}</td><td data-v="{v["quality"]}">{format_quality_score(v["quality"])}</td>'
+            f'<td data-v="{v["overall"]:.1f}">{v["overall"]:.1f}</td></tr>'
+            for v in item['votes'])
+        header = ''.join(f'<th data-col="{i}">{h}</th>' for i, h in enumerate(['投票者', '思维难度', '实现难度', '质量', '综合']))
+        parts.append(f'<h3>详细投票数据 (共{stats["count"]}条)</h3><table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>')
+    else:
+        parts.append('<p>暂无评分数据</p>')
+    parts.append('<h3>评论</h3>')
+    if item['comments']:
+        rows = ''.join(
+            f'<tr><td>{html.escape(c["user"])}</td><td>{html.escape(c["text"])}</td>'
+            f'<td>{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(c["time"]))}</td></tr>'
+            for c in item['comments'])
+        parts.append(f'<table><tr><th>用户</th><th>评论</th><th>时间</th></tr>{rows}</table>')
+    else:
+        parts.append('<p>暂无评论</p>')
+    return page(f"题目: {item['title']}", ''.join(parts), generated_at)
+
+
+def render_index(summaries, generated_at):
+    """题目列表页，summaries 为按题库顺序排列的 (题目摘要, 页面id)"""
+    header = ''.join(f'<th data-col="{i}">{h}</th>' for i, h in enumerate(
+        ['题目', '知识点难度', '标签', '投票数', '思维难度(平均±标准差)', '实现难度(平均±标准差)', '综合评分(平均±标准差)', '质量(平均±标准差)']))
+    rows = []
+    for item, pid in summaries:
+        title = html.escape(item['title'])
+        count = item['stats']['count'] if item['stats'] else 0
+        rows.append(f'<tr><td data-v="{title}"><a href="p/{pid}.html">{title}</a></td>'
+                    f'<td data-v="{item["difficulty_rank"]}">{get_difficulty_html(item["difficulty"])}</td>'
+                    f'<td data-v="{html.escape(item["tags"])}">{html.escape(item["tags"])}</td>'
+                    f'<td data-v="{count}">{count}</td>{rating_cells(item["stats"])}</tr>')
+    body = f'<h1>题目评分系统</h1><table><thead><tr>{header}</tr></thead><tbody>{"".join(rows)}</tbody></table>'
+    return page("题目评分系统", body, generated_at)
+
+
+class Mirror:
+    """镜像目录及其 manifest"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        os.makedirs(os.path.join(out_dir, 'p'), exist_ok=True)
+        self.manifest_path = os.path.join(out_dir, 'manifest.json')
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)  # {title: [page_id, fingerprint]}
+        except (FileNotFoundError, ValueError):
+            self.manifest = {}
+
+    def update(self, details, summaries, catalogue):
+        """写入内容有变化的详情页，并在有变化时重写列表页
+
+        details: {题目: 详情数据}，只需包含可能变化的题目；summaries: {题目: 列表摘要}；catalogue: 题库顺序的题目列表
+        返回重写的详情页数量
+        """
+        generated_at = time.time()
+        written = 0
+        for title, item in details.items():
+            digest = fingerprint(item)
+            entry = self.manifest.get(title)
+            if entry is not None and entry[1] == digest:
+                continue
+            pid = page_id(title)
+            base = os.path.join(self.out_dir, 'p', pid)
+            write_file(base + '.html', render_problem(item, generated_at))
+            write_file(base + '.json', json.dumps(item, ensure_ascii=False))
+            self.manifest[title] = [pid, digest]
+            written += 1
+
+        # 题库中已删除的题目
+        removed = [title for title in self.manifest if title not in summaries]
+        for title in removed:
+            for ext in ('.html', '.json'):
+                path = os.path.join(self.out_dir, 'p', self.manifest[title][0] + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+            del self.manifest[title]
+
+        index_path = os.path.join(self.out_dir, 'index.html')
+        if written or removed or not os.path.exists(index_path):
+            ordered = [(summaries[title], self.manifest[title][0]) for title in catalogue if title in self.manifest]
+            write_file(index_path, render_index(ordered, generated_at))
+            write_file(os.path.join(self.out_dir, 'index.json'), json.dumps(
+                {'generated_at': generated_at, 'problems': [dict(item, page=f"p/{pid}.html") for item, pid in ordered]},
+                ensure_ascii=False))
+            write_file(self.manifest_path, json.dumps(self.manifest, ensure_ascii=False))
+        return written
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    import main
+    main.load_data()
+    start = time.perf_counter()
+    n = main.build_mirror(sys.argv[1], full=True)
+    print(f"重写详情页 {n} 个，耗时 {time.perf_counter() - start:.2f}s，镜像位于 {sys.argv[1]}/")
@@ -0,0 +1,60 @@
+"""两两比较的难度排名（Bradley-Terry 批量拟合）
+
+每条比较记录是一对题目编号 (较难的题, 较容易的题)。主程序在每条比较到来时按 Elo 规则
+增量更新两道题的分数（O(1)），后台线程定期调用 fit() 用全部比较重新拟合，
+消除增量更新对比较先后顺序的依赖。
+
+分数与 main.getEloWinProbability 同一尺度：题目强度为 10^((分数-BASE)/400)，
+较难概率 = 强度A / (强度A + 强度B)。每道题带 PRIOR 次与一道平均难度的虚拟题的胜负，
+保证只赢不输或只输不赢的题目也有有限的分数。所有题目的平均分固定为 BASE，
+与 Elo 增量更新（两道题一加一减）保持一致。
+
+拟合使用 Newman (2023) 的不动点迭代，比经典的 MM/Zermelo 迭代收敛快得多；
+每轮只对比较数组做几次 bincount，内存和时间都与比较数成正比，从上次的分数热启动时通常几轮就收敛。
+"""
+import numpy as np
+
+BASE = 1500.0  # 平均分，没有比较过的题目也取此值
+PRIOR = 1.0  # 每道题与平均难度虚拟题的虚拟胜负次数
+MAX_ITERATIONS = 200
+TOLERANCE = 0.01  # 分数最大变化小于此值时停止（Elo 分）
+
+
+def fit(winners, losers, n, init=None):
+    """拟合 Bradley-Terry 模型
+
+    winners/losers: 每条比较中较难/较容易题目的编号数组；n: 题目数；init: 热启动用的分数数组
+    返回 (分数数组, 迭代轮数)
+    """
+    winners = np.asarray(winners, dtype=np.int64)
+    losers = np.asarray(losers, dtype=np.int64)
+    if init is not None and len(init) == n:
+        log_gamma = (np.asarray(init, dtype=float) - BASE) / 400 * np.log(10)
+        log_gamma -= log_gamma.mean()
+    else:
+        log_gamma = np.zeros(n)
+    gamma = np.exp(log_gamma)
+    iterations = 0
+    for iterations in range(1, MAX_ITERATIONS + 1):
+        # γ_i ← Σ_(i胜j) γ_j/(γ_i+γ_j) / Σ_(i负j) 1/(γ_i+γ_j)，虚拟题强度为1
+        inv = 1.0 / (gamma[winners] + gamma[losers])
+        anchor = PRIOR / (gamma + 1.0)
+        numerator = np.bincount(winners, weights=gamma[losers] * inv, minlength=n) + anchor
+        denominator = np.bincount(losers, weights=inv, minlength=n) + anchor
+        new_log_gamma = np.log(numerator / denominator)
+        new_log_gamma -= new_log_gamma.mean()  # 固定平均分，否则整体平移方向收敛很慢
+        change = np.max(np.abs(new_log_gamma - log_gamma), initial=0.0) * 400 / np.log(10)
+        log_gamma = new_log_gamma
+        gamma = np.exp(log_gamma)
+        if change < TOLERANCE:
+            break
+    return BASE + log_gamma * 400 / np.log(10), iterations
+
+
+def elo_replay(ratings, winners, losers, k, expected):
+    """在 ratings（dict 或数组）上按顺序应用 Elo 增量更新，expected(a, b) 为 a 更难的预期概率"""
+    for w, l in zip(winners, losers):
+        delta = k * (1 - expected(ratings[w], ratings[l]))
+        ratings[w] += delta
+        ratings[l] -= delta
+    return ratings
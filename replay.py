@@ -0,0 +1,364 @@
+"""用 log.log 回放真实流量的基准测试
+
+log_action 写入 log.log 的每条评分、评论、排序、登录等操作都带有时间戳和参数。
+本工具把日志解析成操作流，在临时目录中的一个全新数据存储上（同一进程内，直接调用 main 的函数，
+不经过 websocket）按原始节奏或加速回放，并统计:
+    - 每类操作的延迟（数据修改加上处理函数随后渲染页面的工作）p50/p95/p99/max
+    - 持久化量：保存次数、进程写入的总字节数、最终数据文件大小
+    - 内存：回放前后和峰值的常驻内存，以及 main.memory_estimate() 的估算
+
+后台线程（保存、备份、置信区间、校准等）与服务器一样由 warm_up() 启动，会和回放争用CPU，
+因此结果反映的是比赛当天的真实负载形态，可用来比较代码改动前后的性能。
+
+用法:
+    python replay.py log.log                          # 尽快回放
+    python replay.py log.log --speed 10               # 按原始节奏的10倍速回放
+    python replay.py log.log --problems problem.txt --since "2025-01-01 09:00" --json
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+from audit import parse_log_line, parse_time, problem_from_details
+from loadtest import percentile
+
+RATING_DETAILS = re.compile(r', 思维: (-?[\d.]+), 实现: (-?[\d.]+), 质量: (-?[\d.]+)$')
+META_DETAILS = re.compile(r'^难度: (.*?), 标签: (.*)$')
+SORT_DETAILS = re.compile(r'^列: (\w+), 升序: (True|False)$')
+LOGIN_ACTIONS = {'登录成功', 'Cookie自动登录成功', '新用户注册成功'}
+SAMPLE_EVERY = 200  # 每回放这么多条操作采样一次内存
+
+
+def rss_bytes():
+    """当前进程的常驻内存（字节），无法读取时返回0"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def written_bytes():
+    """进程累计通过 write 系统调用写出的字节数，无法读取时返回None"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def detail_after(details, title, key):
+    """取出 '题目: <title>, <key>: 值' 中的值"""
+    prefix = f"题目: {title}, {key}: "
+    return details[len(prefix):] if details.startswith(prefix) else None
+
+
+def parse_events(path, since=None, until=None):
+    """把 log.log 解析成按时间排序的操作 [(时间戳, 用户, 操作, 参数, 原始详情)]，无法回放的行跳过"""
+    events = []
+    skipped = defaultdict(int)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parsed = parse_log_line(line)
+            if parsed is None:
+                continue
+            ts, user, action, details = parsed
+            if (since is not None and ts < since) or (until is not None and ts > until):
+                continue
+            details = details or ''
+            title = problem_from_details(details)
+            args = None
+            if action == '评分提交' and title is not None:
+                match = RATING_DETAILS.search(details)
+                if match:
+                    args = {'title': title, 'thinking': float(match.group(1)), 'implementing': float(match.group(2)),
+                            'quality': float(match.group(3))}
+            elif action in ('添加评论', '删除评论') and title is not None:
+                text = detail_after(details, title, '内容' if action == '添加评论' else '原内容')
+                if text is not None:
+                    args = {'title': title, 'text': text}
+            elif action == '删除投票' and title is not None:
+                voter = detail_after(details, title, '投票者')
+                if voter is not None:
+                    args = {'title': title, 'voter': voter}
+            elif action == '编辑题目元数据' and title is not None:
+                match = META_DETAILS.match(details[len(f"题目: {title}, "):])
+                if match:
+                    args = {'title': title, 'difficulty': match.group(1), 'tags': match.group(2)}
+            elif action == '难度对比' and title is not None:
+                easier = detail_after(details, title, '较易')
+                if easier is not None:
+                    args = {'title': title, 'easier': easier}
+            elif action == '排序表格':
+                match = SORT_DETAILS.match(details)
+                if match:
+                    args = {'column': match.group(1), 'ascending': match.group(2) == 'True'}
+            elif action in LOGIN_ACTIONS:
+                args = {}
+            if args is None:
+                skipped[action] += 1
+                continue
+            events.append((ts, user, action, args, details))
+    events.sort(key=lambda event: event[0])
+    return events, skipped
+
+
+def prepare_store(workdir, events, problems_path=None):
+    """在空目录中准备题库：复制指定的题库文件，否则用日志中出现过的题目生成"""
+    if problems_path:
+        target = os.path.join(workdir, 'problems.d' if os.path.isdir(problems_path) else 'problem.txt')
+        (shutil.copytree if os.path.isdir(problems_path) else shutil.copy)(problems_path, target)
+        return
+    titles = []
+    seen = set()
+    for _, _, _, args, _ in events:
+        for key in ('title', 'easier'):
+            title = args.get(key)
+            if title is not None and title not in seen:
+                seen.add(title)
+                titles.append(title)
+    with open(os.path.join(workdir, 'problem.txt'), 'w', encoding='utf-8') as f:
+        for i, title in enumerate(titles):
+            f.write(f"{title}\nhttps://example.com/problem{i}\n")  # 空行会被跳过，链接行不能为空
+
+
+class Replayer:
+    """在 main 的全新实例上执行操作，每个操作包含处理函数随后的页面渲染"""
+
+    def __init__(self, main):
+        self.main = main
+
+    def ensure_user(self, username):
+        main = self.main
+        if username not in main.users:
+            main.users[username] = {'password': '', 'created_at': time.time(), 'last_login': time.time(),
+                                    'is_admin': False, 'tag_permissions': []}
+            main.save_users()
+
+    def render_list(self, column='title', ascending=True, username=None):
+        """与主页相同的题目列表组装和HTML渲染"""
+        main = self.main
+        problem_stats = []
+        for title in main.sorted_problem_titles(column, ascending):
+            problem = main.problem_index.get(title)
+            if problem is None:
+                continue
+            meta = main.problem_metas.get(title, {})
+            problem_stats.append({
+                'title': title,
+                'link': problem['link'],
+                'difficulty': meta.get('difficulty', '暂无评定'),
+                'tags': meta.get('tags', ''),
+                'stats': main.calculate_stats(title),
+                'pairwise': main.pairwise_entry(title),
+                'interval': main.confidence_interval(title),
+            })
+        page = ''.join(main.problem_row_html(problem, True) for problem in problem_stats)  # 表格外壳需要会话，只渲染行
+        if username is not None:
+            page += main.leaderboard_html(username)
+        return page
+
+    def render_details(self, title):
+        """题目详情弹窗需要的统计、逐票综合分和第一页评论"""
+        main = self.main
+        main.calculate_stats(title)
+        for vote in main.votes.get(title, ()):
+            main.calc_overall(vote['thinking'], vote['implementing'])
+        thread = main.comments.get(title)
+        if thread is not None:
+            thread.page()
+        main.pairwise_entry(title)
+        main.confidence_interval(title)
+
+    def apply(self, user, action, args):
+        main = self.main
+        title = args.get('title')
+        if action in LOGIN_ACTIONS:
+            self.ensure_user(user)
+            main.users[user]['last_login'] = time.time()
+            self.render_list(username=user)
+        elif action == '排序表格':
+            self.render_list(args['column'], args['ascending'])
+        elif title is not None and main.get_problem(title) is None:
+            return False  # 题库中没有的题目（使用 --problems 时可能出现）
+        elif action == '评分提交':
+            rating = {field: args[field] for field in ('thinking', 'implementing', 'quality')}
+            main.submit_votes(user, {title: rating})
+            self.render_list()
+        elif action == '添加评论':
+            main.submit_comment(user, title, args['text'])
+            self.render_details(title)
+        elif action == '删除评论':
+            # 日志只记录评论内容，删除该题第一条内容相同的评论
+            thread = main.comments.get(title)
+            comment = next((c for c in thread if c['text'] == args['text']), None) if thread else None
+            if comment is None:
+                return False
+            main.remove_comment(title, comment['id'])
+            self.render_details(title)
+        elif action == '删除投票':
+            # 日志只记录投票者，删除的是该投票者在此题上的投票（与详情页的删除按钮传入的是同一条）
+            vote = next((v for v in main.votes[title] if v['voter'] == args['voter']), None) \
+                if title in main.votes else None
+            if vote is None:
+                return False
+            main.remove_vote(title, vote)
+            self.render_details(title)
+        elif action == '编辑题目元数据':
+            main.set_problem_meta(title, args['difficulty'], args['tags'])
+            self.render_details(title)
+        elif action == '难度对比':
+            if main.get_problem(args['easier']) is None:
+                return False
+            main.record_comparison(user, title, args['easier'])
+        return True
+
+
+def replay(events, speed=0.0, problems_path=None, keep_dir=False, progress=False):
+    """在临时目录中回放操作流，返回统计结果"""
+    workdir = tempfile.mkdtemp(prefix='vote-replay-')
+    prepare_store(workdir, events, problems_path)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+        import metrics
+        # 与服务器一样写 log.log（计入持久化量），但不输出到终端
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                            handlers=[logging.FileHandler('log.log', encoding='utf-8')])
+        rss_start = rss_bytes()
+        main.warm_up()
+        replayer = Replayer(main)
+        latencies = defaultdict(list)
+        ignored = defaultdict(int)
+        rss_peak = rss_before = rss_bytes()
+        written_start = written_bytes()
+        saves_start = metrics._histograms.get(('vote_persistence_seconds', 'save_votes'), [0])[-1]
+
+        start = time.perf_counter()
+        first_ts = events[0][0] if events else 0
+        for n, (ts, user, action, args, details) in enumerate(events, 1):
+            if speed > 0:
+                delay = (ts - first_ts) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            t = time.perf_counter()
+            if replayer.apply(user, action, args):
+                main.log_action(user, action, details)
+                latencies[action].append(time.perf_counter() - t)
+            else:
+                ignored[action] += 1
+            if n % SAMPLE_EVERY == 0:
+                rss_peak = max(rss_peak, rss_bytes())
+                if progress:
+                    print(f"已回放 {n}/{len(events)} 条，耗时 {time.perf_counter() - start:.1f}s", flush=True)
+        elapsed = time.perf_counter() - start
+
+        rss_peak = max(rss_peak, rss_bytes())
+        main.shutdown()  # 保存剩余数据，与服务器退出时相同
+        # 保存和备份在数据锁外写文件，持有它们各自的锁统计，保证没有写到一半的文件
+        with main._save_lock, main._backup_lock:
+            written_end = written_bytes()
+            saves = metrics._histograms.get(('vote_persistence_seconds', 'save_votes'), [0])[-1] - saves_start
+            files = {}
+            for name in (main.VOTES_FILE, main.SNAPSHOT_FILE, main.USER_FILE, main.COMPARISON_FILE):
+                if os.path.exists(name):
+                    files[name] = os.path.getsize(name)
+            if os.path.isdir(main.BACKUP_DIR):
+                files[main.BACKUP_DIR + '/'] = sum(os.path.getsize(os.path.join(main.BACKUP_DIR, name))
+                                                   for name in os.listdir(main.BACKUP_DIR))
+        return {
+            'events': len(events),
+            'elapsed_s': elapsed,
+            'log_span_s': events[-1][0] - first_ts if events else 0,
+            'latencies': latencies,
+            'ignored': dict(ignored),
+            'saves': saves,
+            'written_bytes': written_end - written_start if written_start is not None else None,
+            'files': files,
+            'rss_start': rss_start,
+            'rss_before': rss_before,
+            'rss_peak': rss_peak,
+            'rss_end': rss_bytes(),
+            'memory_estimate': main.memory_estimate(),
+            'workdir': workdir,
+        }
+    finally:
+        os.chdir(cwd)
+        if not keep_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def report(result, skipped, as_json=False):
+    rows = []
+    for action, values in sorted(result['latencies'].items(), key=lambda item: -len(item[1])):
+        values = sorted(values)
+        rows.append({
+            'action': action,
+            'count': len(values),
+            'ignored': result['ignored'].get(action, 0),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000,
+        })
+    if as_json:
+        summary = {key: value for key, value in result.items() if key not in ('latencies', 'workdir')}
+        print(json.dumps(dict(summary, actions=rows, skipped=dict(skipped)), ensure_ascii=False, indent=2))
+        return
+    mb = 1024 * 1024
+    print(f"{'操作':<14}{'次数':>8}{'忽略':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for row in rows:
+        print(f"{row['action']:<14}{row['count']:>8}{row['ignored']:>6}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    speedup = result['log_span_s'] / result['elapsed_s'] if result['elapsed_s'] > 0 else 0
+    print(f"回放 {result['events']} 条操作，耗时 {result['elapsed_s']:.2f}s"
+          f"（原始跨度 {result['log_span_s']:.0f}s，{speedup:.1f} 倍速）")
+    written = f"{result['written_bytes'] / mb:.1f} MB" if result['written_bytes'] is not None else "未知"
+    print(f"持久化: 保存 {result['saves']} 次，共写出 {written}；"
+          + "，".join(f"{name} {size / 1024:.1f} KB" for name, size in result['files'].items()))
+    print(f"内存: 加载数据前 {result['rss_start'] / mb:.1f} MB，加载后 {result['rss_before'] / mb:.1f} MB，"
+          f"峰值 {result['rss_peak'] / mb:.1f} MB，结束 {result['rss_end'] / mb:.1f} MB，"
+          f"数据估算 {result['memory_estimate'] / mb:.1f} MB")
+    if skipped:
+        print("未回放的日志操作: " + "，".join(f"{action} {n}" for action, n in sorted(skipped.items(), key=lambda item: -item[1])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用 log.log 中的真实操作回放基准测试")
+    parser.add_argument('log', nargs='?', default='log.log')
+    parser.add_argument('--speed', type=float, default=0, help="相对原始节奏的倍速，0表示不等待、尽快回放")
+    parser.add_argument('--problems', default=None, help="题库文件或 problems.d 目录，默认用日志中出现的题目生成")
+    parser.add_argument('--since', type=parse_time, default=None, help="只回放此时间之后的操作")
+    parser.add_argument('--until', type=parse_time, default=None, help="只回放此时间之前的操作")
+    parser.add_argument('--limit', type=int, default=0, help="最多回放的操作数，0表示不限")
+    parser.add_argument('--keep', action='store_true', help="保留回放生成的数据目录")
+    parser.add_argument('--progress', action='store_true', help="回放过程中输出进度")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    events, skipped = parse_events(args.log, args.since, args.until)
+    if args.limit:
+        events = events[:args.limit]
+    if not events:
+        parser.error(f"{args.log} 中没有可回放的操作")
+    result = replay(events, args.speed, args.problems and os.path.abspath(args.problems), args.keep, args.progress)
+    report(result, skipped, args.json)
+    if args.keep:
+        print(f"回放数据保留在 {result['workdir']}")
+
+
+if __name__ == '__main__':
+    main()
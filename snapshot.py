@@ -0,0 +1,350 @@
+"""投票数据的二进制快照格式
+
+votes.json 需要把整个文件解析成大量小对象，数据量大时启动很慢。
+快照文件把题目名和用户名放进字符串表，评分放进定长数组，
+服务器用 mmap 只读打开后即可零拷贝地访问，多个只读进程还能共享同一份页缓存。
+
+文件布局（小端序，各段按8字节对齐）:
+    头部      magic(8) version(u32) n_strings(u32) n_problems(u32) n_votes(u32) n_fields(u32) extra_len(u32)
+    字符串表  offsets[u32 * (n_strings + 1)] + utf-8 数据
+    题目      title_idx[u32 * n_problems] + vote_offsets[u32 * (n_problems + 1)]
+    投票      voter_idx[u32 * n_votes] + 每个评分字段一列 f64 * n_votes
+    附加数据  JSON: 评分字段名、整数字段、评论和题目元数据
+
+用法:
+    python snapshot.py export votes.json votes.snap   # votes.json -> 快照
+    python snapshot.py import votes.snap votes.json   # 快照 -> votes.json
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'VOTESNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIIII')
+VOTE_FIELDS = ['thinking', 'implementing', 'quality']  # 固定顺序的评分字段，其余数值字段追加在后面
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _pad(buf):
+    return buf + b'\0' * (_align(len(buf)) - len(buf))
+
+
+def write_snapshot(path, votes, comments=None, problem_metas=None):
+    """把投票、评论和元数据写成快照文件（先写临时文件再原子替换，不影响已映射的旧快照）"""
+    strings = []
+    string_idx = {}
+
+    def intern(s):
+        if s not in string_idx:
+            string_idx[s] = len(strings)
+            strings.append(s)
+        return string_idx[s]
+
+    titles = [title for title, vote_list in votes.items() if vote_list]
+    title_idx = [intern(title) for title in titles]
+
+    # 收集所有数值评分字段，已知字段排在前面
+    fields = list(VOTE_FIELDS)
+    for title in titles:
+        for vote in votes[title]:
+            for key, value in vote.items():
+                if key != 'voter' and key not in fields and isinstance(value, (int, float)):
+                    fields.append(key)
+
+    vote_offsets = [0]
+    voter_idx = []
+    columns = {field: [] for field in fields}
+    int_fields = set(fields)
+    for title in titles:
+        for vote in votes[title]:
+            voter_idx.append(intern(vote['voter']))
+            for field in fields:
+                value = vote.get(field)
+                if value is None:
+                    columns[field].append(float('nan'))
+                    int_fields.discard(field)
+                else:
+                    if not isinstance(value, int) or isinstance(value, bool):
+                        int_fields.discard(field)
+                    columns[field].append(float(value))
+        vote_offsets.append(len(voter_idx))
+
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    extra = json.dumps({
+        'fields': fields,
+        'int_fields': [f for f in fields if f in int_fields],
+        'comments': dict(comments or {}),
+        'problem_metas': dict(problem_metas or {}),
+    }, ensure_ascii=False).encode('utf-8')
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, len(strings), len(titles), len(voter_idx), len(fields), len(extra)),
+        _pad(np.asarray(string_offsets, dtype='<u4').tobytes()),
+        _pad(b''.join(encoded)),
+        _pad(np.asarray(title_idx, dtype='<u4').tobytes()),
+        _pad(np.asarray(vote_offsets, dtype='<u4').tobytes()),
+        _pad(np.asarray(voter_idx, dtype='<u4').tobytes()),
+    ]
+    for field in fields:
+        parts.append(np.asarray(columns[field], dtype='<f8').tobytes())
+    parts.append(extra)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for part in parts:
+            f.write(part)
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """以 mmap 只读方式打开的快照，所有数组都是对映射内存的视图"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._mm
+        magic, version, n_strings, n_problems, n_votes, n_fields, extra_len = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} 不是投票快照文件")
+        if version != VERSION:
+            raise ValueError(f"不支持的快照版本: {version}")
+
+        pos = _align(HEADER.size)
+
+        def take(dtype, count):
+            nonlocal pos
+            arr = np.frombuffer(buf, dtype=dtype, count=count, offset=pos)
+            pos = _align(pos + arr.nbytes)
+            return arr
+
+        self._string_offsets = take('<u4', n_strings + 1)
+        self._string_base = pos
+        pos = _align(pos + int(self._string_offsets[-1]))
+        self._title_idx = take('<u4', n_problems)
+        self.vote_offsets = take('<u4', n_problems + 1)
+        self.voter_idx = take('<u4', n_votes)
+        column_pos = pos
+        pos = column_pos + 8 * n_votes * n_fields
+        extra = json.loads(bytes(buf[pos:pos + extra_len]).decode('utf-8'))
+
+        self.fields = extra['fields']
+        self.int_fields = set(extra['int_fields'])
+        self.comments = extra['comments']
+        self.problem_metas = extra['problem_metas']
+        self.columns = {}
+        for i, field in enumerate(self.fields):
+            self.columns[field] = np.frombuffer(buf, dtype='<f8', count=n_votes,
+                                                offset=column_pos + 8 * n_votes * i)
+        self._strings = {}
+        self.titles = [self.string(i) for i in self._title_idx.tolist()]
+        self._title_pos = {title: i for i, title in enumerate(self.titles)}
+
+    def string(self, i):
+        """按下标从字符串表取字符串（按需解码并缓存）"""
+        s = self._strings.get(i)
+        if s is None:
+            start = self._string_base + int(self._string_offsets[i])
+            end = self._string_base + int(self._string_offsets[i + 1])
+            s = self._strings[i] = self._mm[start:end].decode('utf-8')
+        return s
+
+    def __contains__(self, title):
+        return title in self._title_pos
+
+    def vote_range(self, title):
+        """返回题目投票在各数组中的切片范围"""
+        i = self._title_pos[title]
+        return int(self.vote_offsets[i]), int(self.vote_offsets[i + 1])
+
+    def column(self, title, field):
+        """返回题目某个评分字段的数组视图（零拷贝）"""
+        start, end = self.vote_range(title)
+        return self.columns[field][start:end]
+
+    def voters(self, title):
+        """题目的投票者列表"""
+        start, end = self.vote_range(title)
+        return [self.string(i) for i in self.voter_idx[start:end].tolist()]
+
+    def problem_votes(self, title):
+        """把题目的投票还原成 votes.json 中的字典列表"""
+        start, end = self.vote_range(title)
+        field_values = []
+        for field in self.fields:
+            values = self.columns[field][start:end].tolist()
+            if field in self.int_fields:
+                values = [int(v) for v in values]
+            field_values.append((field, values))
+        result = []
+        for k, voter in enumerate(self.voter_idx[start:end].tolist()):
+            vote = {}
+            for field, values in field_values:
+                value = values[k]
+                if value == value:  # 跳过缺失值(NaN)
+                    vote[field] = value
+            vote['voter'] = self.string(voter)
+            result.append(vote)
+        return result
+
+    def to_votes_dict(self):
+        """还原完整的投票字典"""
+        return {title: self.problem_votes(title) for title in self.titles}
+
+    def close(self):
+        """释放映射；仍有外部数组视图引用时交给垃圾回收处理"""
+        self.columns = {}
+        self._string_offsets = self._title_idx = self.vote_offsets = self.voter_idx = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+
+
+class LazyVotes(dict):
+    """以快照为后端的投票字典，题目的投票列表在首次访问时才从映射内存中还原
+
+    与 defaultdict(list) 行为一致；被修改过的题目会变成普通列表，
+    未访问过的题目可以通过 pending_columns 直接拿到数组视图用于统计。
+    """
+
+    def __init__(self, snap):
+        super().__init__()
+        self.snapshot = snap
+        self._pending = set(snap.titles)
+
+    def _materialize(self, key):
+        self._pending.discard(key)
+        value = self.snapshot.problem_votes(key)
+        dict.__setitem__(self, key, value)
+        return value
+
+    def _materialize_all(self):
+        for key in list(self._pending):
+            self._materialize(key)
+
+    def titles(self):
+        """所有题目（不触发还原）"""
+        return list(dict.keys(self)) + list(self._pending)
+
+    def pending_titles(self):
+        """尚未还原的题目（不触发还原）"""
+        return list(self._pending)
+
+    def pending_count(self):
+        """尚未还原的题目的投票总数（不触发还原）"""
+        total = 0
+        for key in self._pending:
+            start, end = self.snapshot.vote_range(key)
+            total += end - start
+        return total
+
+    def pending_columns(self, key):
+        """题目仍未还原时返回各评分字段的数组视图（'voter' 为投票者列表），否则返回None"""
+        if key not in self._pending:
+            return None
+        columns = {field: self.snapshot.column(key, field) for field in self.snapshot.fields}
+        columns['voter'] = self.snapshot.voters(key)
+        return columns
+
+    def __missing__(self, key):
+        if key in self._pending:
+            return self._materialize(key)
+        value = []
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key in self._pending:
+            self._pending.discard(key)
+            if not dict.__contains__(self, key):
+                return
+        dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._pending
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._pending)
+
+    def __iter__(self):
+        self._materialize_all()
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key in self._pending:
+            self._materialize(key)
+        return dict.pop(self, key, *default)
+
+    def keys(self):
+        self._materialize_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._materialize_all()
+        return dict.values(self)
+
+    def items(self):
+        self._materialize_all()
+        return dict.items(self)
+
+    def copy(self):
+        return dict(self.items())
+
+
+def json_to_snapshot(json_path, snap_path):
+    """votes.json -> 快照"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data and isinstance(next(iter(data.values())), list):
+        # 旧格式，只有投票数据，质量评分需要换算到-5~+5
+        from main import convert_quality_rating
+        for vote_list in data.values():
+            for vote in vote_list:
+                if 'quality' in vote and vote['quality'] >= 800:
+                    vote['quality'] = convert_quality_rating(vote['quality'])
+        data = {'votes': data}
+    write_snapshot(snap_path, data.get('votes', {}), data.get('comments', {}), data.get('problem_metas', {}))
+
+
+def snapshot_to_json(snap_path, json_path):
+    """快照 -> votes.json"""
+    snap = Snapshot(snap_path)
+    try:
+        data = {
+            'votes': snap.to_votes_dict(),
+            'comments': snap.comments,
+            'problem_metas': snap.problem_metas,
+        }
+    finally:
+        snap.close()
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] not in ('export', 'import'):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'export':
+        json_to_snapshot(sys.argv[2], sys.argv[3])
+    else:
+        snapshot_to_json(sys.argv[2], sys.argv[3])
@@ -0,0 +1,92 @@
+"""增量备份（main.run_backup）与按时间点恢复（backup.py）的测试"""
+import json
+import os
+import sys
+from collections import defaultdict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup  # noqa: E402
+import main  # noqa: E402
+
+
+def encode(payload):
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def vote(voter, thinking):
+    return {'voter': voter, 'thinking': thinking, 'implementing': thinking, 'quality': 0}
+
+
+def write_chain(backup_dir):
+    """t=1000 全量，t=2000 增量改A删B，t=3000 新全量，t=4000 增量删用户"""
+    backup.write_backup(backup_dir, 1, 'base', encode({
+        'votes': {'A': [vote('u', 1000)], 'B': [vote('u', 1200)]}, 'comments': {}, 'problem_metas': {},
+        'users': {'u': {'is_admin': False}, 'v': {'is_admin': False}}}), timestamp=1000)
+    backup.write_backup(backup_dir, 2, 'delta', encode({'problems': {
+        'A': {'votes': [vote('u', 1500)], 'comments': [], 'meta': {'difficulty': '简单'}},
+        'B': {'votes': [], 'comments': [], 'meta': None}}, 'users': {}}), timestamp=2000)
+    backup.write_backup(backup_dir, 3, 'base', encode({
+        'votes': {'A': [vote('u', 1500)], 'C': [vote('v', 3000)]}, 'comments': {}, 'problem_metas': {},
+        'users': {'u': {'is_admin': False}, 'v': {'is_admin': False}}}), timestamp=3000)
+    backup.write_backup(backup_dir, 4, 'delta', encode({'problems': {}, 'users': {'v': None}}), timestamp=4000)
+
+
+def test_restore_at_time_point(tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    write_chain(backup_dir)
+    state, chain = backup.restore_state(backup_dir, at=2500)
+    assert [item['seq'] for item in chain] == [1, 2]
+    assert state['votes'] == {'A': [vote('u', 1500)]}
+    assert state['problem_metas'] == {'A': {'difficulty': '简单'}}
+    state, chain = backup.restore_state(backup_dir, at=1000)
+    assert [item['seq'] for item in chain] == [1] and set(state['votes']) == {'A', 'B'}
+    state, chain = backup.restore_state(backup_dir)
+    assert [item['seq'] for item in chain] == [3, 4]
+    assert set(state['votes']) == {'A', 'C'} and set(state['users']) == {'u'}
+    with pytest.raises(ValueError):
+        backup.restore_state(backup_dir, at=999)  # 时间点之前没有全量备份
+
+
+def test_restore_command_line_at(tmp_path, monkeypatch):
+    backup_dir = str(tmp_path / 'backups')
+    out_dir = str(tmp_path / 'restored')
+    write_chain(backup_dir)
+    monkeypatch.setattr(sys, 'argv', ['backup.py', 'restore', '--dir', backup_dir, '--at', '2500', '--out', out_dir])
+    backup.main()
+    with open(os.path.join(out_dir, 'votes.json'), encoding='utf-8') as f:
+        assert json.load(f)['votes'] == {'A': [vote('u', 1500)]}
+    with open(os.path.join(out_dir, 'user.json'), encoding='utf-8') as f:
+        assert set(json.load(f)) == {'u', 'v'}
+
+
+def test_prune_keeps_latest_chains(tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    write_chain(backup_dir)
+    removed = backup.prune(backup_dir, keep_bases=1)
+    assert sorted(os.path.basename(path)[:8] for path in removed) == ['00000001', '00000002']
+    assert [item['seq'] for item in backup.list_backups(backup_dir)] == [3, 4]
+
+
+def test_run_backup_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, value in (('votes', defaultdict(list)), ('comments', defaultdict(main.CommentThread)),
+                        ('problem_metas', defaultdict(dict)), ('users', {'u': {'is_admin': False}}),
+                        ('_backup_dirty', set()), ('_backup_needs_base', True), ('_backup_users', {}),
+                        ('_backup_chain', 0)):
+        monkeypatch.setattr(main, name, value)
+    main.submit_votes('u', {'A': {'thinking': 1000, 'implementing': 1100, 'quality': 1}})
+    assert main.run_backup().endswith('base.json.gz')
+    assert main.run_backup() is None  # 没有变化时不写备份
+    main.submit_votes('u', {'B': {'thinking': 2000, 'implementing': 2100, 'quality': 2}})
+    main.set_problem_meta('A', '困难', 'dp')
+    main.users['w'] = {'is_admin': True}
+    assert main.run_backup().endswith('delta.json.gz')
+
+    state, chain = backup.restore_state(main.BACKUP_DIR)
+    assert [item['kind'] for item in chain] == ['base', 'delta']
+    assert state['votes'] == {title: list(vote_list) for title, vote_list in main.votes.items()}
+    assert state['problem_metas'] == {'A': {'difficulty': '困难', 'tags': 'dp'}}
+    assert state['users'] == main.users
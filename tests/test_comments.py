@@ -0,0 +1,69 @@
+"""评论存储（CommentThread / comments_from_json）的分页和编号测试"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def make_thread(n):
+    return main.CommentThread({'id': i, 'user': 'u', 'text': f'c{i}', 'time': float(i)} for i in range(1, n + 1))
+
+
+def all_pages(thread, limit):
+    pages, cursor = [], None
+    while True:
+        page, cursor = thread.page(cursor, limit)
+        pages.append([c['id'] for c in page])
+        if cursor is None:
+            return pages
+
+
+def test_pages_go_from_newest_to_oldest():
+    thread = make_thread(7)
+    assert all_pages(thread, 3) == [[7, 6, 5], [4, 3, 2], [1]]
+    assert all_pages(thread, 7) == [[7, 6, 5, 4, 3, 2, 1]]  # 恰好一页时没有下一页游标
+    assert all_pages(main.CommentThread(), 3) == [[]]
+
+
+def test_pages_skip_removed_comments():
+    thread = make_thread(8)
+    thread.remove(7)
+    thread.remove(4)
+    assert thread.remove(99) is None
+    assert all_pages(thread, 3) == [[8, 6, 5], [3, 2, 1]]
+    assert thread.remove_where(lambda c: c['id'] <= 3) == 3
+    assert all_pages(thread, 3) == [[8, 6, 5]]
+    assert len(thread) == 3
+
+
+def test_tombstones_are_compacted():
+    thread = make_thread(100)
+    for i in range(1, 96):
+        thread.remove(i)
+    assert len(thread._ids) < 100
+    assert all_pages(thread, 2) == [[100, 99], [98, 97], [96]]
+
+
+def test_ids_must_increase():
+    thread = make_thread(3)
+    with pytest.raises(ValueError):
+        thread.add({'id': 2, 'user': 'u', 'text': 'x', 'time': 0.0})
+
+
+def test_from_json_keeps_unique_ids_and_renumbers_broken_threads():
+    data = {
+        '好题': [{'id': 5, 'user': 'a', 'text': '后', 'time': 2.0}, {'id': 3, 'user': 'b', 'text': '先', 'time': 1.0}],
+        '旧题': [{'user': 'a', 'text': '二', 'time': 20.0}, {'id': 9, 'user': 'b', 'text': '一', 'time': 10.0},
+                {'id': 9, 'user': 'c', 'text': '三', 'time': 30.0}],
+    }
+    threads = main.comments_from_json(data)
+    assert [c['id'] for c in threads['好题']] == [3, 5]
+    renumbered = list(threads['旧题'])
+    assert [c['text'] for c in renumbered] == ['一', '二', '三']  # 按时间重新编号
+    ids = [c['id'] for c in renumbered]
+    assert ids == sorted(set(ids)) and ids[0] > 9  # 新id在已有id之后，不会与其他题目冲突
+    assert main.new_comment_id() > ids[-1]
@@ -0,0 +1,102 @@
+"""投票快照（snapshot.py）的读写和主程序选用快照的规则"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import snapshot  # noqa: E402
+
+VOTES = {
+    '题目A': [
+        {'voter': 'alice', 'thinking': 1500, 'implementing': 1600, 'quality': 2.5, 'time': 1700000000.25},
+        {'voter': 'bob', 'thinking': 1800, 'implementing': 1700, 'quality': -1.0, 'time': 1700000100.5},
+    ],
+    '题目B': [
+        {'voter': 'alice', 'thinking': 2200, 'implementing': 2100, 'quality': 0.0},  # 早期投票没有时间
+    ],
+    '空题': [],
+}
+
+
+def write(tmp_path, votes=VOTES):
+    path = str(tmp_path / 'votes.snap')
+    snapshot.write_snapshot(path, votes, {'题目A': [{'id': 1, 'user': 'bob', 'text': '好题', 'time': 1.0}]},
+                            {'题目B': {'difficulty': '中等', 'tags': 'dp'}})
+    return path
+
+
+def test_round_trip_keeps_int_and_float_fields(tmp_path):
+    snap = snapshot.Snapshot(write(tmp_path))
+    try:
+        assert snap.titles == ['题目A', '题目B']  # 没有投票的题目不写入
+        assert snap.to_votes_dict() == {title: vote_list for title, vote_list in VOTES.items() if vote_list}
+        vote = snap.problem_votes('题目A')[0]
+        assert type(vote['thinking']) is int and type(vote['implementing']) is int
+        assert type(vote['quality']) is float and type(vote['time']) is float
+        assert 'time' not in snap.problem_votes('题目B')[0]  # 缺失值不会还原成NaN
+        assert snap.comments['题目A'][0]['text'] == '好题'
+        assert snap.problem_metas == {'题目B': {'difficulty': '中等', 'tags': 'dp'}}
+        assert snap.column('题目A', 'thinking').tolist() == [1500.0, 1800.0]
+        assert snap.voters('题目A') == ['alice', 'bob']
+    finally:
+        snap.close()
+
+
+def test_mixed_int_and_float_field_stays_float(tmp_path):
+    votes = {'P': [{'voter': 'a', 'thinking': 1500, 'implementing': 1500.5, 'quality': 1}]}
+    snap = snapshot.Snapshot(write(tmp_path, votes))
+    try:
+        vote = snap.problem_votes('P')[0]
+        assert type(vote['implementing']) is float and vote['implementing'] == 1500.5
+        assert type(vote['quality']) is int
+    finally:
+        snap.close()
+
+
+def test_lazy_votes_materializes_on_demand(tmp_path):
+    snap = snapshot.Snapshot(write(tmp_path))
+    try:
+        votes = snapshot.LazyVotes(snap)
+        assert len(votes) == 2 and '题目A' in votes and '题目C' not in votes
+        assert sorted(votes.pending_titles()) == ['题目A', '题目B']
+        assert votes.pending_count() == 3
+        assert votes.pending_columns('题目A')['voter'] == ['alice', 'bob']
+        assert votes['题目B'] == VOTES['题目B']
+        assert votes.pending_titles() == ['题目A']
+        assert votes.pending_columns('题目B') is None
+        votes['题目A'] = []
+        assert votes.pending_titles() == [] and votes['题目A'] == []
+        assert votes['新题'] == []  # 与 defaultdict(list) 一致
+    finally:
+        snap.close()
+
+
+def test_copy_votes_does_not_materialize(tmp_path, monkeypatch):
+    snap = snapshot.Snapshot(write(tmp_path))
+    try:
+        monkeypatch.setattr(main, 'votes', snapshot.LazyVotes(snap))
+        main.votes['题目B'] = main.votes['题目B'] + [{'voter': 'carol', 'thinking': 900, 'implementing': 900,
+                                                     'quality': 1}]
+        copied, pending = main.copy_votes()
+        assert set(copied) == {'题目B'}
+        main.read_pending_votes(copied, pending)
+        assert copied['题目A'] == VOTES['题目A'] and len(copied['题目B']) == 2
+        assert main.votes.pending_titles() == ['题目A']
+    finally:
+        snap.close()
+
+
+def test_snapshot_freshness(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert not main.snapshot_is_fresh()  # 没有快照
+    write(tmp_path)
+    assert main.snapshot_is_fresh()  # 只有快照
+    with open(main.VOTES_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'votes': {}}, f)
+    os.utime(main.SNAPSHOT_FILE, (1000, 1000))
+    os.utime(main.VOTES_FILE, (2000, 2000))
+    assert not main.snapshot_is_fresh()  # votes.json 更新过，快照已过期
+    os.utime(main.SNAPSHOT_FILE, (2000, 2000))
+    assert main.snapshot_is_fresh()  # 同时写出的快照仍可用
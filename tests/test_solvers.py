@@ -0,0 +1,125 @@
+"""数值求解模块（calibration / bootstrap / pairwise）的确定性测试
+
+所有数据都由固定种子生成，运行: python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bootstrap  # noqa: E402
+import calibration  # noqa: E402
+import pairwise  # noqa: E402
+
+
+def make_ratings(rng, n_problems=40, n_voters=30, votes_per_voter=25, noise=30.0):
+    """每位投票者在随机题目上评分: 评分 = 难度 + 偏差 + 噪声"""
+    difficulty = rng.uniform(1000, 3000, size=(2, n_problems))
+    bias = rng.normal(0, 150, size=n_voters)
+    bias -= bias.mean()
+    problem_idx, voter_idx = [], []
+    for v in range(n_voters):
+        for p in rng.choice(n_problems, size=votes_per_voter, replace=False):
+            problem_idx.append(p)
+            voter_idx.append(v)
+    problem_idx = np.array(problem_idx)
+    voter_idx = np.array(voter_idx)
+    ratings = difficulty[:, problem_idx] + bias[voter_idx] + rng.normal(0, noise, size=(2, len(problem_idx)))
+    return difficulty, bias, problem_idx, voter_idx, ratings
+
+
+def test_calibration_recovers_voter_biases():
+    rng = np.random.default_rng(1)
+    difficulty, bias, problem_idx, voter_idx, ratings = make_ratings(rng)
+    fitted_difficulty, fitted_bias, iterations = calibration.fit(
+        problem_idx, voter_idx, ratings, difficulty.shape[1], len(bias))
+    assert iterations < calibration.MAX_ITERATIONS
+    # 偏差只能确定到一个公共常数，比较去掉均值后的结果；REG 会把偏差略微拉向0
+    assert np.max(np.abs((fitted_bias - fitted_bias.mean()) - bias)) < 40
+    assert np.corrcoef(fitted_bias, bias)[0, 1] > 0.98
+    # 校准后的难度比原始平均分更接近真实难度
+    counts = np.bincount(problem_idx, minlength=difficulty.shape[1])
+    raw = np.array([np.bincount(problem_idx, weights=ratings[f], minlength=difficulty.shape[1]) / counts
+                    for f in range(2)])
+    shift = (fitted_difficulty - difficulty).mean()
+    assert np.abs(fitted_difficulty - shift - difficulty).mean() < np.abs(raw - difficulty).mean()
+
+
+def test_calibration_warm_start_converges_quickly():
+    rng = np.random.default_rng(2)
+    difficulty, bias, problem_idx, voter_idx, ratings = make_ratings(rng)
+    args = (problem_idx, voter_idx, ratings, difficulty.shape[1], len(bias))
+    _, cold_bias, cold_iterations = calibration.fit(*args)
+    _, warm_bias, warm_iterations = calibration.fit(*args, init_bias=cold_bias)
+    assert warm_iterations <= 2 < cold_iterations
+    assert np.max(np.abs(warm_bias - cold_bias)) < calibration.TOLERANCE * 10
+
+
+def test_bootstrap_interval_coverage():
+    rng = np.random.default_rng(3)
+    true_mean, hits, trials = 1800.0, 0, 200
+    for _ in range(trials):
+        samples = rng.normal(true_mean, 300, size=(1, 40))
+        (low, high), = bootstrap.mean_intervals(samples, resamples=500, rng=rng)
+        assert low <= samples.mean() <= high
+        hits += low <= true_mean <= high
+    # 自助法百分位区间在小样本下略窄，实际覆盖率应接近但可能略低于95%
+    assert 0.88 <= hits / trials <= 0.99
+
+
+def test_bootstrap_fields_and_chunking():
+    rng = np.random.default_rng(4)
+    samples = np.vstack([np.full(50, 1500.0), rng.normal(2000, 100, size=50)])
+    whole = bootstrap.mean_intervals(samples, resamples=300, rng=np.random.default_rng(5))
+    old_cells = bootstrap.MAX_CELLS
+    bootstrap.MAX_CELLS = 50 * 7  # 强制分块
+    try:
+        chunked = bootstrap.mean_intervals(samples, resamples=300, rng=np.random.default_rng(5))
+    finally:
+        bootstrap.MAX_CELLS = old_cells
+    assert whole.shape == (2, 2)
+    assert whole[0, 0] == whole[0, 1] == 1500.0  # 常数样本的区间宽度为0
+    assert whole[1, 0] < samples[1].mean() < whole[1, 1]
+    assert np.abs(chunked - whole).max() < 15
+
+
+def simulate_comparisons(rng, strengths, n_comparisons):
+    """按 Bradley-Terry 概率生成 (较难, 较易) 对比"""
+    n = len(strengths)
+    a = rng.integers(0, n, size=n_comparisons)
+    b = (a + rng.integers(1, n, size=n_comparisons)) % n
+    p = 1 / (1 + 10 ** ((strengths[b] - strengths[a]) / 400))
+    a_wins = rng.random(n_comparisons) < p
+    return np.where(a_wins, a, b), np.where(a_wins, b, a)
+
+
+def test_pairwise_fit_recovers_order():
+    rng = np.random.default_rng(6)
+    strengths = np.linspace(1100, 1900, 9)
+    winners, losers = simulate_comparisons(rng, strengths, 4000)
+    ratings, iterations = pairwise.fit(winners, losers, len(strengths))
+    assert iterations < pairwise.MAX_ITERATIONS
+    assert abs(ratings.mean() - pairwise.BASE) < 1e-6
+    assert list(np.argsort(ratings)) == list(range(len(strengths)))
+    assert np.max(np.abs(ratings - strengths)) < 50  # 虚拟胜负把两端的分数略微拉向平均
+
+
+def test_pairwise_warm_start_and_unbeaten_problem():
+    winners = np.array([0, 0, 0, 1])
+    losers = np.array([1, 2, 2, 2])
+    ratings, _ = pairwise.fit(winners, losers, 3)
+    assert np.all(np.isfinite(ratings))  # 题目0只赢不输，题目2只输不赢，仍有有限分数
+    assert ratings[0] > ratings[1] > ratings[2]
+    again, iterations = pairwise.fit(winners, losers, 3, init=ratings)
+    assert iterations <= 2
+    assert np.max(np.abs(again - ratings)) < pairwise.TOLERANCE * 10
+
+
+def test_elo_replay_is_zero_sum():
+    expected = lambda a, b: 1 / (1 + 10 ** ((b - a) / 400))
+    ratings = {'A': 1500.0, 'B': 1500.0}
+    pairwise.elo_replay(ratings, ['A', 'A'], ['B', 'B'], 24, expected)
+    assert ratings['A'] > 1500 > ratings['B']
+    assert abs(ratings['A'] + ratings['B'] - 3000) < 1e-9
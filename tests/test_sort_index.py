@@ -0,0 +1,71 @@
+"""题目列表排序索引（refresh_sort_index / sorted_problem_titles）的测试"""
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def write_catalogue(titles):
+    with open(main.PROBLEM_FILE, 'w', encoding='utf-8') as f:
+        for title in titles:
+            f.write(f"{title}\nhttps://example.com/{title}\n")
+    # 同一秒内多次改写时 mtime 可能不变，大小不同才能被识别为变化，这里强制更新 mtime
+    stat = os.stat(main.PROBLEM_FILE)
+    os.utime(main.PROBLEM_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9 * len(titles)))
+
+
+def fresh_state(monkeypatch, tmp_path, titles):
+    monkeypatch.chdir(tmp_path)
+    for name, value in (('problems', []), ('problem_index', {}), ('catalogue_version', 0),
+                        ('_catalogue_sources', {}), ('_sort_orders', {}), ('_sort_keys', {}),
+                        ('_sort_dirty', set()), ('_sort_catalogue_version', None), ('_stats_cache', {}),
+                        ('votes', defaultdict(list)), ('problem_metas', defaultdict(dict))):
+        monkeypatch.setattr(main, name, value)
+    write_catalogue(titles)
+    main.load_problems()
+
+
+def vote(title, voter, thinking):
+    main.submit_votes(voter, {title: {'thinking': thinking, 'implementing': thinking, 'quality': 0}})
+
+
+def test_sort_by_column_and_descending_ties(monkeypatch, tmp_path):
+    fresh_state(monkeypatch, tmp_path, ['C', 'A', 'B', 'D'])
+    vote('A', 'u', 2000)
+    vote('B', 'u', 1000)
+    assert main.sorted_problem_titles('title') == ['A', 'B', 'C', 'D']
+    assert main.sorted_problem_titles('thinking') == ['C', 'D', 'B', 'A']
+    # 键相同的 C、D 在降序时仍按题库顺序排列
+    assert main.sorted_problem_titles('thinking', ascending=False) == ['A', 'B', 'C', 'D']
+    vote('C', 'u', 3000)  # 只移动统计变化过的题目
+    assert main.sorted_problem_titles('thinking', ascending=False) == ['C', 'A', 'B', 'D']
+
+
+def test_order_after_catalogue_reload(monkeypatch, tmp_path):
+    fresh_state(monkeypatch, tmp_path, ['P1', 'P2', 'P3'])
+    assert main.sorted_problem_titles('title') == ['P1', 'P2', 'P3']
+    write_catalogue(['P2', 'P3', 'P0', 'P4'])
+    main.load_problems()
+    assert main.sorted_problem_titles('title') == ['P0', 'P2', 'P3', 'P4']
+    assert main.sorted_problem_titles('count') == ['P2', 'P3', 'P0', 'P4']  # 键相同时按新题库顺序
+
+
+def test_reload_during_rebuild_is_picked_up(monkeypatch, tmp_path):
+    fresh_state(monkeypatch, tmp_path, ['P0', 'P1', 'P2'])
+    original = main.problem_sort_entries
+    reloaded = []
+
+    def reload_once(title, pos):
+        if not reloaded:
+            reloaded.append(title)
+            write_catalogue(['P0', 'P1', 'P2', 'NEW'])
+            main.load_problems()
+        return original(title, pos)
+
+    monkeypatch.setattr(main, 'problem_sort_entries', reload_once)
+    assert main.sorted_problem_titles('title') == ['P0', 'P1', 'P2']  # 本次仍是重建开始时的题库
+    assert 'NEW' in main.problem_index
+    assert main.sorted_problem_titles('title') == ['NEW', 'P0', 'P1', 'P2']
@@ -0,0 +1,50 @@
+"""写操作限流令牌桶（TokenBucket / prune_buckets）的测试，时间由假时钟控制"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_burst_then_refill(clock):
+    bucket = main.TokenBucket(rate=2.0, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() is None  # 令牌用完，不愿等待时拒绝且不扣令牌
+    assert bucket.retry_after() == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert bucket.reserve() == 0.0
+    clock[0] += 100
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, None]  # 最多积累 burst 个
+
+
+def test_reserve_with_wait(clock):
+    bucket = main.TokenBucket(rate=4.0, burst=1)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve(max_wait=0.1) is None
+    assert bucket.reserve(max_wait=0.5) == pytest.approx(0.25)  # 预支下一个令牌，调用方需等待
+    assert bucket.tokens == pytest.approx(-1.0)
+    clock[0] += 0.25
+    assert bucket.reserve() is None  # 预支的令牌尚未还清
+    clock[0] += 0.25
+    assert bucket.reserve() == 0.0
+
+
+def test_prune_drops_only_refilled_buckets(clock):
+    buckets = {'idle': main.TokenBucket(1.0, 2), 'busy': main.TokenBucket(1.0, 2), 'fresh': main.TokenBucket(1.0, 2)}
+    buckets['idle'].reserve()
+    buckets['busy'].reserve()
+    clock[0] += 0.5
+    buckets['busy'].reserve()
+    clock[0] += 0.6  # idle 已恢复满，busy 还差约0.9个令牌
+    main.prune_buckets(buckets)
+    assert set(buckets) == {'busy'}
@@ -0,0 +1,83 @@
+"""后台分析任务读取投票数据（collect_vote_arrays / run_calibration）的测试
+
+投票可能在读取途中被提交，读到的每道题各列长度必须一致。
+"""
+import os
+import sys
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def reset_votes(monkeypatch, tmp_path, n_problems=20, n_voters=10):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, 'votes', defaultdict(list))
+    monkeypatch.setattr(main, 'voter_biases', {})
+    for p in range(n_problems):
+        main.votes[f'P{p}'] = [{'voter': f'u{v}', 'thinking': 1000 + 10 * p + v, 'implementing': 1200 + v,
+                                'quality': 1, 'time': 0.0} for v in range(n_voters)]
+
+
+class RecordingVotes(defaultdict):
+    """记录每次整体替换时列表内容的投票字典"""
+
+    def __init__(self):
+        super().__init__(list)
+        self.assigned = []
+
+    def __setitem__(self, key, value):
+        self.assigned.append((key, list(value)))
+        super().__setitem__(key, value)
+
+
+def test_submit_votes_replaces_list_in_one_step(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    recording = RecordingVotes()
+    monkeypatch.setattr(main, 'votes', recording)
+    main.submit_votes('a', {'P0': {'thinking': 1000, 'implementing': 1000, 'quality': 0}})
+    main.submit_votes('b', {'P0': {'thinking': 2000, 'implementing': 2000, 'quality': 0}})
+    main.submit_votes('a', {'P0': {'thinking': 1500, 'implementing': 1500, 'quality': 1}})
+    # 读者在任意一次替换后看到的都是完整的新列表，而不是删掉旧票、还没追加新票的中间状态
+    assert [[v['voter'] for v in value] for _, value in recording.assigned] == [['a'], ['a', 'b'], ['b', 'a']]
+    assert recording['P0'][-1]['thinking'] == 1500
+
+
+def test_collect_vote_arrays_reads_columns_under_lock(monkeypatch, tmp_path):
+    reset_votes(monkeypatch, tmp_path)
+    original = main.vote_columns
+    calls = []
+
+    def checked(title):
+        calls.append(main.data_lock.locked())
+        return original(title)
+
+    monkeypatch.setattr(main, 'vote_columns', checked)
+    arrays = main.collect_vote_arrays()
+    assert calls and all(calls)
+    assert len(arrays['titles']) == 20
+    assert len(arrays['problem_idx']) == len(arrays['voter_idx']) == len(arrays['thinking']) == 200
+
+
+def test_run_calibration_while_votes_change(monkeypatch, tmp_path):
+    reset_votes(monkeypatch, tmp_path)
+    stop = threading.Event()
+
+    def writer():
+        k = 0
+        while not stop.is_set():
+            k += 1
+            main.submit_votes(f'u{k % 10}', {f'P{k % 20}': {'thinking': 1400 + k % 50, 'implementing': 1500,
+                                                          'quality': 0}})
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(20):
+            main.run_calibration()
+            assert set(main.calibrated_ratings) == {f'P{p}' for p in range(20)}
+    finally:
+        stop.set()
+        thread.join()